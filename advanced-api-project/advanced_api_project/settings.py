@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The throttling and query-profiling modules are shared with the other API
+# projects of the repository (see ../shared)
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -47,9 +53,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Basic comes first so unauthenticated requests get 401 with a
+    # WWW-Authenticate challenge; Session alone can only answer 403
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -57,10 +65,31 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Report list errors as {index: errors} for the bulk endpoints
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
+    # Views opt in with throttle_scope (see shared/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'shared.throttling.SlidingWindowThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'bulk': '20/min',
+        'export': '10/min',
+    },
 }
 
+# Throttle counters are kept in this cache; None keeps them in-process
+THROTTLE_CACHE = 'default'
+
+# Query profiling (see shared/profiling.py): the share of requests profiled, and
+# how often one query shape must run in a request to be an N+1
+QUERY_PROFILER_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = 3
+QUERY_PROFILER_HISTORY = 100
+
 MIDDLEWARE = [
+    # First, so the queries of every other middleware are profiled too
+    'shared.profiling.QueryProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
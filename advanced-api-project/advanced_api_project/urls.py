@@ -16,9 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from shared.profiling import QueryProfileDetail, QueryProfileList
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/profiler/', QueryProfileList.as_view(), name='query-profile-list'),
+    path('api/profiler/<str:profile_id>/', QueryProfileDetail.as_view(), name='query-profile-detail'),
     path('api/', include('api.urls')),  # Our API endpoints
     path('api-auth/', include('rest_framework.urls')),  # DRF authentication views
 ]
@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        post_migrate.connect(install_trigram_indexes, sender=self)
+
+
+def install_trigram_indexes(sender, using, **kwargs):
+    """Restore trigram triggers dropped when a migration rebuilt api_book or api_author."""
+    from django.db import connections
+    from .trigram import install
+    install(connections[using])
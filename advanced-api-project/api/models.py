@@ -30,7 +30,8 @@ class Book(models.Model):
         Author,
         on_delete=models.CASCADE,
         related_name='books',
-        help_text="Select the book's author"
+        help_text="Select the book's author",
+        db_index=False  # covered by book_author_year_idx
     )
 
     def clean(self):
@@ -47,4 +48,11 @@ class Book(models.Model):
         return f"{self.title} ({self.publication_year}) by {self.author.name}"
 
     class Meta:
-        ordering = ['-publication_year', 'title']
\ No newline at end of file
+        ordering = ['-publication_year', 'title']
+        indexes = [
+            # min_year/max_year filters and the default ordering
+            models.Index(fields=['publication_year'], name='book_year_idx'),
+            # author filter, alone or with a year range
+            models.Index(fields=['author', 'publication_year'], name='book_author_year_idx'),
+        ]
+        # Title and author name substring search use the trigram indexes in api/trigram.py
\ No newline at end of file
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.utils import timezone
+from django.db.models import Q
 from .models import Author, Book
 
 class BookSerializer(serializers.ModelSerializer):
@@ -31,16 +32,155 @@ class BookSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Publication year cannot be in the future.")
         return value
 
+# Number of books nested in each author; the rest are counted in books_count
+BOOKS_PREVIEW_LIMIT = 5
+
 class AuthorSerializer(serializers.ModelSerializer):
     """
     Serializer for the Author model.
-    
-    This serializer provides a nested representation of an author's books,
-    making it easy to access all books by an author in API responses.
-    The nested books are read-only to prevent circular dependencies in creation.
+
+    Nests a preview of at most BOOKS_PREVIEW_LIMIT of the author's books,
+    with books_count giving the total, so an author with thousands of books
+    still serializes to a small payload. The full list is available from
+    /api/books/?author=<id> or by streaming it with ?expand=books.
+
+    Views should annotate `books_count` and prefetch the preview into
+    `preview_books` (see api.views.authors_with_book_preview); both fall back
+    to per-author queries otherwise. The nested books are read-only.
+    """
+    books = serializers.SerializerMethodField()
+    books_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Author
+        fields = ['id', 'name', 'books_count', 'books']
+
+    def get_books(self, obj):
+        books = getattr(obj, 'preview_books', None)
+        if books is None:
+            books = obj.books.all()[:BOOKS_PREVIEW_LIMIT]
+        return BookSerializer(books, many=True, context=self.context).data
+
+    def get_books_count(self, obj):
+        count = getattr(obj, 'books_count', None)
+        return obj.books.count() if count is None else count
+
+# Largest batch accepted by the bulk endpoints
+BULK_MAX_ITEMS = 1000
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    List serializer that writes a whole batch with bulk_create() or
+    bulk_update().
+
+    To update, pass the instances as a dict of pk -> instance (see
+    QuerySet.in_bulk()); each item then names the instance it changes by
+    `id`. Items are validated independently and errors come back keyed by
+    item index; the view saves nothing unless every item is valid.
+    """
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        pk = data.get('id') if isinstance(data, dict) else None
+        if pk not in self.instance:
+            raise serializers.ValidationError({'id': ['No such object.']})
+        if pk in self._seen:
+            raise serializers.ValidationError({'id': ['Listed more than once.']})
+        self._seen.add(pk)
+        self.child.instance = self.instance[pk]
+        try:
+            attrs = super().run_child_validation(data)
+        finally:
+            self.child.instance = None
+        self._targets.append(self.instance[pk])
+        return attrs
+
+    def to_internal_value(self, data):
+        self._seen, self._targets = set(), []
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        fields = set()
+        for obj, attrs in zip(self._targets, validated_data):
+            for field, value in attrs.items():
+                setattr(obj, field, value)
+            fields.update(attrs)
+        if fields:
+            self.child.Meta.model.objects.bulk_update(self._targets, fields)
+        return self._targets
+
+class BookBulkListSerializer(BulkListSerializer):
     """
-    books = BookSerializer(many=True, read_only=True)
+    Bulk book writes with every author in the batch resolved in one query.
+
+    Items give their author by id (`author`) or by name (`author_name`).
+    Names that match no author create one; when several authors share a
+    name the oldest is used.
+    """
+    def to_internal_value(self, data):
+        items = [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+        ids = {item['author'] for item in items if isinstance(item.get('author'), int)}
+        names = {item['author_name'] for item in items if isinstance(item.get('author_name'), str)}
+        self.author_ids, self.authors_by_name = set(), {}
+        if ids or names:
+            for pk, name in Author.objects.filter(Q(pk__in=ids) | Q(name__in=names)).order_by('pk').values_list('pk', 'name'):
+                self.author_ids.add(pk)
+                self.authors_by_name.setdefault(name, pk)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        self._assign_authors(validated_data)
+        return super().create(validated_data)
+
+    def update(self, instances, validated_data):
+        self._assign_authors(validated_data)
+        return super().update(instances, validated_data)
 
+    def _assign_authors(self, validated_data):
+        new_names = {attrs['author_name'] for attrs in validated_data
+                     if attrs.get('author_name') and attrs['author_name'] not in self.authors_by_name}
+        for author in Author.objects.bulk_create([Author(name=name) for name in sorted(new_names)]):
+            self.authors_by_name[author.name] = author.pk
+        for attrs in validated_data:
+            name = attrs.pop('author_name', None)
+            if name is not None:
+                attrs['author_id'] = self.authors_by_name[name]
+
+class BookBulkSerializer(BookSerializer):
+    """
+    A book within a bulk write. `author` is checked against the batch's
+    single author lookup rather than with a query per item.
+    """
+    author = serializers.IntegerField(source='author_id', required=False)
+    author_name = serializers.CharField(
+        max_length=Author._meta.get_field('name').max_length, write_only=True, required=False
+    )
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ['author_name']
+        list_serializer_class = BookBulkListSerializer
+
+    def validate(self, attrs):
+        if 'author_id' in attrs and 'author_name' in attrs:
+            raise serializers.ValidationError('Give either author or author_name, not both.')
+        if 'author_id' in attrs and attrs['author_id'] not in self.parent.author_ids:
+            raise serializers.ValidationError({'author': [f'Invalid pk "{attrs["author_id"]}" - object does not exist.']})
+        if not self.partial and 'author_id' not in attrs and 'author_name' not in attrs:
+            raise serializers.ValidationError({'author': ['This field is required.']})
+        return attrs
+
+class AuthorBulkSerializer(serializers.ModelSerializer):
+    """An author within a bulk write, without the nested books."""
     class Meta:
         model = Author
-        fields = ['id', 'name', 'books']
\ No newline at end of file
+        fields = ['id', 'name']
+        list_serializer_class = BulkListSerializer
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=BULK_MAX_ITEMS
+    )
@@ -0,0 +1,132 @@
+"""
+Streaming JSON writers.
+
+These build responses piece by piece from database iterators, so memory use
+stays flat and the first bytes go out before the last rows are read.
+
+Exports write a queryset as a JSON array, newline-delimited JSON or CSV. The
+pieces are gathered into blocks of about STREAM_BUFFER_SIZE characters so a
+large export is not sent as thousands of tiny writes.
+"""
+import csv
+import json
+
+from django.db.models import Case, IntegerField, When
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Book
+from .serializers import AuthorSerializer, BookSerializer
+
+# Rows fetched per round trip when iterating large querysets
+STREAM_CHUNK_SIZE = 2000
+
+# Characters gathered before a block is handed to the server
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def dumps(data):
+    return json.dumps(data, cls=JSONEncoder)
+
+
+class AuthorHeaderSerializer(AuthorSerializer):
+    """An author without the nested preview; the streamed books go in its place."""
+    books = None
+
+    class Meta(AuthorSerializer.Meta):
+        fields = ['id', 'name', 'books_count']
+
+
+def stream_authors_with_books(authors, envelope=None, many=True):
+    """
+    Yield JSON for `authors` with every one of their books nested.
+
+    All the books come from one query ordered to match `authors`, read with
+    iterator(), and are written as they arrive. `envelope` holds extra
+    top-level keys (count, next, previous) for a paginated list; `many=False`
+    writes a single author object.
+    """
+    authors = list(authors)
+    positions = {author.pk: i for i, author in enumerate(authors)}
+    books = Book.objects.filter(author__in=authors).order_by(
+        Case(*[When(author_id=pk, then=i) for pk, i in positions.items()], output_field=IntegerField()),
+        *Book._meta.ordering
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+    if many:
+        head = dumps(envelope or {})[:-1]
+        yield head + (', ' if envelope else '') + '"results": ['
+
+    book = next(books, None)
+    for i, author in enumerate(authors):
+        header = dumps(AuthorHeaderSerializer(author).data)[:-1]
+        yield (', ' if i else '') + header + ', "books": ['
+        first = True
+        while book is not None and book.author_id == author.pk:
+            yield ('' if first else ', ') + dumps(BookSerializer(book).data)
+            first = False
+            book = next(books, None)
+        yield ']}'
+
+    if many:
+        yield ']}'
+
+
+def buffered(pieces, size=STREAM_BUFFER_SIZE):
+    """Join small string pieces into blocks of roughly `size` characters."""
+    block, length = [], 0
+    for piece in pieces:
+        block.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(block)
+            block, length = [], 0
+    if block:
+        yield ''.join(block)
+
+
+def json_array(rows, fields=None):
+    """Yield `rows` (dicts) as one JSON array."""
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',\n' if i else '\n') + dumps(row)
+    yield '\n]\n'
+
+
+def ndjson(rows, fields=None):
+    """Yield `rows` (dicts) as newline-delimited JSON, one object per line."""
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def csv_rows(rows, fields):
+    """Yield `rows` (dicts) as CSV with a header row of `fields`."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row.get(field) for field in fields])
+
+
+# Export format -> (writer, content type)
+EXPORT_FORMATS = {
+    'json': (json_array, 'application/json'),
+    'ndjson': (ndjson, 'application/x-ndjson'),
+    'csv': (csv_rows, 'text/csv; charset=utf-8'),
+}
+
+
+def export(queryset, serializer, fmt):
+    """
+    Stream `queryset` through `serializer` in export format `fmt`.
+
+    Rows are read with iterator() and serialized one at a time by the same
+    serializer instance, so memory use does not depend on the table size.
+    """
+    writer, content_type = EXPORT_FORMATS[fmt]
+    rows = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE))
+    return buffered(writer(rows, list(serializer.fields))), content_type
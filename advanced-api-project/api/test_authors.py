@@ -0,0 +1,70 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book
+from .serializers import BOOKS_PREVIEW_LIMIT
+
+
+class AuthorBooksTests(APITestCase):
+    """Test the bounded book preview on authors and the streamed ?expand=books."""
+
+    def setUp(self):
+        self.prolific = Author.objects.create(name='Prolific Writer')
+        self.other = Author.objects.create(name='Another Writer')
+        Book.objects.bulk_create([
+            Book(title=f'Book {i:02d}', publication_year=2000 + i, author=self.prolific)
+            for i in range(12)
+        ])
+        Book.objects.create(title='Only Book', publication_year=2020, author=self.other)
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_list_query_count_does_not_grow_with_authors(self):
+        """Test 2 or 7 authors cost the same number of queries."""
+        url = reverse('api:author-list')
+        small, _ = self.count_queries(url)
+        for i in range(5):
+            author = Author.objects.create(name=f'Writer {i}')
+            Book.objects.create(title=f'Debut {i}', publication_year=2010, author=author)
+        large, response = self.count_queries(url)
+        self.assertEqual(small, large)
+        self.assertEqual(response.data['count'], 7)
+
+    def test_nested_books_are_capped(self):
+        """Test authors nest a preview of their books alongside the full count."""
+        response = self.client.get(reverse('api:author-detail', args=[self.prolific.pk]))
+        self.assertEqual(response.data['books_count'], 12)
+        self.assertEqual(len(response.data['books']), BOOKS_PREVIEW_LIMIT)
+
+        response = self.client.get(reverse('api:author-list'))
+        authors = {author['name']: author for author in response.data['results']}
+        self.assertEqual(len(authors['Prolific Writer']['books']), BOOKS_PREVIEW_LIMIT)
+        self.assertEqual(authors['Another Writer']['books_count'], 1)
+        self.assertEqual([b['title'] for b in authors['Another Writer']['books']], ['Only Book'])
+
+    def test_expand_streams_every_book(self):
+        """Test ?expand=books streams the full nested lists as valid JSON."""
+        response = self.client.get(reverse('api:author-list'), {'expand': 'books'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([author['name'] for author in data['results']], ['Another Writer', 'Prolific Writer'])
+        prolific = data['results'][1]
+        self.assertEqual(prolific['books_count'], 12)
+        self.assertCountEqual([b['title'] for b in prolific['books']], [f'Book {i:02d}' for i in range(12)])
+
+    def test_expand_on_detail(self):
+        """Test a single author can be expanded too."""
+        response = self.client.get(reverse('api:author-detail', args=[self.other.pk]), {'expand': 'books'})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['name'], 'Another Writer')
+        self.assertEqual([b['title'] for b in data['books']], ['Only Book'])
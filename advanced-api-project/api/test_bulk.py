@@ -0,0 +1,94 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book
+
+
+class BookBulkTests(APITestCase):
+    """Test the bulk book and author endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('api:book-bulk')
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.author = Author.objects.create(name='John Smith')
+
+    def test_create_resolves_authors_in_one_query(self):
+        """Test a batch is written with one author lookup, creating unknown names."""
+        batch = [
+            {'title': 'By id', 'publication_year': 2020, 'author': self.author.pk},
+            {'title': 'By name', 'publication_year': 2021, 'author_name': 'John Smith'},
+        ] + [
+            {'title': f'New {i}', 'publication_year': 2022, 'author_name': f'Newcomer {i % 2}'}
+            for i in range(6)
+        ]
+        # savepoint, author lookup, author insert, book insert, release
+        with self.assertNumQueries(5):
+            response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 8)
+        self.assertEqual(Book.objects.filter(author=self.author).count(), 2)
+        self.assertEqual(Author.objects.get(name='Newcomer 1').books.count(), 3)
+
+    def test_author_names_up_to_the_model_length(self):
+        """Test author_name accepts what Author.name holds and no more."""
+        name = 'A' * 200
+        response = self.client.post(self.url, [{'title': 'Long', 'publication_year': 2020, 'author_name': name}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Author.objects.filter(name=name).exists())
+
+        response = self.client.post(self.url, [{'title': 'Longer', 'publication_year': 2020, 'author_name': name + 'A'}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_errors_are_reported_per_item(self):
+        """Test invalid items are reported by index and nothing is written."""
+        response = self.client.post(self.url, [
+            {'title': 'Fine', 'publication_year': 2020, 'author': self.author.pk},
+            {'title': 'Future', 'publication_year': 3000, 'author': self.author.pk},
+            {'title': 'Orphan', 'publication_year': 2020, 'author': 999},
+            {'title': 'Anonymous', 'publication_year': 2020},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {1, 2, 3})
+        self.assertIn('publication_year', response.data[1])
+        self.assertIn('author', response.data[2])
+        self.assertFalse(Book.objects.exists())
+
+    def test_update_and_delete(self):
+        """Test PATCH updates by id with bulk_update and DELETE removes by id."""
+        first = Book.objects.create(title='First', publication_year=2020, author=self.author)
+        second = Book.objects.create(title='Second', publication_year=2020, author=self.author)
+
+        response = self.client.patch(self.url, [
+            {'id': first.pk, 'title': 'First, revised'},
+            {'id': second.pk, 'publication_year': 2021, 'author_name': 'Jane Doe'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'First, revised')
+        self.assertEqual((second.publication_year, second.author.name), (2021, 'Jane Doe'))
+
+        response = self.client.patch(self.url, [{'id': 999, 'title': 'Missing'}], format='json')
+        self.assertEqual(response.data, {0: {'id': ['No such object.']}})
+
+        response = self.client.delete(self.url, {'ids': [first.pk, 999]}, format='json')
+        self.assertEqual(response.data, {'deleted': [first.pk], 'not_found': [999]})
+        self.assertEqual(list(Book.objects.all()), [second])
+
+    def test_author_bulk_create(self):
+        """Test authors can be created in bulk too."""
+        response = self.client.post(reverse('api:author-bulk'), [{'name': 'A'}, {'name': 'B'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([author['name'] for author in response.data], ['A', 'B'])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book
+
+
+class BookExportTests(APITestCase):
+    """Test the streamed JSON, NDJSON and CSV book exports."""
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='John Smith')
+        Book.objects.create(title='Python Testing', publication_year=2023, author=author)
+        Book.objects.create(title='Django, REST and "APIs"', publication_year=2022, author=author)
+
+    def export(self, fmt, params=None):
+        response = self.client.get(reverse('api:book-export', args=[fmt]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_json_array(self):
+        """Test the JSON export is one array of every book, unpaginated."""
+        response, body = self.export('json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual([book['title'] for book in json.loads(body)], ['Python Testing', 'Django, REST and "APIs"'])
+
+    def test_ndjson_honours_filters(self):
+        """Test NDJSON writes one object per line and applies BookList filters."""
+        response, body = self.export('ndjson', {'max_year': 2022})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['title'] for line in body.splitlines()], ['Django, REST and "APIs"'])
+
+    def test_csv(self):
+        """Test the CSV export has a header row and quotes awkward values."""
+        response, body = self.export('csv', {'ordering': 'title'})
+        self.assertIn('attachment; filename="books.csv"', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ['id', 'title', 'publication_year', 'author'])
+        self.assertEqual([row[1] for row in rows[1:]], ['Django, REST and "APIs"', 'Python Testing'])
+
+    def test_unknown_format(self):
+        """Test an unsupported format is a 404."""
+        response = self.client.get(reverse('api:book-export', args=['xml']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
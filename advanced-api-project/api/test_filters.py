@@ -0,0 +1,103 @@
+import re
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from . import trigram
+from .models import Author, Book
+
+
+class BookFilterIndexTests(APITestCase):
+    """Test that every BookList filter combination is answered from an index."""
+
+    # A plan line that walks a whole base table or index instead of searching it
+    FULL_SCAN = re.compile(r'\bSCAN (api_book|api_author)\b')
+
+    def setUp(self):
+        self.url = reverse('api:book-list')
+        self.author = Author.objects.create(name='John Smith')
+        other = Author.objects.create(name='Jane Doe')
+        Book.objects.create(title='Python Testing', publication_year=2023, author=self.author)
+        Book.objects.create(title='Django REST APIs', publication_year=2022, author=self.author)
+        Book.objects.create(title='JavaScript Basics', publication_year=2021, author=other)
+
+    def query_plans(self, params):
+        """EXPLAIN QUERY PLAN for every query the list request ran against api_book."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if 'FROM "api_book"' not in query['sql']:
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append('\n'.join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans)
+        return response, plans
+
+    def assertIndexed(self, params, expected_titles):
+        response, plans = self.query_plans(params)
+        for plan in plans:
+            self.assertIsNone(self.FULL_SCAN.search(plan), f'{params} scans a table:\n{plan}')
+        self.assertCountEqual([book['title'] for book in response.data['results']], expected_titles)
+
+    def test_year_filters_use_the_year_index(self):
+        """Test min_year, max_year and both together."""
+        self.assertIndexed({'min_year': 2022}, ['Python Testing', 'Django REST APIs'])
+        self.assertIndexed({'max_year': 2021}, ['JavaScript Basics'])
+        self.assertIndexed({'min_year': 2022, 'max_year': 2022}, ['Django REST APIs'])
+
+    def test_author_filters_use_the_author_year_index(self):
+        """Test author alone and combined with a year range."""
+        self.assertIndexed({'author': self.author.pk}, ['Python Testing', 'Django REST APIs'])
+        self.assertIndexed({'author': self.author.pk, 'min_year': 2023}, ['Python Testing'])
+
+    def test_substring_filters_use_trigram_indexes(self):
+        """Test title, author_name and search, alone and combined."""
+        self.assertIndexed({'title': 'pyth'}, ['Python Testing'])
+        self.assertIndexed({'author_name': 'smi'}, ['Python Testing', 'Django REST APIs'])
+        self.assertIndexed({'title': 'script', 'max_year': 2022}, ['JavaScript Basics'])
+        self.assertIndexed({'search': 'doe'}, ['JavaScript Basics'])
+        self.assertIndexed({'search': 'rest john'}, ['Django REST APIs'])
+
+    def test_trigram_index_follows_writes(self):
+        """Test the triggers keep the index current through update() and delete()."""
+        Book.objects.filter(title='Python Testing').update(title='Rust Testing')
+        Author.objects.filter(pk=self.author.pk).update(name='Joan Smythe')
+        self.assertIndexed({'title': 'python'}, [])
+        self.assertIndexed({'title': 'rust'}, ['Rust Testing'])
+        self.assertIndexed({'author_name': 'smythe'}, ['Rust Testing', 'Django REST APIs'])
+
+        Book.objects.filter(title='Rust Testing').delete()
+        self.assertIndexed({'title': 'rust'}, [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        """Test terms shorter than a trigram still match."""
+        response = self.client.get(self.url, {'title': 'py'})
+        self.assertEqual([book['title'] for book in response.data['results']], ['Python Testing'])
+
+    def test_install_falls_back_without_the_trigram_tokenizer(self):
+        """Test SQLite builds without the trigram tokenizer migrate and filter with icontains."""
+        statements = trigram._install_statements
+
+        def without_trigram(index, table, column):
+            return {
+                name: sql.replace("tokenize='trigram'", "tokenize='missing'")
+                for name, sql in statements(index, table, column).items()
+            }
+
+        trigram.uninstall(connection)
+        trigram._available.clear()
+        self.addCleanup(trigram._available.clear)
+        with mock.patch('api.trigram._install_statements', without_trigram):
+            self.assertEqual(trigram.install(connection), [])
+        self.assertFalse(trigram.trigram_available(trigram.BOOK_TITLE_TRIGRAM))
+
+        response = self.client.get(self.url, {'title': 'pyth', 'author_name': 'smi'})
+        self.assertEqual([book['title'] for book in response.data['results']], ['Python Testing'])
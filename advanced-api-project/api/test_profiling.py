@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book
+from shared.profiling import QueryProfilerMiddleware, profiles
+
+
+@override_settings(QUERY_PROFILER_SAMPLE_RATE=1.0, QUERY_PROFILER_N_PLUS_ONE_THRESHOLD=3)
+class QueryProfilerTests(APITestCase):
+    """Test the query profiler middleware and endpoint."""
+
+    def setUp(self):
+        profiles.clear()
+        for name in ('John Smith', 'Jane Doe', 'Ann Lee'):
+            Book.objects.create(title='Python Testing', publication_year=2023, author=Author.objects.create(name=name))
+
+    def test_list_views_have_no_n_plus_one(self):
+        """Test the book and author lists are profiled without any N+1."""
+        for url in (reverse('api:book-list'), reverse('api:author-list')):
+            response = self.client.get(url)
+            self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+            self.assertEqual(profiles.get(response['X-Query-Profile']).n_plus_one, [], url)
+
+    @override_settings(QUERY_PROFILER_SAMPLE_RATE=0)
+    def test_unsampled_responses_are_untouched(self):
+        """Test nothing is recorded when the sample rate is 0."""
+        response = self.client.get(reverse('api:book-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiles.all(), [])
+
+    def test_n_plus_one_is_reported_with_its_stack(self):
+        """Test Book.__str__ loading each author is reported, and only to admins."""
+        def view(request):
+            return HttpResponse(', '.join(str(book) for book in Book.objects.all()))
+
+        with self.assertLogs('shared.profiling', 'WARNING'):
+            response = QueryProfilerMiddleware(view)(RequestFactory().get('/books/'))
+        self.assertIn('n-plus-one', response['Server-Timing'])
+
+        url = reverse('query-profile-detail', args=[response['X-Query-Profile']])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        [n_plus_one] = self.client.get(url).data['n_plus_one']
+        self.assertEqual(n_plus_one['count'], 3)
+        self.assertIn('FROM "api_author"', n_plus_one['sql'])
+        self.assertTrue(n_plus_one['stack'][-1].startswith('api/models.py:'))
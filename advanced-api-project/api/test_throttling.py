@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book
+from shared.throttling import LocalStore, SlidingWindow, TokenBucket
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottleTests(APITestCase):
+    """Test the bulk and export rate limits."""
+
+    def setUp(self):
+        cache.clear()
+        author = Author.objects.create(name='John Smith')
+        Book.objects.create(title='Python Testing', publication_year=2023, author=author)
+
+    @throttle_rates(bulk='2/min')
+    def test_bulk_writes_are_limited_per_user(self):
+        """Test books and authors share the limit and each user has their own."""
+        self.client.force_authenticate(User.objects.create_user(username='a', password='testpass123'))
+        statuses = [
+            self.client.post(reverse('api:book-bulk'), [{'title': 'T', 'publication_year': 2020, 'author_name': 'X'}],
+                             format='json').status_code,
+            self.client.post(reverse('api:author-bulk'), [{'name': 'Y'}], format='json').status_code,
+            self.client.post(reverse('api:author-bulk'), [{'name': 'Z'}], format='json').status_code,
+        ]
+        self.assertEqual(statuses, [201, 201, 429])
+
+        self.client.force_authenticate(User.objects.create_user(username='b', password='testpass123'))
+        response = self.client.post(reverse('api:author-bulk'), [{'name': 'Z'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @throttle_rates(export='1/min')
+    def test_export_is_limited_per_ip(self):
+        """Test a second export from the same address waits, signed in or not."""
+        url = reverse('api:book-export', args=['json'])
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(User.objects.create_user(username='a', password='testpass123'))
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    def test_limiters(self):
+        """Test the sliding window and token bucket against a fixed clock."""
+        store, window, bucket = LocalStore(), SlidingWindow(2, 60), TokenBucket(2, 60)
+        self.assertEqual([window.check(store, 'w', 30)[0] for _ in range(3)], [True, True, False])
+        # Half way through the next window, one of the previous two still counts
+        self.assertEqual([window.check(store, 'w', 90)[0] for _ in range(2)], [True, False])
+        self.assertEqual([bucket.check(store, 'b', 0)[0] for _ in range(3)], [True, True, False])
+        self.assertEqual(bucket.check(store, 'b', 30), (True, None))
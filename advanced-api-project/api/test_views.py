@@ -45,10 +45,10 @@ class APIBaseTestCase(APITestCase):
         self.client = APIClient()
         
         # URLs
-        self.book_list_url = reverse('book-list')
-        self.author_list_url = reverse('author-list')
-        self.book_detail_url = lambda pk: reverse('book-detail', args=[pk])
-        self.author_detail_url = lambda pk: reverse('author-detail', args=[pk])
+        self.book_list_url = reverse('api:book-list')
+        self.author_list_url = reverse('api:author-list')
+        self.book_detail_url = lambda pk: reverse('api:book-detail', args=[pk])
+        self.author_detail_url = lambda pk: reverse('api:author-detail', args=[pk])
 
     def authenticate(self):
         """Helper method to authenticate requests."""
@@ -221,7 +221,7 @@ class AuthorTests(APIBaseTestCase):
     def test_get_author_list(self):
         """Test retrieving list of authors."""
         response = self.client.get(self.author_list_url)
-        authors = Author.objects.all()
+        authors = Author.objects.order_by('name')  # the view's default ordering
         serializer = AuthorSerializer(authors, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['results'], serializer.data)  # Assuming pagination is enabled
@@ -0,0 +1,121 @@
+"""
+Trigram indexes for substring search on book titles and author names.
+
+`icontains` compiles to LIKE '%value%', which no b-tree index can serve. On
+SQLite each searchable column gets an external-content FTS5 table using the
+trigram tokenizer, which answers LIKE '%value%' from the index. Triggers on
+the base table keep it in step with every write, including bulk_create(),
+QuerySet.update() and raw SQL.
+
+Django rebuilds a SQLite table (dropping its triggers) when a migration alters
+it, so install() runs after every migrate and puts back anything missing.
+Values shorter than three characters, values containing LIKE wildcards, SQLite
+builds without FTS5 or its trigram tokenizer (3.34+) and other databases use
+the plain icontains lookup.
+"""
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+BOOK_TITLE_TRIGRAM = 'api_book_title_trgm'
+AUTHOR_NAME_TRIGRAM = 'api_author_name_trgm'
+
+# index table -> (base table, column)
+TRIGRAM_INDEXES = {
+    BOOK_TITLE_TRIGRAM: ('api_book', 'title'),
+    AUTHOR_NAME_TRIGRAM: ('api_author', 'name'),
+}
+
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _install_statements(index, table, column):
+    return {
+        'table': (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"{column}, content='{table}', content_rowid='id', tokenize='trigram')"
+        ),
+        f'{index}_ai': (
+            f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        ),
+        f'{index}_ad': (
+            f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+        ),
+        f'{index}_au': (
+            f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {index}(rowid, {column}) VALUES (new.id, new.{column}); END"
+        ),
+    }
+
+
+def install(using_connection=None):
+    """
+    Create any missing trigram tables and triggers, and reindex the tables
+    whose triggers had to be (re)created. Returns the indexes rebuilt; none
+    where SQLite lacks FTS5 or the trigram tokenizer.
+    """
+    conn = using_connection or connection
+    if conn.vendor != 'sqlite':
+        return []
+
+    rebuilt = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        for index, (table, column) in TRIGRAM_INDEXES.items():
+            if table not in existing:
+                continue
+            statements = _install_statements(index, table, column)
+            missing = [name for name in statements if name not in existing and name != 'table']
+            if index in existing and not missing:
+                continue
+            try:
+                with transaction.atomic(using=conn.alias):
+                    cursor.execute(statements.pop('table'))
+            except OperationalError:
+                continue  # No FTS5 or trigram tokenizer; trigram_contains falls back to icontains
+            for statement in statements.values():
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+            rebuilt.append(index)
+    return rebuilt
+
+
+def uninstall(using_connection=None):
+    conn = using_connection or connection
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for index in TRIGRAM_INDEXES:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+_available = {}
+
+
+def trigram_available(index):
+    """Whether the trigram table `index` exists on the default database."""
+    key = (connection.settings_dict['NAME'], index)
+    if key not in _available:
+        _available[key] = connection.vendor == 'sqlite' and index in connection.introspection.table_names()
+    return _available[key]
+
+
+def trigram_contains(index, value, lookup, fallback):
+    """
+    Q matching rows whose column contains `value` (case-insensitively).
+
+    `lookup` is the field holding the indexed table's id, e.g. 'pk' for the
+    model itself or 'author' for a foreign key; `fallback` is the icontains
+    lookup to use when the index cannot answer the query.
+    """
+    if len(value) < MIN_TRIGRAM_LENGTH or '%' in value or '_' in value or not trigram_available(index):
+        return Q(**{fallback: value})
+    column = TRIGRAM_INDEXES[index][1]
+    ids = RawSQL(f'SELECT rowid FROM {index} WHERE {column} LIKE %s', (f'%{value}%',))
+    return Q(**{f'{lookup}__in': ids})
@@ -6,8 +6,11 @@ app_name = 'api'
 urlpatterns = [
     # API endpoints using DRF views
     path('books/', views.BookList.as_view(), name='book-list'),
+    path('books/export.<str:fmt>', views.BookExport.as_view(), name='book-export'),
+    path('books/bulk/', views.BookBulk.as_view(), name='book-bulk'),
     path('books/<int:pk>/', views.BookDetail.as_view(), name='book-detail'),
     path('authors/', views.AuthorList.as_view(), name='author-list'),
+    path('authors/bulk/', views.AuthorBulk.as_view(), name='author-bulk'),
     path('authors/<int:pk>/', views.AuthorDetail.as_view(), name='author-detail'),
 
     # Traditional Django views for web interface
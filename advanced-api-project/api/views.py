@@ -1,9 +1,19 @@
-from rest_framework import generics, permissions, filters as drf_filters
+from rest_framework import generics, permissions, status, filters as drf_filters
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.response import Response
 from django_filters import rest_framework as filters
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q
+from django.http import StreamingHttpResponse
 from .models import Book, Author
-from .serializers import BookSerializer, AuthorSerializer
+from .serializers import (
+    BOOKS_PREVIEW_LIMIT, BULK_MAX_ITEMS, AuthorBulkSerializer, AuthorSerializer,
+    BookBulkSerializer, BookSerializer, BulkDeleteSerializer,
+)
+from .streaming import EXPORT_FORMATS, export, stream_authors_with_books
+from shared.throttling import IPSlidingWindowThrottle
+from .trigram import AUTHOR_NAME_TRIGRAM, BOOK_TITLE_TRIGRAM, trigram_contains
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 
 class BookFilter(filters.FilterSet):
@@ -18,15 +28,43 @@ class BookFilter(filters.FilterSet):
     - /api/books/?author_name=John
     - /api/books/?min_year=2020&max_year=2023
     """
-    title = filters.CharFilter(lookup_expr='icontains', help_text='Filter by book title (case-insensitive)')
+    title = filters.CharFilter(method='filter_title', help_text='Filter by book title (case-insensitive)')
     min_year = filters.NumberFilter(field_name='publication_year', lookup_expr='gte', help_text='Filter by minimum publication year')
     max_year = filters.NumberFilter(field_name='publication_year', lookup_expr='lte', help_text='Filter by maximum publication year')
-    author_name = filters.CharFilter(field_name='author__name', lookup_expr='icontains', help_text='Filter by author name (case-insensitive)')
+    author_name = filters.CharFilter(method='filter_author_name', help_text='Filter by author name (case-insensitive)')
 
     class Meta:
         model = Book
         fields = ['title', 'publication_year', 'author']
 
+    def filter_title(self, queryset, name, value):
+        """Title substring match answered from the title trigram index."""
+        return queryset.filter(trigram_contains(BOOK_TITLE_TRIGRAM, value, 'pk', 'title__icontains'))
+
+    def filter_author_name(self, queryset, name, value):
+        """Author name substring match answered from the author name trigram index."""
+        return queryset.filter(trigram_contains(AUTHOR_NAME_TRIGRAM, value, 'author', 'author__name__icontains'))
+
+class TrigramSearchFilter(drf_filters.SearchFilter):
+    """
+    SearchFilter that answers ?search= from trigram indexes.
+
+    Views list `trigram_search_fields` as (lookup, index, fallback) triples
+    (see api.trigram.trigram_contains). As with SearchFilter, every term must
+    match at least one of the fields.
+    """
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'trigram_search_fields', None)
+        terms = self.get_search_terms(request)
+        if not fields or not terms:
+            return super().filter_queryset(request, queryset, view)
+        for term in terms:
+            match = Q()
+            for lookup, index, fallback in fields:
+                match |= trigram_contains(index, term, lookup, fallback)
+            queryset = queryset.filter(match)
+        return queryset
+
 class BookList(generics.ListCreateAPIView):
     """
     List all books or create a new book.
@@ -60,14 +98,46 @@ class BookList(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [
         filters.DjangoFilterBackend,
-        drf_filters.SearchFilter,
+        TrigramSearchFilter,
         drf_filters.OrderingFilter,
     ]
     filterset_class = BookFilter
     search_fields = ['title', 'author__name']
+    trigram_search_fields = [
+        ('pk', BOOK_TITLE_TRIGRAM, 'title__icontains'),
+        ('author', AUTHOR_NAME_TRIGRAM, 'author__name__icontains'),
+    ]
     ordering_fields = ['title', 'publication_year', 'author__name']
     ordering = ['-publication_year', 'title']  # default ordering
 
+class BookExport(BookList):
+    """
+    Export every book matching BookList's filters as a streamed download.
+
+    GET /api/books/export.json    JSON array
+    GET /api/books/export.ndjson  one JSON object per line
+    GET /api/books/export.csv     CSV with a header row
+
+    Filtering, searching and ordering work as on BookList; there is no
+    pagination. Books are read in chunks and written as they are serialized.
+    """
+    http_method_names = ['get', 'head', 'options']
+    pagination_class = None
+    throttle_classes = [IPSlidingWindowThrottle]
+    throttle_scope = 'export'
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export format comes from the URL, not the Accept header
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise NotFound(f"Unknown export format '{fmt}'.")
+        content, content_type = export(self.filter_queryset(self.get_queryset()), self.get_serializer(), fmt)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="books.{fmt}"'
+        return response
+
 class BookDetail(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a book instance.
@@ -84,6 +154,19 @@ class BookDetail(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+def authors_with_book_preview():
+    """
+    Authors annotated with books_count and with their first
+    BOOKS_PREVIEW_LIMIT books prefetched in one query for the whole page.
+    """
+    return Author.objects.annotate(books_count=Count('books')).prefetch_related(
+        Prefetch('books', queryset=Book.objects.all()[:BOOKS_PREVIEW_LIMIT], to_attr='preview_books')
+    )
+
+def expand_books(request):
+    """Whether the client asked for every book with ?expand=books."""
+    return 'books' in request.query_params.get('expand', '').split(',')
+
 class AuthorList(generics.ListCreateAPIView):
     """
     List all authors or create a new author.
@@ -102,18 +185,44 @@ class AuthorList(generics.ListCreateAPIView):
     Ordering:
     - Order by name
     - Example: /api/authors/?ordering=name
+
+    Nested books:
+    - Each author carries up to 5 books plus books_count
+    - ?expand=books streams every book of each author on the page
     """
-    queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [
-        drf_filters.SearchFilter,
+        TrigramSearchFilter,
         drf_filters.OrderingFilter,
     ]
     search_fields = ['name']
+    trigram_search_fields = [('pk', AUTHOR_NAME_TRIGRAM, 'name__icontains')]
     ordering_fields = ['name']
     ordering = ['name']  # default ordering
 
+    def get_queryset(self):
+        if expand_books(self.request):
+            return Author.objects.annotate(books_count=Count('books'))
+        return authors_with_book_preview()
+
+    def list(self, request, *args, **kwargs):
+        if not expand_books(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        envelope = None
+        if page is not None:
+            envelope = {
+                'count': self.paginator.page.paginator.count,
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link(),
+            }
+        authors = queryset if page is None else page
+        return StreamingHttpResponse(
+            stream_authors_with_books(authors, envelope), content_type='application/json'
+        )
+
 class AuthorDetail(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete an author instance.
@@ -125,11 +234,92 @@ class AuthorDetail(generics.RetrieveUpdateDestroyAPIView):
     Permissions:
     - Retrieve: Allow any user to view details
     - Update/Delete: Only authenticated users can modify or remove authors
+
+    ?expand=books streams every book instead of the 5-book preview.
     """
-    queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        if self.request.method == 'GET' and expand_books(self.request):
+            return Author.objects.annotate(books_count=Count('books'))
+        return authors_with_book_preview()
+
+    def retrieve(self, request, *args, **kwargs):
+        if not expand_books(request):
+            return super().retrieve(request, *args, **kwargs)
+        return StreamingHttpResponse(
+            stream_authors_with_books([self.get_object()], many=False), content_type='application/json'
+        )
+
+class BulkWriteView(generics.GenericAPIView):
+    """
+    Create, update or delete a batch of objects in one request.
+
+    POST: a list of objects to create
+    PATCH: a list of partial objects, each with the `id` it updates
+    DELETE: {"ids": [...]} of the objects to delete
+
+    Every item is validated first and errors are returned keyed by item
+    index; if any item is invalid nothing is written. Otherwise the whole
+    batch is written with bulk_create(), bulk_update() or one DELETE in a
+    single transaction. Batches hold at most BULK_MAX_ITEMS items.
+
+    Permissions:
+    - Only authenticated users can use the bulk endpoints
+
+    Throttling:
+    - Batches per user are limited by the 'bulk' rate in settings
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    throttle_scope = 'bulk'
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        ids = [item.get('id') for item in request.data if isinstance(item, dict)] \
+            if isinstance(request.data, list) else []
+        instances = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)][:BULK_MAX_ITEMS])
+        serializer = self.get_serializer(
+            instances, data=request.data, many=True, partial=True, max_length=BULK_MAX_ITEMS
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data)
+
+    def delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['ids'])
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(pk__in=ids)
+            deleted = set(queryset.values_list('pk', flat=True))
+            queryset.delete()
+        return Response({'deleted': sorted(deleted), 'not_found': sorted(ids - deleted)})
+
+class BookBulk(BulkWriteView):
+    """
+    Bulk book writes at /api/books/bulk/.
+
+    Each book names its author by id (`author`) or by name (`author_name`);
+    all the authors in a batch are looked up in one query and unknown names
+    are created. The trigram indexes are kept current by their triggers.
+    """
+    queryset = Book.objects.all()
+    serializer_class = BookBulkSerializer
+
+class AuthorBulk(BulkWriteView):
+    """Bulk author writes at /api/authors/bulk/. Deleting an author deletes its books."""
+    queryset = Author.objects.all()
+    serializer_class = AuthorBulkSerializer
+
 class BookListView(ListView):
     model = Book
     template_name = 'api/book_list.html'
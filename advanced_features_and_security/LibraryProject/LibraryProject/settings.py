@@ -36,8 +36,7 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD= True
 SESSION_COOKIE_SECURE= True
 CSRF_COOKIE_SECURE =True
-SECURE_PROXY_SSL_HEADER = True
-HTTP_X_FORWARDED_PROTO = True
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 
 
@@ -105,6 +104,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# Holds the permission cache of relationship_app.backends. LocMem is private
+# to each process; with more than one worker use a shared cache (e.g.
+# 'django.core.cache.backends.redis.RedisCache'), or permission changes made
+# through one worker are not seen by the others for up to an hour.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,7 +140,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = 'en-us'
 
-TIME_ZONE = 'EAT'
+TIME_ZONE = 'Africa/Nairobi'
 
 USE_I18N = True
 
@@ -150,6 +160,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'relationship_app.CustomUser'
 
+# Loads each request's user together with their role profile
+AUTHENTICATION_BACKENDS = ['relationship_app.backends.ProfileModelBackend']
+
 # Media files configuration for profile photos
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
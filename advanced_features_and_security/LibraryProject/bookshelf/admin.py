@@ -1,7 +1,5 @@
 from django.contrib import admin
 from .models import Book
-from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
 
 
 @admin.register(Book)
@@ -67,12 +65,3 @@ class BookAdmin(admin.ModelAdmin):
     class Meta:
         verbose_name = "Book"
         verbose_name_plural = "Books"
-
-    class CustomUserAdmin(UserAdmin):
-        model =CustomUser
-        fieldsets = UserAdmin.fieldsets + ((None, {'fields': ('date_of_birth', 'profile_photo')}),)
-        add_fieldsets = UserAdmin.add_fieldsets + (( (None, {'fields': ('date_of_birth', 'profile_photo')}),))
-        list_display = ['username', 'email', 'date_of_birth', 'is_staff']
-
-    admin.site.register(CustomUser, CustomUserAdmin)
-
@@ -2,6 +2,9 @@ from django import forms
 from .models import Book
 
 class ExampleForm(forms.ModelForm):
-    class Mete:
+    class Meta:
         model= Book
-        fields = ['title', 'author']
\ No newline at end of file
+        fields = ['title', 'author']
+
+class SearchForm(forms.Form):
+    query = forms.CharField(max_length=200)
@@ -1,11 +1,6 @@
-import profile
-from django.contrib.auth.models import AbstractUser, BaseUserManager, Permission
 from django.db import models
 
 
-from advanced_features_and_security.LibraryProject.relationship_app.models import CustomUserManager
-
-
 class Book(models.Model):
     """
     Book model representing a book in the bookshelf.
@@ -20,47 +15,15 @@ class Book(models.Model):
     publication_year = models.IntegerField()
 
     class Meta:
-        Permissions =[
+        """Meta options for the Book model."""
+        ordering = ['title']
+        permissions = [
             ("can_view", "Can view book"),
             ("can_create", "Can create book"),
             ("can_edit", "Can edit book"),
             ("can_delete", "Can delete book")
         ]
-    
+
     def __str__(self):
         """String representation of the Book model."""
         return f"{self.title} by {self.author} ({self.publication_year})"
-    
-    class Meta:
-        """Meta options for the Book model."""
-        ordering = ['title']
-
-
-class CustomUserManager(BaseUserManager):
-    def create_user(self, username, email, password=None, **extra_fields):
-        if not email:
-            raise ValueError("Email is required")
-
-        email = self.normalize_email(email)
-        user = self.model(username=username, email=email, **extra_fields)
-        user.set_password(password)
-        user.save(using=self._db)
-        return user
-
-    def create_superuser(self, username, email, password=None, **extra_fields):
-        extra_fields.setdefault('is_staff', True)
-        extra_fields.setdefault('is_superuser', True)
-        return self.create_user(username, email, password, **extra_fields)
-
-
-    class CustomUser(AbstractUser):
-        email = models.EmailField(unique=True)
-        date_of_birth = models.DateField(null=True, blank=True)
-        profile_photo = models.ImageField(upload_to='profile_photos/', null=True, blank=True)
-
-        objects =CustomUserManager()
-
-        def __str__(self):
-            return self.username
-
-
@@ -1,5 +1,13 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.test import RequestFactory, TestCase
+from unittest import mock
+
+from relationship_app.backends import _versions, invalidate_permissions
 from .models import Book
+from .views import edit_book
 
 
 class BookModelTest(TestCase):
@@ -25,3 +33,54 @@ class BookModelTest(TestCase):
         )
         expected_string = "Test Book by Test Author (2023)"
         self.assertEqual(str(book), expected_string)
+
+
+class PermissionCacheTests(TestCase):
+    """Test permission checks are answered from the cache and invalidated on change."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='editor@library.com', username='editor', password='password123'
+        )
+        self.can_edit = Permission.objects.get(codename='can_edit', content_type__app_label='bookshelf')
+        self.editors = Group.objects.create(name='Editors')
+
+    def fresh_user(self):
+        # A new instance per "request", as the session middleware would load it
+        return type(self.user).objects.get(pk=self.user.pk)
+
+    def test_checks_are_cached_across_requests(self):
+        self.user.user_permissions.add(self.can_edit)
+        self.assertTrue(self.fresh_user().has_perm('bookshelf.can_edit'))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('bookshelf.can_edit'))
+            self.assertFalse(user.has_perm('bookshelf.can_delete'))
+
+    def test_group_changes_invalidate(self):
+        self.assertFalse(self.fresh_user().has_perm('bookshelf.can_edit'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.editors)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.editors.permissions.add(self.can_edit)
+        self.assertTrue(self.fresh_user().has_perm('bookshelf.can_edit'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.editors.user_set.remove(self.user)
+        self.assertFalse(self.fresh_user().has_perm('bookshelf.can_edit'))
+
+    def test_edit_book_requires_permission(self):
+        request = RequestFactory().get('/')
+        request.user = self.fresh_user()
+        with self.assertRaises(PermissionDenied):
+            edit_book(request, 1)
+
+    def test_minting_keeps_a_concurrent_invalidation(self):
+        """Test a version set between the read and the mint is not overwritten."""
+        _versions(self.user.pk)
+        invalidate_permissions([self.user.pk])
+        current = _versions(self.user.pk)
+        # As if the read ran before invalidate_permissions() and saw no versions
+        with mock.patch.object(cache, 'get_many', return_value={}):
+            self.assertEqual(_versions(self.user.pk), current)
@@ -5,7 +5,7 @@ from .forms import SearchForm
 from .forms import ExampleForm
 
 
-@permission_required('books.can_edit', raise_exception=True)
+@permission_required('bookshelf.can_edit', raise_exception=True)
 def edit_book(request, book_id):
     book = Book.objects.get(id=book_id)
     # logic to edit the book
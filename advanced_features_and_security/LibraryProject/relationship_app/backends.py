@@ -0,0 +1,113 @@
+"""
+Authentication backend for the library.
+
+ProfileModelBackend loads each request's user together with their role
+profile, and answers permission checks from the cache instead of joining the
+permission, group and user_permissions tables on every request.
+
+A user's permission set is cached under their id and two version tokens: one
+for the user (replaced when their groups or direct permissions change) and a
+global one (replaced when a group's permissions change or a group or
+permission is deleted, which can affect any number of users). Retiring a token
+orphans the old entries, which then expire on their own.
+
+The tokens live in the default cache, so every process must share it: with a
+per-process cache such as LocMem, a change made in one process is not seen by
+the others, which keep their cached permissions for up to
+PERMISSIONS_CACHE_TIMEOUT.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+UserModel = get_user_model()
+
+PERMISSIONS_VERSION_KEY = 'perms:version'
+USER_PERMISSIONS_VERSION_KEY = 'perms:version:{}'
+USER_PERMISSIONS_KEY = 'perms:{}:{}:{}:{}'
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def _versions(user_id):
+    """The global and per-user version tokens, minting any that are missing."""
+    keys = [PERMISSIONS_VERSION_KEY, USER_PERMISSIONS_VERSION_KEY.format(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() so a token set by invalidate_permissions() meanwhile is kept
+            token = time.time_ns()
+            versions[key] = token if cache.add(key, token, None) else cache.get(key, token)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def invalidate_permissions(user_ids=None):
+    """Retire the cached permissions of `user_ids`, or of every user if None."""
+    token = time.time_ns()
+    if user_ids is None:
+        cache.set(PERMISSIONS_VERSION_KEY, token, None)
+    else:
+        cache.set_many({USER_PERMISSIONS_VERSION_KEY.format(pk): token for pk in user_ids}, None)
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's UserProfile in the same query as the
+    user, so role checks on every request (see views.get_role) cost nothing,
+    and caches each user's permissions across requests.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = USER_PERMISSIONS_KEY.format(user_obj.pk, user_obj.is_superuser, *_versions(user_obj.pk))
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(key, perms, PERMISSIONS_CACHE_TIMEOUT)
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
+
+
+def _invalidate_on_commit(user_ids=None):
+    transaction.on_commit(lambda: invalidate_permissions(user_ids))
+
+
+@receiver(m2m_changed, sender=UserModel.groups.through)
+@receiver(m2m_changed, sender=UserModel.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _invalidate_on_commit([instance.pk])
+    elif pk_set:
+        # group.user_set / permission.user_set changed: pk_set holds user ids
+        _invalidate_on_commit(list(pk_set))
+    elif action == 'post_clear':
+        _invalidate_on_commit()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_on_commit()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permissions_changed(sender, **kwargs):
+    _invalidate_on_commit()
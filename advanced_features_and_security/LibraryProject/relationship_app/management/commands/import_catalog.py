@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from relationship_app.models import Author, Book, Library
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a book catalog from CSV or JSON Lines. Each row has a title, an author '
+        'and optionally the libraries holding the book (CSV: "library", several separated '
+        'by "|"; JSONL: a string or a list).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per transaction')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint and start from the first row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+        if not 1 <= batch_size <= 10000:
+            # Each batch is looked up with IN lists, which must fit SQLite's 32766 parameters
+            raise CommandError('--batch-size must be between 1 and 10000')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+
+        done = 0 if options['restart'] else self.read_checkpoint(checkpoint, path)
+        if done:
+            self.stdout.write(f'Resuming after row {done:,} from {checkpoint}')
+
+        # Name -> id maps, loaded once; the rows themselves are never held beyond one batch
+        self.author_ids = dict(Author.objects.values_list('name', 'id'))
+        self.library_ids = dict(Library.objects.values_list('name', 'id'))
+        self.stats = {'rows': 0, 'skipped': 0, 'authors': 0, 'books': 0, 'holdings': 0}
+
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8') as source:
+            rows = islice(self.read_rows(source, fmt), done, None)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                try:
+                    with transaction.atomic():
+                        self.import_batch(batch)
+                except Exception as e:
+                    raise CommandError(
+                        f'Import failed in the batch after row {done:,}: {e}. '
+                        f'Run the command again to resume from {checkpoint}.'
+                    ) from e
+                done += len(batch)
+                self.stats['rows'] += len(batch)
+                self.write_checkpoint(checkpoint, path, done)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{done:,} rows ({self.stats["rows"] / elapsed:,.0f} rows/s)')
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.stats["rows"]:,} rows in {elapsed:.1f}s: {self.stats["authors"]:,} new authors, '
+            f'{self.stats["books"]:,} new books, {self.stats["holdings"]:,} new library holdings, '
+            f'{self.stats["skipped"]:,} rows skipped'
+        ))
+
+    def read_rows(self, source, fmt):
+        """Yield (title, author, [library names]) per input row, or None for a row that can't be used."""
+        if fmt == 'csv':
+            for row in csv.DictReader(source):
+                libraries = [name.strip() for name in (row.get('library') or '').split('|')]
+                yield self.clean(row.get('title'), row.get('author'), libraries)
+        else:
+            for line in source:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield None
+                    continue
+                if not isinstance(row, dict):
+                    yield None
+                    continue
+                libraries = row.get('library') or []
+                if isinstance(libraries, str):
+                    libraries = [libraries]
+                yield self.clean(row.get('title'), row.get('author'), libraries)
+
+    def clean(self, title, author, libraries):
+        # JSON values may be numbers, lists or objects
+        if not isinstance(title, str) or not isinstance(author, str):
+            return None
+        title, author = title.strip(), author.strip()
+        if not title or not author or len(title) > 200 or len(author) > 100:
+            return None
+        return title, author, [name for name in libraries if isinstance(name, str) and name and len(name) <= 100]
+
+    def import_batch(self, batch):
+        rows = [row for row in batch if row is not None]
+        self.stats['skipped'] += len(batch) - len(rows)
+
+        new_authors = {author for _, author, _ in rows} - self.author_ids.keys()
+        if new_authors:
+            self.stats['authors'] += len(new_authors)
+            self.author_ids.update(self.bulk_insert(Author, 'name', new_authors))
+
+        new_libraries = {name for _, _, names in rows for name in names} - self.library_ids.keys()
+        if new_libraries:
+            self.library_ids.update(self.bulk_insert(Library, 'name', new_libraries))
+
+        books = {(self.author_ids[author], title) for title, author, _ in rows}
+        book_ids = self.book_ids(books)
+        missing = books - book_ids.keys()
+        if missing:
+            Book.objects.bulk_create(
+                [Book(author_id=author_id, title=title) for author_id, title in missing], ignore_conflicts=True
+            )
+            self.stats['books'] += len(missing)
+
+        holdings = {
+            (self.library_ids[name], self.author_ids[author], title)
+            for title, author, names in rows for name in names
+        }
+        if holdings:
+            if missing:
+                book_ids.update(self.book_ids(missing))
+            holdings = {(library_id, book_ids[author_id, title]) for library_id, author_id, title in holdings}
+            through = Library.books.through
+            holdings -= set(through.objects.filter(
+                book_id__in={book_id for _, book_id in holdings}
+            ).values_list('library_id', 'book_id'))
+            if not holdings:
+                return
+            # bulk_create() sends no m2m_changed, so the counts are updated
+            # here: new books per library, and new authors per library less
+            # those it already held a book by
+            author_of = {book_id: author_id for (author_id, _), book_id in book_ids.items()}
+            new_books, new_authors = Counter(), {}
+            for library_id, book_id in holdings:
+                new_books[library_id] += 1
+                new_authors.setdefault(library_id, set()).add(author_of[book_id])
+            for library_id, author_id in Book.objects.filter(
+                libraries__in=set(new_authors), author_id__in=set().union(*new_authors.values())
+            ).values_list('libraries', 'author_id').distinct():
+                new_authors[library_id].discard(author_id)
+
+            through.objects.bulk_create(
+                [through(library_id=library_id, book_id=book_id) for library_id, book_id in holdings],
+                ignore_conflicts=True
+            )
+            self.stats['holdings'] += len(holdings)
+            for library_id, books in new_books.items():
+                Library.objects.filter(pk=library_id).update(
+                    book_count=F('book_count') + books,
+                    author_count=F('author_count') + len(new_authors[library_id]),
+                )
+
+    def book_ids(self, books):
+        """(author id, title) -> id for those of `books` already stored, in one query."""
+        found = Book.objects.filter(
+            author_id__in={author_id for author_id, _ in books},
+            title__in={title for _, title in books},
+        ).values_list('author_id', 'title', 'id')
+        return {(author_id, title): pk for author_id, title, pk in found if (author_id, title) in books}
+
+    def bulk_insert(self, model, field, values):
+        """Insert `values` of `field` (ignoring existing ones) and return a value -> id map."""
+        model.objects.bulk_create([model(**{field: value}) for value in values], ignore_conflicts=True)
+        return dict(model.objects.filter(**{f'{field}__in': values}).values_list(field, 'id'))
+
+    def read_checkpoint(self, checkpoint, path):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state.get('source') != os.path.abspath(path):
+            raise CommandError(f'{checkpoint} belongs to {state.get("source")}; use --restart or --checkpoint')
+        return state['rows']
+
+    def write_checkpoint(self, checkpoint, path, rows):
+        # Written to a temporary file and renamed so a crash never leaves half a checkpoint
+        tmp = f'{checkpoint}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'source': os.path.abspath(path), 'rows': rows}, f)
+        os.replace(tmp, checkpoint)
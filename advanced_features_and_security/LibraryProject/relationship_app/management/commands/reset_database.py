@@ -0,0 +1,31 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the SQLite database and rebuild it from the migrations. Needed once for '
+        'databases migrated before CustomUser was added to relationship_app 0001.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('reset_database only rebuilds SQLite databases')
+        path = str(connection.settings_dict['NAME'])
+        if options['interactive']:
+            answer = input(f'This deletes every row in {path}. Type "yes" to continue: ')
+            if answer != 'yes':
+                raise CommandError('Reset cancelled')
+
+        connection.close()
+        if os.path.exists(path):
+            os.remove(path)
+        call_command('migrate', interactive=False, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {path}'))
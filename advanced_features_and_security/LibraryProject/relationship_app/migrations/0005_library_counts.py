@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_holdings(apps, schema_editor):
+    Library = apps.get_model('relationship_app', 'Library')
+    holdings = Library.books.through.objects.filter(library_id=OuterRef('pk')).order_by().values('library_id')
+    Library.objects.update(
+        book_count=Coalesce(Subquery(holdings.annotate(n=Count('book_id')).values('n')[:1]), 0),
+        author_count=Coalesce(Subquery(holdings.annotate(n=Count('book__author_id', distinct=True)).values('n')[:1]), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0004_author_book_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='author_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_holdings, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
-from django.db.models.signals import post_save
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 # Custom User Manager
@@ -64,21 +65,65 @@ class CustomUser(AbstractUser):
 class Author(models.Model):
     name = models.CharField(max_length=100)
 
+    class Meta:
+        # Authors are looked up by name (import_catalog, query_samples)
+        constraints = [models.UniqueConstraint(fields=['name'], name='unique_author_name')]
+
     def __str__(self):
         return self.name
 
+class BookQuerySet(models.QuerySet):
+    def in_library(self, library):
+        """Books held by `library`, with their authors, in one query."""
+        return self.filter(libraries=library).select_related('author')
+
 # 📚 Book Model: Each book is written by one author
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
 
+    class Meta:
+        # One book per title per author; also indexes lookups by author
+        constraints = [models.UniqueConstraint(fields=['author', 'title'], name='unique_book_author_title')]
+
+    objects = BookQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        book = super().from_db(db, field_names, values)
+        # Lets recount_author_change() tell whether a save moved the book to another author
+        book._loaded_author_id = book.__dict__.get('author_id')
+        return book
+
     def __str__(self):
         return f"{self.title} by {self.author.name}"
 
+class LibraryQuerySet(models.QuerySet):
+    def holding(self, book):
+        """Libraries holding `book`, found through the holdings table's book index."""
+        return self.filter(books=book)
+
+    def refresh_counts(self):
+        """Recompute book_count and author_count from the holdings table."""
+        holdings = Library.books.through.objects.filter(library_id=models.OuterRef('pk')).order_by()
+        return self.update(
+            book_count=Coalesce(models.Subquery(
+                holdings.values('library_id').annotate(n=models.Count('book_id')).values('n')[:1]
+            ), 0),
+            author_count=Coalesce(models.Subquery(
+                holdings.values('library_id').annotate(n=models.Count('book__author_id', distinct=True)).values('n')[:1]
+            ), 0),
+        )
+
 # 🏛️ Library Model: A library can hold many books
 class Library(models.Model):
     name = models.CharField(max_length=100)
     books = models.ManyToManyField(Book, related_name='libraries')
+    # Kept current by the m2m_changed receiver at the bottom of this module
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+    author_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = LibraryQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -105,17 +150,88 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.role}"
 
-# Signal to automatically create UserProfile when a CustomUser is created
+# Signal to give every CustomUser exactly one UserProfile
 @receiver(post_save, sender=CustomUser)
-def create_user_profile(sender, instance, created, **kwargs):
+def ensure_user_profile(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Partial saves such as the last_login update on every login can't have
+    # lost the profile, so they cost nothing; full saves create it if missing
+    if raw or (update_fields and not created):
+        return
     if created:
         UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
     else:
-        UserProfile.objects.create(user=instance)
+        UserProfile.objects.get_or_create(user=instance)
 
 
+# Library aggregates: each change to the holdings table snapshots the rows it
+# can affect before and after, and adds the difference to the counts
+def _holdings_snapshot(library_ids, book_ids, author_ids):
+    """
+    Per library: how many of `book_ids` it holds, and which of `author_ids`
+    it holds any book by. `book_ids` of None means all of its books.
+    """
+    holdings = Library.books.through.objects.filter(library_id__in=library_ids)
+    books = holdings if book_ids is None else holdings.filter(book_id__in=book_ids)
+    snapshot = {pk: [0, set()] for pk in library_ids}
+    for library_id, count in books.values('library_id').annotate(n=models.Count('pk')).values_list('library_id', 'n'):
+        snapshot[library_id][0] = count
+    for library_id, author_id in holdings.filter(book__author_id__in=author_ids).values_list(
+            'library_id', 'book__author_id').distinct():
+        snapshot[library_id][1].add(author_id)
+    return snapshot
+
+@receiver(m2m_changed, sender=Library.books.through)
+def update_library_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if reverse:
+            # book.libraries changed: the book is `instance`, the libraries are pk_set
+            book_ids = {instance.pk}
+            library_ids = set(pk_set) if pk_set is not None else set(
+                Library.objects.holding(instance).values_list('pk', flat=True))
+        else:
+            library_ids = {instance.pk}
+            book_ids = set(pk_set) if pk_set is not None else None
+        authors = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=book_ids)
+        if book_ids is None:
+            authors = authors.filter(libraries=instance)
+        author_ids = set(authors.values_list('author_id', flat=True))
+        instance._holdings_change = (library_ids, book_ids, author_ids,
+                                     _holdings_snapshot(library_ids, book_ids, author_ids))
+    elif hasattr(instance, '_holdings_change'):
+        library_ids, book_ids, author_ids, before = instance._holdings_change
+        del instance._holdings_change
+        after = _holdings_snapshot(library_ids, book_ids, author_ids)
+        for library_id in library_ids:
+            books = after[library_id][0] - before[library_id][0]
+            authors = len(after[library_id][1]) - len(before[library_id][1])
+            if books or authors:
+                Library.objects.filter(pk=library_id).update(
+                    book_count=models.F('book_count') + books,
+                    author_count=models.F('author_count') + authors,
+                )
+
+@receiver(pre_delete, sender=Book)
+def remember_book_libraries(sender, instance, **kwargs):
+    # Deleting a book drops its holdings without sending m2m_changed
+    instance._library_ids = list(Library.objects.holding(instance).values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Book)
+def recount_book_libraries(sender, instance, **kwargs):
+    library_ids = getattr(instance, '_library_ids', None)
+    if library_ids:
+        Library.objects.filter(pk__in=library_ids).refresh_counts()
+
+@receiver(post_save, sender=Book)
+def recount_author_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Moving a held book to another author changes its libraries' author_count.
+    QuerySet.update() and bulk_update() send no signal; call refresh_counts()
+    on the libraries after those.
+    """
+    if created or raw or (update_fields is not None and 'author' not in update_fields):
+        return
+    loaded = getattr(instance, '_loaded_author_id', None)
+    instance._loaded_author_id = instance.author_id
+    # An instance not loaded from the database may have changed anything
+    if loaded is None or loaded != instance.author_id:
+        Library.objects.holding(instance).refresh_counts()
@@ -24,13 +24,23 @@ def get_books_by_author(author_name):
 def get_books_in_library(library_name):
     try:
         library = Library.objects.get(name=library_name)
-        books = library.books.all()  # ManyToManyField access
-        print(f"\nBooks in {library.name}:")
+        books = Book.objects.in_library(library)  # One query, authors included
+        print(f"\nBooks in {library.name} ({library.book_count} books by {library.author_count} authors):")
         for book in books:
             print(f"- {book.title} by {book.author.name}")
     except Library.DoesNotExist:
         print(f"Library '{library_name}' not found.")
 
+# 🔎 List the libraries holding a book
+def get_libraries_holding_book(title):
+    book = Book.objects.filter(title=title).first()
+    if book is None:
+        print(f"Book '{title}' not found.")
+        return
+    print(f"\nLibraries holding {book.title}:")
+    for library in Library.objects.holding(book):  # One query on the holdings index
+        print(f"- {library.name}")
+
 # 3️⃣ Retrieve the librarian for a library (using reverse relationship)
 def get_librarian_for_library(library_name):
     try:
@@ -65,6 +75,7 @@ def get_librarian_for_library_by_name(library_name):
 if __name__ == "__main__":
     get_books_by_author("Chinua Achebe")
     get_books_in_library("Central Library")
+    get_libraries_holding_book("Things Fall Apart")
     get_librarian_for_library("Central Library")
     get_librarian_for_library_direct("Central Library")
     get_librarian_for_library_by_name("Central Library")
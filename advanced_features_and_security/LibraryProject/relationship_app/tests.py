@@ -1,3 +1,229 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import Author, Book, CustomUser, Library, UserProfile
+
+
+class ImportCatalogTests(TestCase):
+    """Test the import_catalog management command."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        Author.objects.create(name='George Orwell')
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command('import_catalog', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_csv_import(self):
+        """Test authors, books and holdings are created and existing authors reused."""
+        path = self.write('catalog.csv', (
+            'title,author,library\n'
+            '1984,George Orwell,Central|University\n'
+            'Animal Farm,George Orwell,Central\n'
+            'Emma,Jane Austen,\n'
+            ',Nobody,Central\n'
+        ))
+        output = self.run_import(path, batch_size=2)
+        self.assertIn('rows/s', output)
+        self.assertIn('1 new authors, 3 new books, 3 new library holdings, 1 rows skipped', output)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(
+            sorted(Library.objects.get(name='Central').books.values_list('title', flat=True)), ['1984', 'Animal Farm']
+        )
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+        # Importing again adds nothing
+        output = self.run_import(path)
+        self.assertIn('0 new authors, 0 new books, 0 new library holdings', output)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_jsonl_import(self):
+        path = self.write('catalog.jsonl', '\n'.join([
+            json.dumps({'title': 'Persuasion', 'author': 'Jane Austen', 'library': ['Central', 'Digital']}),
+            json.dumps({'title': 'Emma', 'author': 'Jane Austen', 'library': 'Digital'}),
+            'not json',
+            json.dumps({'title': 1984, 'author': 'George Orwell'}),
+            json.dumps({'title': 'Emma', 'author': ['Jane Austen']}),
+            json.dumps(['Emma', 'Jane Austen']),
+        ]))
+        output = self.run_import(path)
+        self.assertIn('4 rows skipped', output)
+        self.assertEqual(Library.objects.get(name='Digital').books.count(), 2)
+        self.assertEqual(Author.objects.get(name='Jane Austen').books.count(), 2)
+
+    def test_counts_are_added_per_batch(self):
+        """Test each batch adds to the library counts instead of recounting."""
+        central = Library.objects.create(name='Central')
+        central.books.add(Book.objects.create(title='1984', author=Author.objects.get(name='George Orwell')))
+        path = self.write('catalog.csv', (
+            'title,author,library\n'
+            'Animal Farm,George Orwell,Central\n'
+            'Emma,Jane Austen,Central|Digital\n'
+            'Persuasion,Jane Austen,Central\n'
+            '1984,George Orwell,Central\n'
+        ))
+        with mock.patch('relationship_app.models.LibraryQuerySet.refresh_counts') as refresh_counts:
+            self.run_import(path, batch_size=1)
+        refresh_counts.assert_not_called()
+
+        counts = {library.name: (library.book_count, library.author_count) for library in Library.objects.all()}
+        self.assertEqual(counts, {'Central': (4, 2), 'Digital': (1, 1)})
+        Library.objects.refresh_counts()
+        self.assertEqual(
+            {library.name: (library.book_count, library.author_count) for library in Library.objects.all()}, counts
+        )
+
+    def test_resume_from_checkpoint(self):
+        """Test a failed import resumes after the last committed batch."""
+        path = self.write('catalog.csv', 'title,author\n' + ''.join(f'Book {i},Author {i % 3}\n' for i in range(6)))
+        original = Book.objects.bulk_create
+        calls = []
+
+        def fail_on_second_batch(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Book.objects, 'bulk_create', side_effect=fail_on_second_batch):
+            with self.assertRaisesMessage(CommandError, 'resume'):
+                self.run_import(path, batch_size=2)
+        self.assertEqual(Book.objects.count(), 2)
+        with open(f'{path}.checkpoint') as f:
+            self.assertEqual(json.load(f)['rows'], 2)
+
+        output = self.run_import(path, batch_size=2)
+        self.assertIn('Resuming after row 2', output)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), [f'Book {i}' for i in range(6)])
+
+
+class LibraryHoldingsTests(TestCase):
+    """Test the holdings queries and the library aggregates kept on m2m_changed."""
+
+    def setUp(self):
+        orwell = Author.objects.create(name='George Orwell')
+        austen = Author.objects.create(name='Jane Austen')
+        self.nineteen = Book.objects.create(title='1984', author=orwell)
+        self.farm = Book.objects.create(title='Animal Farm', author=orwell)
+        self.emma = Book.objects.create(title='Emma', author=austen)
+        self.library = Library.objects.create(name='Central')
+
+    def assertCounts(self, library, books, authors):
+        library.refresh_from_db()
+        self.assertEqual((library.book_count, library.author_count), (books, authors))
+
+    def test_books_in_library_in_one_query(self):
+        self.library.books.add(self.nineteen, self.emma)
+        with self.assertNumQueries(1):
+            titles = [(book.title, book.author.name) for book in Book.objects.in_library(self.library)]
+        self.assertCountEqual(titles, [('1984', 'George Orwell'), ('Emma', 'Jane Austen')])
+
+    def test_libraries_holding_a_book(self):
+        other = Library.objects.create(name='Digital')
+        self.farm.libraries.add(self.library, other)
+        with self.assertNumQueries(1):
+            names = sorted(library.name for library in Library.objects.holding(self.farm))
+        self.assertEqual(names, ['Central', 'Digital'])
+
+    def test_counts_follow_adds_removes_and_clears(self):
+        self.library.books.add(self.nineteen, self.farm)
+        self.assertCounts(self.library, 2, 1)
+        self.library.books.add(self.nineteen, self.emma)
+        self.assertCounts(self.library, 3, 2)
+        self.library.books.remove(self.farm)
+        self.assertCounts(self.library, 2, 2)
+        self.library.books.remove(self.nineteen, self.farm)
+        self.assertCounts(self.library, 1, 1)
+        self.library.books.clear()
+        self.assertCounts(self.library, 0, 0)
+
+    def test_counts_follow_reverse_changes_and_deletes(self):
+        other = Library.objects.create(name='Digital')
+        self.emma.libraries.add(self.library, other)
+        self.nineteen.libraries.add(self.library)
+        self.assertCounts(self.library, 2, 2)
+        self.assertCounts(other, 1, 1)
+        self.emma.libraries.clear()
+        self.assertCounts(other, 0, 0)
+        self.nineteen.delete()
+        self.assertCounts(self.library, 0, 0)
+
+    def test_counts_follow_author_changes(self):
+        self.library.books.add(self.nineteen, self.emma)
+        self.assertCounts(self.library, 2, 2)
+        book = Book.objects.get(pk=self.emma.pk)
+        book.author = self.nineteen.author
+        book.save()
+        self.assertCounts(self.library, 2, 1)
+
+        # Saves that leave the author alone don't recount
+        book.title = 'Emma (annotated)'
+        with self.assertNumQueries(1):
+            book.save()
+
+    def test_view_lists_books_in_constant_queries(self):
+        self.library.books.add(self.nineteen)
+        url = f'/library/{self.library.pk}/'
+        with self.assertNumQueries(2):
+            response = self.client.get(url, secure=True)
+        self.assertContains(response, '1 book by 1 author')
+        self.library.books.add(self.farm, self.emma)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, secure=True)
+        self.assertContains(response, 'Emma by Jane Austen')
+
+
+class RoleLookupTests(TestCase):
+    """Test role checks read the profile loaded with the user and logins don't touch it."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='member@library.com', username='member', password='password123'
+        )
+
+    def profile_queries(self, queries):
+        return [q['sql'] for q in queries if 'relationship_app_userprofile' in q['sql']]
+
+    def test_profile_is_created_once(self):
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+        self.user.first_name = 'John'
+        self.user.save()
+        self.assertEqual(UserProfile.objects.filter(user=self.user).count(), 1)
+
+    def test_login_does_not_save_the_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(email='member@library.com', password='password123'))
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_role_comes_with_the_user(self):
+        """Test the profile is joined to the user query rather than fetched on its own."""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/member/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        profile_queries = self.profile_queries(queries)
+        self.assertEqual(len(profile_queries), 1)
+        self.assertIn('relationship_app_customuser', profile_queries[0])
 
-# Create your tests here.
+    def test_other_roles_are_refused(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/librarian/', secure=True)
+        self.assertEqual(response.status_code, 302)
@@ -5,7 +5,6 @@ from django.views.generic.detail import DetailView
 from .views import UserLoginView, UserLogoutView, register
 from .views import list_books
 from django.urls import path
-from .views import CustomLoginView, CustomLogoutView, register, list_books
 from . import views
 from .views import list_books
 
@@ -22,8 +21,6 @@ urlpatterns = [
     path('admin/', admin_view, name='admin_view'),
     path('librarian/', librarian_view, name='librarian_view'),
     path('member/', member_view, name='member_view'),
-    path('login/', CustomLoginView.as_view(template_name='relationship_app/login.html'), name='login'),
-    path('logout/', CustomLogoutView.as_view(template_name='relationship_app/logout.html'), name='logout'),
     path('register/', views.register, name='register'),
     path('books/', list_books, name='list_books'),
 ]
\ No newline at end of file
@@ -42,16 +42,17 @@ def list_books(request):
     books = Book.objects.select_related('author').all()
     return render(request, 'relationship_app/list_books.html', {'books': books})
 
-def list_books(request):
-    books = Book.objects.all()
-    return render(request, 'relationship_app/list_books.html', {'books': books})
-
 
 class LibraryDetailView(DetailView):
     model = Library
     template_name = 'relationship_app/library_detail.html'
     context_object_name = 'library'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['books'] = Book.objects.in_library(self.object)
+        return context
+
 
 
 
@@ -73,14 +74,26 @@ def register(request):
     return render(request, 'relationship_app/register.html', {'form': form})
 
 # Role-based access control functions
+def get_role(user):
+    """
+    The user's role, or None. The auth backend loads the profile with the
+    user, so this runs no query for the request's user.
+    """
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.profile.role
+    except UserProfile.DoesNotExist:
+        return None
+
 def is_admin(user):
-    return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'Admin'
+    return get_role(user) == 'Admin'
 
 def is_librarian(user):
-    return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'Librarian'
+    return get_role(user) == 'Librarian'
 
 def is_member(user):
-    return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'Member'
+    return get_role(user) == 'Member'
 
 # Role-based views
 @user_passes_test(is_admin)
@@ -0,0 +1,73 @@
+"""
+Streamed exports of a queryset as a JSON array, newline-delimited JSON or CSV.
+
+Rows are read with iterator() in chunks of EXPORT_CHUNK_SIZE and serialized one
+at a time, so memory use stays flat however large the table is, and the first
+bytes go out as soon as the first chunk is read.
+"""
+import csv
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+# Rows fetched per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Characters gathered before a block is handed to the server
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder)
+
+
+def _buffered(pieces):
+    block, length = [], 0
+    for piece in pieces:
+        block.append(piece)
+        length += len(piece)
+        if length >= EXPORT_BUFFER_SIZE:
+            yield ''.join(block)
+            block, length = [], 0
+    if block:
+        yield ''.join(block)
+
+
+def json_array(rows, fields):
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',\n' if i else '\n') + _dumps(row)
+    yield '\n]\n'
+
+
+def ndjson(rows, fields):
+    for row in rows:
+        yield _dumps(row) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def csv_rows(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row.get(field) for field in fields])
+
+
+# Export format -> (writer, content type)
+EXPORT_FORMATS = {
+    'json': (json_array, 'application/json'),
+    'ndjson': (ndjson, 'application/x-ndjson'),
+    'csv': (csv_rows, 'text/csv; charset=utf-8'),
+}
+
+
+def export(queryset, serializer, fmt):
+    """Return (content iterator, content type) for `queryset` in format `fmt`."""
+    writer, content_type = EXPORT_FORMATS[fmt]
+    rows = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return _buffered(writer(rows, list(serializer.fields))), content_type
@@ -1,7 +1,59 @@
 from rest_framework import serializers
 from .models import Book
 
+# Largest batch accepted by BookViewSet.bulk
+BULK_MAX_ITEMS = 1000
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Writes a whole batch with bulk_create() or bulk_update().
+
+    To update, pass the instances as a dict of pk -> instance (see
+    QuerySet.in_bulk()); each item names the instance it changes by `id`.
+    Errors come back keyed by item index.
+    """
+    def to_internal_value(self, data):
+        self._seen, self._targets = set(), []
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        pk = data.get('id') if isinstance(data, dict) else None
+        if pk not in self.instance:
+            raise serializers.ValidationError({'id': ['No such object.']})
+        if pk in self._seen:
+            raise serializers.ValidationError({'id': ['Listed more than once.']})
+        self._seen.add(pk)
+        self.child.instance = self.instance[pk]
+        try:
+            attrs = super().run_child_validation(data)
+        finally:
+            self.child.instance = None
+        self._targets.append(self.instance[pk])
+        return attrs
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create([model(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        fields = set()
+        for obj, attrs in zip(self._targets, validated_data):
+            for field, value in attrs.items():
+                setattr(obj, field, value)
+            fields.update(attrs)
+        if fields:
+            self.child.Meta.model.objects.bulk_update(self._targets, fields)
+        return self._targets
+
 class BookSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=BULK_MAX_ITEMS
+    )
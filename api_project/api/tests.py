@@ -1,3 +1,134 @@
-from django.test import TestCase
+import csv
+import io
+import json
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import Book
+from shared.profiling import QueryProfilerMiddleware, profiles
+
+
+class BookExportTests(TestCase):
+    """Test the streamed book exports."""
+
+    def setUp(self):
+        Book.objects.create(title='Dune', author='Frank Herbert')
+        Book.objects.create(title='Emma, Volume 1', author='Jane Austen')
+
+    def export(self, fmt):
+        response = self.client.get(reverse('book-export', args=[fmt]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_json_and_ndjson(self):
+        """Test both JSON formats hold every book in id order."""
+        self.assertEqual([book['title'] for book in json.loads(self.export('json'))], ['Dune', 'Emma, Volume 1'])
+        lines = self.export('ndjson').splitlines()
+        self.assertEqual([json.loads(line)['author'] for line in lines], ['Frank Herbert', 'Jane Austen'])
+
+    def test_csv(self):
+        """Test the CSV export has a header row and quotes commas."""
+        rows = list(csv.reader(io.StringIO(self.export('csv'))))
+        self.assertEqual(rows[0], ['id', 'title', 'author'])
+        self.assertEqual(rows[2][1:], ['Emma, Volume 1', 'Jane Austen'])
+
+
+class BookBulkTests(TestCase):
+    """Test BookViewSet's bulk action."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='importer', password='testpass123'))
+        self.url = reverse('book_all-bulk')
+
+    def test_create_in_one_insert(self):
+        """Test a batch is validated and written with a single INSERT."""
+        batch = [{'title': f'Book {i}', 'author': 'Someone'} for i in range(20)]
+        # savepoint, insert, release
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, batch, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Book.objects.count(), 20)
+
+    def test_errors_per_item_and_update(self):
+        """Test invalid items are reported by index and PATCH updates by id."""
+        response = self.client.post(self.url, [{'title': 'Fine', 'author': 'A'}, {'title': 'No author'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), [1])
+        self.assertFalse(Book.objects.exists())
+
+        book = Book.objects.create(title='Old', author='A')
+        response = self.client.patch(self.url, [{'id': book.pk, 'title': 'New'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'New')
+
+        response = self.client.delete(self.url, {'ids': [book.pk]}, format='json')
+        self.assertEqual(response.data, {'deleted': [book.pk], 'not_found': []})
+
+
+class ThrottleTests(TestCase):
+    """Test the bulk and export rate limits."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'bulk': '2/min'}})
+    def test_bulk_is_limited_per_user(self):
+        url = reverse('book_all-bulk')
+        self.client.force_authenticate(User.objects.create_user(username='a', password='testpass123'))
+        statuses = [self.client.post(url, [{'title': 'T', 'author': 'A'}], format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses, [201, 201, 429])
+
+        # Other actions and other users are not affected
+        self.assertEqual(self.client.get(reverse('book_all-list')).status_code, 200)
+        self.client.force_authenticate(User.objects.create_user(username='b', password='testpass123'))
+        self.assertEqual(self.client.post(url, [{'title': 'T', 'author': 'A'}], format='json').status_code, 201)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'export': '1/min'}})
+    def test_export_is_limited_per_ip(self):
+        url = reverse('book-export', args=['json'])
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+
+@override_settings(QUERY_PROFILER_SAMPLE_RATE=1.0, QUERY_PROFILER_N_PLUS_ONE_THRESHOLD=3)
+class QueryProfilerTests(TestCase):
+    """Test the query profiler middleware and endpoint."""
+
+    def setUp(self):
+        profiles.clear()
+        self.client = APIClient()
+        self.ids = [Book.objects.create(title=f'Book {i}', author='Someone').pk for i in range(3)]
+
+    def test_responses_carry_server_timing(self):
+        response = self.client.get(reverse('book-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+$')
+        profile = profiles.get(response['X-Query-Profile'])
+        self.assertEqual((profile.view, profile.n_plus_one), ('BookList', []))
+
+    def test_n_plus_one_is_reported_with_its_stack(self):
+        def view(request):
+            # One query per book
+            return HttpResponse(', '.join(Book.objects.get(pk=pk).title for pk in self.ids))
+
+        with self.assertLogs('shared.profiling', 'WARNING'):
+            response = QueryProfilerMiddleware(view)(RequestFactory().get('/books/'))
+
+        url = reverse('query-profile-detail', args=[response['X-Query-Profile']])
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        [n_plus_one] = self.client.get(url).data['n_plus_one']
+        self.assertEqual(n_plus_one['count'], 3)
+        self.assertTrue(n_plus_one['stack'][-1].startswith('api/tests.py:'))
@@ -9,6 +9,9 @@ router.register(r'books_all', views.BookViewSet, basename='book_all')
 urlpatterns = [
     # Route for the BookList view (ListAPIView)
     path('books/', views.BookList.as_view(), name='book-list'),
+
+    # Streamed export of every book: books/export.json, .ndjson or .csv
+    path('books/export.<str:fmt>', views.BookExport.as_view(), name='book-export'),
     
     # Include the router URLs for BookViewSet (all CRUD operations)
     path('', include(router.urls)),
@@ -1,7 +1,14 @@
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework import generics, viewsets, permissions
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from .export import EXPORT_FORMATS, export
 from .models import Book
-from .serializers import BookSerializer
+from .serializers import BULK_MAX_ITEMS, BookSerializer, BulkDeleteSerializer
+from shared.throttling import IPSlidingWindowThrottle
 
 # Create your views here.
 
@@ -14,6 +21,29 @@ class BookList(generics.ListAPIView):
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]  # Allow public access
 
+class BookExport(generics.GenericAPIView):
+    """
+    Public view - streams every book as a download
+    /api/books/export.json, /api/books/export.ndjson or /api/books/export.csv
+    """
+    queryset = Book.objects.order_by('pk')
+    serializer_class = BookSerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [IPSlidingWindowThrottle]
+    throttle_scope = 'export'
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export format comes from the URL, not the Accept header
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise NotFound(f"Unknown export format '{fmt}'.")
+        content, content_type = export(self.get_queryset(), self.get_serializer(), fmt)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="books.{fmt}"'
+        return response
+
 class BookViewSet(viewsets.ModelViewSet):
     """
     Protected view - requires authentication for all CRUD operations
@@ -22,3 +52,40 @@ class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticated]  # Require authentication
+    throttle_scope = None
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], throttle_scope='bulk')
+    def bulk(self, request):
+        """
+        Write a batch of books in one transaction at /api/books_all/bulk/
+        POST: a list of books to create
+        PATCH: a list of partial books, each with the `id` it updates
+        DELETE: {"ids": [...]} of the books to delete
+        Errors are returned per item (keyed by index) and nothing is written
+        unless every item is valid.
+        """
+        if request.method == 'DELETE':
+            serializer = BulkDeleteSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            ids = set(serializer.validated_data['ids'])
+            with transaction.atomic():
+                queryset = self.get_queryset().filter(pk__in=ids)
+                deleted = set(queryset.values_list('pk', flat=True))
+                queryset.delete()
+            return Response({'deleted': sorted(deleted), 'not_found': sorted(ids - deleted)})
+
+        if request.method == 'PATCH':
+            ids = [item.get('id') for item in request.data if isinstance(item, dict)] \
+                if isinstance(request.data, list) else []
+            instances = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)][:BULK_MAX_ITEMS])
+            serializer = self.get_serializer(
+                instances, data=request.data, many=True, partial=True, max_length=BULK_MAX_ITEMS
+            )
+        else:
+            serializer = self.get_serializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+        return Response(
+            serializer.data, status=status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+        )
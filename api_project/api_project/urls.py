@@ -16,10 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from shared.profiling import QueryProfileDetail, QueryProfileList
 from rest_framework.authtoken.views import obtain_auth_token
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/profiler/', QueryProfileList.as_view(), name='query-profile-list'),
+    path('api/profiler/<str:profile_id>/', QueryProfileDetail.as_view(), name='query-profile-detail'),
     path('api/', include('api.urls')),
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 ]
@@ -0,0 +1,210 @@
+"""
+Page and fragment caching for the blog.
+
+Cache keys carry version tokens instead of being deleted one by one:
+
+- every post has its own token, replaced when the post, its tags or its
+  comments change;
+- the site has a token, replaced when any post is saved, retagged or deleted
+  (lists, tag pages and related-post links all depend on other posts);
+- the publishing schedule has a token, replaced when the next scheduled post
+  goes live, so pages listing published posts pick it up without any write.
+
+A token is the time it was minted in nanoseconds, so it also serves as the
+Last-Modified date of anything keyed on it, and an evicted token is simply
+re-minted, which can only cause a miss and never a stale hit.
+
+Anonymous GET requests to views wrapped in cache_anonymous_page() get the
+whole rendered response from the cache, with an ETag and Last-Modified so
+browsers can revalidate with a 304. Templates cache per-post fragments with
+{% cache %} keyed on the post id, updated_at and its token.
+"""
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .models import Comment, Post
+
+BLOG_CACHE = getattr(settings, 'BLOG_CACHE', 'default')
+PAGE_CACHE_TIMEOUT = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60 * 5)
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+
+SITE_VERSION_KEY = 'blog_cache:site'
+POST_VERSION_KEY = 'blog_cache:post:{}'
+SCHEDULE_KEY = 'blog_cache:schedule'
+HISTOGRAM_KEY = 'blog_cache:histogram:{}'
+PAGE_KEY = 'blog_cache:page:{}'
+
+
+def _cache():
+    return caches[BLOG_CACHE]
+
+
+def _mint():
+    return time.time_ns()
+
+
+def get_versions(keys):
+    """Current tokens for `keys`, minting any that are missing."""
+    cache = _cache()
+    versions = cache.get_many(keys)
+    missing = {key: _mint() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def site_version():
+    return get_versions([SITE_VERSION_KEY])[SITE_VERSION_KEY]
+
+
+def post_versions(post_ids):
+    """Map of post id -> token for each of `post_ids`."""
+    keys = {POST_VERSION_KEY.format(pk): pk for pk in post_ids}
+    return {keys[key]: version for key, version in get_versions(list(keys)).items()}
+
+
+def schedule_version():
+    """
+    Token that changes whenever a scheduled post goes live. Alongside the token
+    the cache holds when the next scheduled post is due, so this costs one
+    query per release (or per post save) rather than one per request.
+    """
+    cache = _cache()
+    now = timezone.now()
+    schedule = cache.get(SCHEDULE_KEY)
+    if schedule is None or (schedule[1] is not None and schedule[1] <= now):
+        next_release = Post.objects.filter(
+            status='published', published_date__gt=now
+        ).order_by('published_date').values_list('published_date', flat=True).first()
+        schedule = (_mint(), next_release)
+        cache.set(SCHEDULE_KEY, schedule, None)
+    return schedule[0]
+
+
+def invalidate_post(post_id, site=True):
+    """Retire the post's token, and the site and schedule tokens unless `site` is False."""
+    tokens = {POST_VERSION_KEY.format(post_id): _mint()}
+    if site:
+        tokens[SITE_VERSION_KEY] = tokens[POST_VERSION_KEY.format(post_id)]
+    _cache().set_many(tokens, None)
+    if site:
+        _cache().delete(SCHEDULE_KEY)
+
+
+def month_histogram():
+    """
+    Published post counts per month as [(date(year, month, 1), count)], newest
+    first. Computed with one GROUP BY over the status/published_date index and
+    cached until a post changes or a scheduled post goes live.
+    """
+    key = HISTOGRAM_KEY.format(published_page_version(None))
+    histogram = _cache().get(key)
+    if histogram is None:
+        rows = Post.published.annotate(
+            month=TruncMonth('published_date')
+        ).order_by('-month').values('month').annotate(count=Count('pk')).values_list('month', 'count')
+        histogram = [(month.date(), count) for month, count in rows]
+        _cache().set(key, histogram, PAGE_CACHE_TIMEOUT)
+    return histogram
+
+
+def site_page_version(request, *args, **kwargs):
+    """Version function for pages that list posts."""
+    return site_version()
+
+
+def published_page_version(request, *args, **kwargs):
+    """Version function for pages that list published posts."""
+    return max(site_version(), schedule_version())
+
+
+def post_page_version(request, pk, *args, **kwargs):
+    """
+    Version function for a single post's page: its own token, the site's and
+    the schedule's (its related posts only list published posts).
+    """
+    versions = get_versions([POST_VERSION_KEY.format(pk), SITE_VERSION_KEY])
+    return max(*versions.values(), schedule_version())
+
+
+def cache_anonymous_page(version_func, timeout=None):
+    """
+    Cache whole GET responses for anonymous visitors under a key built from
+    the full path and `version_func(request, *args, **kwargs)`, and answer
+    conditional requests from the same version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated \
+                    or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            version = version_func(request, *args, **kwargs)
+            digest = md5(f'{request.get_full_path()}|{version}'.encode()).hexdigest()
+            etag = f'"{digest}"'
+            last_modified = int(version // 1_000_000_000)
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return _with_validators(not_modified, etag, last_modified)
+
+            cache = _cache()
+            key = PAGE_KEY.format(digest)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                if response.status_code != 200 or response.cookies:
+                    return response
+                _with_validators(response, etag, last_modified)
+                cache.set(key, response, PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+            return response
+        return wrapped
+    return decorator
+
+
+def _with_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _invalidate_on_commit(post_id, site=True):
+    transaction.on_commit(lambda: invalidate_post(post_id, site=site))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_retagged_post(sender, instance, action, **kwargs):
+    if isinstance(instance, Post) and action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidate_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    # Comments only appear on their own post's page
+    _invalidate_on_commit(instance.post_id, site=False)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the Post table'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('The FTS5 search table does not exist; run migrate on an SQLite build with FTS5')
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} post(s)'))
@@ -0,0 +1,46 @@
+from django.db import migrations, OperationalError
+
+# Kept in sync with blog.search.SEARCH_TABLE
+SEARCH_TABLE = 'blog_post_search'
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 table and index existing posts (SQLite builds with FTS5 only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"title, content, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    except OperationalError:
+        return  # SQLite compiled without FTS5; blog.search falls back to icontains
+
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, tags) "
+        f"SELECT p.id, p.title, p.content, COALESCE(("
+        f"  SELECT group_concat(t.name, ' ') FROM taggit_taggeditem ti "
+        f"  JOIN taggit_tag t ON t.id = ti.tag_id "
+        f"  WHERE ti.object_id = p.id AND ti.content_type_id = %s"
+        f"), '') FROM blog_post p",
+        [content_type.pk if content_type else None]
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_tags'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -2,14 +2,16 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
-#######3
-# blog/models.py
 from taggit.managers import TaggableManager
 
-
-
-
-
+class PublishedPostManager(models.Manager):
+    """
+    Posts visible to readers: published, with a published_date that has
+    arrived. A post saved as published with a future date is scheduled and
+    starts showing up on its own once that date passes.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(status='published', published_date__lte=timezone.now())
 
 
 class Post(models.Model):
@@ -33,8 +35,16 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_date = models.DateTimeField(null=True, blank=True)
-    #ddududududududu
-        
+
+    objects = models.Manager()
+    published = PublishedPostManager()
+
+    class Meta:
+        indexes = [
+            # Serves the published list and month archives
+            models.Index(fields=['status', '-published_date'], name='post_status_published_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -42,12 +52,17 @@ class Post(models.Model):
         """Returns the URL to access a detailed record for this post."""
         return reverse('blog:post-detail', args=[str(self.id)])
     
-    def publish(self):
-        """Publish the blog post."""
-        self.published_date = timezone.now()
+    def publish(self, when=None):
+        """Publish the blog post now, or schedule it for `when`."""
+        self.published_date = when or timezone.now()
         self.status = 'published'
         self.save()
 
+    @property
+    def is_scheduled(self):
+        return self.status == 'published' and self.published_date is not None \
+            and self.published_date > timezone.now()
+
 class Comment(models.Model):
     """
     Model representing a comment on a blog post.
@@ -60,17 +75,16 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    class Meta:
-        ordering = ['-created_at']
-
-    def __str__(self):
-        return f'Comment by {self.author} on {self.post.title}'
     created_date = models.DateTimeField(auto_now_add=True)
     approved = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['created_date']
-        
+        indexes = [
+            # Serves a post's approved comments in display order
+            models.Index(fields=['post', 'approved', 'created_date'], name='comment_post_approved_idx'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.author} on {self.post}'
     
@@ -97,12 +111,3 @@ class Category(models.Model):
         """Returns the URL to access a list of posts in this category."""
         return reverse('category-detail', args=[str(self.id)])
 
-
-############3
-# blog/models.py
-class Tag(models.Model):
-    name = models.CharField(max_length=50, unique=True)
-
-class Post(models.Model):
-    ...
-    tags = models.ManyToManyField(Tag, related_name='posts')
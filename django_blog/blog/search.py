@@ -0,0 +1,209 @@
+"""
+Full-text search over blog posts.
+
+Posts are indexed in an SQLite FTS5 table (blog_post_search) whose rowid is
+the post id, with one column each for the title, content and tag names. The
+receivers at the bottom of this module keep it current on Post save/delete and
+tag changes, inside the same transaction as the write.
+
+Queries are ranked with BM25 (title and tags weigh more than the body), every
+term is prefix-matched and each hit carries a highlighted snippet. Only posts
+readers can see (Post.published) are returned; drafts and scheduled posts stay
+indexed and appear once they go live. Databases without FTS5 fall back to the
+old unranked icontains lookups.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+SEARCH_TABLE = 'blog_post_search'
+
+# bm25() weights for the title, content and tags columns
+COLUMN_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Number of tokens in a result snippet, and the most terms honoured per query
+SNIPPET_TOKENS = 24
+MAX_QUERY_TERMS = 10
+
+# Control characters FTS5 wraps around matches; swapped for <mark> after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TERM_RE = re.compile(r'\w+')
+
+
+_available = {}
+
+
+def fts_available():
+    """Whether the FTS5 index table exists on the default database (checked once per database)."""
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        _available[name] = (
+            connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available[name]
+
+
+def index_post(post):
+    """Add or refresh a post in the search index."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+            [post.pk, post.title, post.content, ' '.join(post.tags.names())]
+        )
+
+
+def remove_post(post_id):
+    """Drop a post from the search index."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Reindex every post; returns the number of posts indexed."""
+    posts = Post.objects.prefetch_related('tags')
+    rows = [
+        (post.pk, post.title, post.content, ' '.join(tag.name for tag in post.tags.all()))
+        for post in posts
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+            rows
+        )
+    return len(rows)
+
+
+def parse_query(query):
+    """Turn free text into an FTS5 MATCH expression: every term, prefix-matched."""
+    terms = _TERM_RE.findall((query or '').lower())[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _published_hits():
+    """FROM/WHERE clause for index hits on published posts, and its parameters."""
+    post_table = Post._meta.db_table
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    return (
+        f"FROM {SEARCH_TABLE} JOIN {post_table} ON {post_table}.id = {SEARCH_TABLE}.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH %s AND {post_table}.status = 'published' "
+        f"AND {post_table}.published_date <= %s",
+        now,
+    )
+
+
+def _highlight(text):
+    return mark_safe(
+        escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """
+    Lazily evaluated, BM25-ordered search hits.
+
+    Supports count() and slicing so it can be handed straight to a Paginator;
+    each slice is one LIMIT/OFFSET query on the index plus one query for the
+    posts. Posts come back with `search_rank`, `highlighted_title` and
+    `snippet` attributes.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.match = parse_query(query)
+
+    @cached_property
+    def _count(self):
+        if not self.match:
+            return 0
+        source, now = _published_hits()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) {source}', [self.match, now])
+            return cursor.fetchone()[0]
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = self._count if key.stop is None else key.stop
+        if not self.match or stop <= start:
+            return []
+        return self._fetch(start, stop - start)
+
+    def _fetch(self, offset, limit):
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        source, now = _published_hits()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {SEARCH_TABLE}.rowid, bm25({SEARCH_TABLE}, {weights}) AS score, "
+                f"highlight({SEARCH_TABLE}, 0, %s, %s), "
+                f"snippet({SEARCH_TABLE}, 1, %s, %s, '…', %s) "
+                f"{source} ORDER BY score LIMIT %s OFFSET %s",
+                [_MARK_START, _MARK_END, _MARK_START, _MARK_END, SNIPPET_TOKENS,
+                 self.match, now, limit, offset]
+            )
+            hits = cursor.fetchall()
+
+        posts = Post.published.select_related('author').in_bulk([hit[0] for hit in hits])
+        results = []
+        for post_id, score, title, snippet in hits:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            # bm25() is lower-is-better; flip it so bigger means more relevant
+            post.search_rank = -score
+            post.highlighted_title = _highlight(title)
+            post.snippet = _highlight(snippet)
+            results.append(post)
+        return results
+
+
+def search(query):
+    """Search posts by title, content and tags."""
+    if fts_available():
+        return SearchResults(query)
+    if not (query or '').strip():
+        return Post.objects.none()
+    return Post.published.filter(
+        Q(title__icontains=query) |
+        Q(content__icontains=query) |
+        Q(tags__name__icontains=query)
+    ).distinct().order_by('-created_at')
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_retagged_post(sender, instance, action, **kwargs):
+    # Taggit's through table is shared by every tagged model
+    if isinstance(instance, Post) and action in ('post_add', 'post_remove', 'post_clear'):
+        index_post(instance)
@@ -0,0 +1,219 @@
+"""
+Tag index for blog posts.
+
+Taggit keeps tags in a generic TaggedItem table keyed on (content_type,
+object_id), so tag pages, tag counts and shared-tag lookups all join through
+it. This module keeps three views of that table in the cache:
+
+- for each tag, the sorted ids of the posts carrying it,
+- for each post, the sorted ids of its tags,
+- the tag cloud: every tag in use with its post count.
+
+Entries are loaded from TaggedItem on a miss and then patched in place by the
+receivers at the bottom of this module (after the transaction commits) when a
+post is retagged or deleted. Entries also expire after TAG_INDEX_TIMEOUT, which
+bounds the damage from two processes patching the same entry at once.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+from taggit.models import Tag, TaggedItem
+
+from .models import Post
+
+TAG_INDEX_CACHE = getattr(settings, 'TAG_INDEX_CACHE', 'default')
+TAG_INDEX_TIMEOUT = getattr(settings, 'TAG_INDEX_TIMEOUT', 60 * 60)
+
+# related() looks at this many of the newest posts of each tag, and scores
+# this many of the posts sharing the most tags
+RELATED_SCAN_LIMIT = getattr(settings, 'TAG_RELATED_SCAN_LIMIT', 500)
+RELATED_CANDIDATES = getattr(settings, 'TAG_RELATED_CANDIDATES', 100)
+
+
+class TagIndex:
+    posts_key = 'blog_tags:posts:{}'
+    tags_key = 'blog_tags:tags:{}'
+    cloud_key = 'blog_tags:cloud'
+
+    @property
+    def cache(self):
+        return caches[TAG_INDEX_CACHE]
+
+    def _tagged_items(self):
+        return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+
+    def post_ids(self, tag_id):
+        """Sorted ids of the posts tagged with `tag_id`."""
+        return self.post_ids_many([tag_id])[tag_id]
+
+    def post_ids_many(self, tag_ids):
+        return self._load_many(self.posts_key, tag_ids, 'tag_id', 'object_id')
+
+    def tag_ids(self, post_id):
+        """Sorted ids of the tags on `post_id`."""
+        return self.tag_ids_many([post_id])[post_id]
+
+    def tag_ids_many(self, post_ids):
+        return self._load_many(self.tags_key, post_ids, 'object_id', 'tag_id')
+
+    def cloud(self):
+        """Every tag in use as {'id', 'name', 'slug', 'count'} dicts, by name."""
+        cloud = self.cache.get(self.cloud_key)
+        if cloud is None:
+            counts = dict(
+                self._tagged_items().order_by().values('tag_id')
+                .annotate(n=Count('pk')).values_list('tag_id', 'n')
+            )
+            cloud = [
+                {'id': tag.pk, 'name': tag.name, 'slug': tag.slug, 'count': counts[tag.pk]}
+                for tag in Tag.objects.filter(pk__in=counts).order_by('name')
+            ]
+            self.cache.set(self.cloud_key, cloud, TAG_INDEX_TIMEOUT)
+        return cloud
+
+    def get_tag(self, slug=None, name=None):
+        """Look a tag up by slug or case-insensitive name from the cloud."""
+        for tag in self.cloud():
+            if (slug is not None and tag['slug'] == slug) or \
+                    (name is not None and tag['name'].lower() == name.lower()):
+                return tag
+        return None
+
+    def related(self, post_id, limit=5):
+        """
+        Ids of the posts sharing the most tags with `post_id`, scored by the
+        Jaccard index of the two tag sets, best first. Only the newest
+        RELATED_SCAN_LIMIT posts of each tag are counted, and only the
+        RELATED_CANDIDATES posts sharing the most tags are scored, so popular
+        tags cost no more than rare ones.
+        """
+        tag_ids = self.tag_ids(post_id)
+        shared = Counter()
+        for post_ids in self.post_ids_many(tag_ids).values():
+            shared.update(post_ids[-RELATED_SCAN_LIMIT:])
+        shared.pop(post_id, None)
+        if not shared:
+            return []
+
+        candidates = dict(shared.most_common(RELATED_CANDIDATES))
+        sizes = {pk: len(tags) for pk, tags in self.tag_ids_many(candidates).items()}
+        scored = [
+            (count / (len(tag_ids) + sizes[pk] - count), pk)
+            for pk, count in candidates.items()
+        ]
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return [pk for _, pk in scored[:limit]]
+
+    def add(self, post_id, tag_ids):
+        """Record that `post_id` gained `tag_ids`."""
+        self._patch(post_id, tag_ids, _insort, 1)
+
+    def remove(self, post_id, tag_ids):
+        """Record that `post_id` lost `tag_ids`."""
+        self._patch(post_id, tag_ids, _discard, -1)
+
+    def _patch(self, post_id, tag_ids, change, delta):
+        keys = [self.posts_key.format(tag_id) for tag_id in tag_ids]
+        keys += [self.tags_key.format(post_id), self.cloud_key]
+        cached = self.cache.get_many(keys)
+
+        updated = {}
+        for tag_id in tag_ids:
+            key = self.posts_key.format(tag_id)
+            if key in cached:
+                updated[key] = _changed(cached[key], post_id, change)
+        key = self.tags_key.format(post_id)
+        if key in cached:
+            for tag_id in tag_ids:
+                cached[key] = _changed(cached[key], tag_id, change)
+            updated[key] = cached[key]
+        self.cache.set_many(updated, TAG_INDEX_TIMEOUT)
+
+        cloud = cached.get(self.cloud_key)
+        if cloud is not None:
+            counts = {tag['id']: tag for tag in cloud}
+            if any(tag_id not in counts for tag_id in tag_ids) and delta > 0:
+                # A tag new to the cloud needs its name and slug; reload instead
+                self.cache.delete(self.cloud_key)
+                return
+            for tag_id in tag_ids:
+                if tag_id in counts:
+                    counts[tag_id]['count'] += delta
+            cloud = [tag for tag in cloud if tag['count'] > 0]
+            self.cache.set(self.cloud_key, cloud, TAG_INDEX_TIMEOUT)
+
+    def _load_many(self, key_format, ids, key_field, value_field):
+        ids = list(ids)
+        keys = {key_format.format(pk): pk for pk in ids}
+        cached = self.cache.get_many(keys)
+        result = {keys[key]: value for key, value in cached.items()}
+
+        missing = [pk for pk in ids if pk not in result]
+        if missing:
+            loaded = {pk: [] for pk in missing}
+            rows = self._tagged_items().filter(
+                **{f'{key_field}__in': missing}
+            ).values_list(key_field, value_field)
+            for key_id, value_id in rows:
+                loaded[key_id].append(value_id)
+            loaded = {pk: array('q', sorted(values)) for pk, values in loaded.items()}
+            self.cache.set_many(
+                {key_format.format(pk): values for pk, values in loaded.items()},
+                TAG_INDEX_TIMEOUT
+            )
+            result.update(loaded)
+        return result
+
+
+def _changed(ids, value, change):
+    ids = array('q', ids)
+    change(ids, value)
+    return ids
+
+
+def _discard(ids, value):
+    i = bisect_left(ids, value)
+    if i < len(ids) and ids[i] == value:
+        del ids[i]
+
+
+def _insort(ids, value):
+    i = bisect_left(ids, value)
+    if i == len(ids) or ids[i] != value:
+        ids.insert(i, value)
+
+
+tag_index = TagIndex()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_index(sender, instance, action, pk_set, **kwargs):
+    if not isinstance(instance, Post):
+        return
+    if action == 'pre_clear':
+        # clear() sends no pk_set; remember what is about to go
+        instance._cleared_tag_ids = list(
+            tag_index._tagged_items().filter(object_id=instance.pk).values_list('tag_id', flat=True)
+        )
+    elif action == 'post_clear':
+        tag_ids = getattr(instance, '_cleared_tag_ids', [])
+        transaction.on_commit(lambda: tag_index.remove(instance.pk, tag_ids))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        tag_ids = list(pk_set)
+        update = tag_index.add if action == 'post_add' else tag_index.remove
+        transaction.on_commit(lambda: update(instance.pk, tag_ids))
+
+
+@receiver(pre_delete, sender=Post)
+def drop_deleted_post_from_tag_index(sender, instance, **kwargs):
+    # Taggit deletes the post's TaggedItem rows without sending m2m_changed
+    post_id, tag_ids = instance.pk, list(tag_index.tag_ids(instance.pk))
+    transaction.on_commit(lambda: tag_index.remove(post_id, tag_ids))
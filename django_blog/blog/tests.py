@@ -1,3 +1,367 @@
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+
+from .models import Category, Comment, Post
+from .search import search
+from .tags import tag_index
+
+
+class SearchTests(TestCase):
+    """Test the full-text search index behind search_posts."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+
+    def create_post(self, title, content='', tags=(), status='published', published_date=None):
+        post = Post.objects.create(
+            author=self.author, title=title, content=content,
+            status=status, published_date=published_date or timezone.now()
+        )
+        if tags:
+            post.tags.add(*tags)
+        return post
+
+    def test_title_matches_rank_above_body_matches(self):
+        """Test BM25 weighting puts title hits first."""
+        body = self.create_post('Gardening notes', 'A short note on django deployment.')
+        title = self.create_post('Django deployment', 'Notes on shipping.')
+        self.assertEqual([post.pk for post in search('django')[:10]], [title.pk, body.pk])
+
+    def test_prefix_and_tag_matching(self):
+        """Test terms are prefix-matched and tag names are searchable."""
+        post = self.create_post('Weekend', 'Nothing much.', tags=['photography'])
+        self.assertEqual([p.pk for p in search('photo')[:10]], [post.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test saving and deleting a post keeps the index current."""
+        post = self.create_post('Old title')
+        post.title = 'New title'
+        post.save()
+        self.assertEqual(search('old').count(), 0)
+        self.assertEqual(search('new').count(), 1)
+
+        post.delete()
+        self.assertEqual(search('new').count(), 0)
+
+    def test_results_are_highlighted_and_escaped(self):
+        """Test snippets mark matches without trusting post HTML."""
+        self.create_post('Tips', '<b>Use</b> caching wisely.')
+        post = search('caching')[:1][0]
+        self.assertIn('<mark>caching</mark>', post.snippet)
+        self.assertIn('&lt;b&gt;', post.snippet)
+
+    def test_search_view_paginates(self):
+        """Test the search page shows ten results per page."""
+        for i in range(12):
+            self.create_post(f'Python tip {i}')
+        response = self.client.get(reverse('blog:search_posts'), {'q': 'python'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['results']), 10)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+        response = self.client.get(reverse('blog:search_posts'), {'q': 'python', 'page': 2})
+        self.assertEqual(len(response.context['results']), 2)
+
+    def test_drafts_and_scheduled_posts_are_not_found(self):
+        """Test only published posts are searched, and counted."""
+        live = self.create_post('Django live')
+        self.create_post('Django draft', status='draft')
+        self.create_post('Django scheduled', published_date=timezone.now() + timedelta(days=1))
+        results = search('django')
+        self.assertEqual(results.count(), 1)
+        self.assertEqual([post.pk for post in results[:10]], [live.pk])
+
+
+class TagIndexTests(TestCase):
+    """Test the cached tag index behind tag pages, the cloud and related posts."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+
+    def create_post(self, title, tags=(), status='published', published_date=None):
+        post = Post.objects.create(
+            author=self.author, title=title, content='Content',
+            status=status, published_date=published_date or timezone.now()
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            post.tags.add(*tags)
+        return post
+
+    def test_cloud_counts_follow_tag_changes(self):
+        """Test the cached cloud is patched as posts are tagged and untagged."""
+        first = self.create_post('First', ['django', 'python'])
+        self.create_post('Second', ['python'])
+        counts = {tag['name']: tag['count'] for tag in tag_index.cloud()}
+        self.assertEqual(counts, {'django': 1, 'python': 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.tags.remove('python')
+        with self.assertNumQueries(0):
+            counts = {tag['name']: tag['count'] for tag in tag_index.cloud()}
+        self.assertEqual(counts, {'django': 1, 'python': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual([tag['name'] for tag in tag_index.cloud()], ['python'])
+
+    def test_tag_page_is_served_from_the_index(self):
+        """Test tag pages find posts by name or slug, case-insensitively."""
+        post = self.create_post('Tagged', ['Machine Learning'])
+        self.create_post('Other', ['cooking'])
+
+        for tag in ('machine learning', 'machine-learning'):
+            response = self.client.get(reverse('blog:posts_by_tag', args=[tag]))
+            self.assertEqual([p.pk for p in response.context['posts']], [post.pk])
+
+    def test_tag_pages_query_one_page_of_ids(self):
+        """Test both tag routes page the index's ids instead of querying them all."""
+        posts = [self.create_post(f'Post {i}', ['django']) for i in range(12)]
+        self.create_post('Draft', ['django'], status='draft')
+        for url in (reverse('blog:posts_by_tag', args=['django']), reverse('blog:posts_by_tag_slug', args=['django'])):
+            cache.clear()
+            tag_index.cloud()
+            with CaptureQueriesContext(connection) as queries:
+                first = self.client.get(url)
+            [ids] = filter(None, (re.search(r'"blog_post"."id" IN \(([^)]*)\)', q['sql']) for q in queries))
+            self.assertEqual(len(ids.group(1).split(',')), 10)
+            # The draft is newest, so it takes a slot on the first page
+            self.assertEqual([p.pk for p in first.context['posts']], [p.pk for p in posts[::-1][:9]])
+            second = self.client.get(url, {'page': 2})
+            self.assertEqual([p.pk for p in second.context['posts']], [p.pk for p in posts[::-1][9:]])
+            self.assertContains(second, 'Page 2 of 2')
+
+    @mock.patch('blog.tags.RELATED_SCAN_LIMIT', 2)
+    def test_related_posts_scan_only_the_newest_posts_of_each_tag(self):
+        """Test related() ignores the older posts of a popular tag."""
+        old = self.create_post('Old', ['a', 'b'])
+        self.create_post('Skipped', ['a'])
+        newer = self.create_post('Newer', ['a'])
+        post = self.create_post('Post', ['a', 'b'])
+        # Old shares 'a' too, but only the two newest posts of 'a' are counted
+        self.assertEqual(tag_index.related(post.pk), [newer.pk, old.pk])
+
+    def test_related_posts_are_ranked_by_jaccard(self):
+        """Test related posts favour the closest tag sets."""
+        post = self.create_post('Post', ['a', 'b', 'c'])
+        close = self.create_post('Close', ['a', 'b', 'c', 'd'])
+        partial = self.create_post('Partial', ['a', 'b'])
+        far = self.create_post('Far', ['a', 'x', 'y', 'z'])
+        self.create_post('Unrelated', ['q'])
+
+        self.assertEqual(tag_index.related(post.pk), [close.pk, partial.pk, far.pk])
+        response = self.client.get(reverse('blog:post-detail', args=[post.pk]))
+        self.assertEqual([p.pk for p in response.context['related_posts']], [close.pk, partial.pk, far.pk])
+
+    def test_tag_pages_and_related_posts_hide_unpublished_posts(self):
+        """Test drafts and scheduled posts stay off tag pages and related lists."""
+        post = self.create_post('Live', ['django'])
+        self.create_post('Draft', ['django'], status='draft')
+        self.create_post('Scheduled', ['django'], published_date=timezone.now() + timedelta(days=1))
+
+        response = self.client.get(reverse('blog:posts_by_tag', args=['django']))
+        self.assertEqual([p.pk for p in response.context['posts']], [post.pk])
+        response = self.client.get(reverse('blog:post-detail', args=[post.pk]))
+        self.assertEqual(response.context['related_posts'], [])
+
+
+class PageCacheTests(TestCase):
+    """Test anonymous page caching and its signal-driven invalidation."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(
+                author=self.author, title='Cached', content='Body',
+                status='published', published_date=timezone.now()
+            )
+
+    def test_anonymous_list_is_served_from_cache(self):
+        """Test a repeat anonymous hit does not touch the database."""
+        url = reverse('blog:home')
+        first = self.client.get(url)
+        self.assertContains(first, 'Cached')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_edit_invalidates_list_and_detail(self):
+        """Test saving a post retires cached pages and fragments."""
+        list_url = reverse('blog:home')
+        detail_url = reverse('blog:post-detail', args=[self.post.pk])
+        etag = self.client.get(list_url)['ETag']
+        self.client.get(detail_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.content = 'New body'
+            self.post.save()
+
+        response = self.client.get(list_url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Renamed')
+        self.assertContains(self.client.get(detail_url), 'New body')
+
+    def test_comment_only_invalidates_its_post(self):
+        """Test a new comment refreshes the post page but not the list."""
+        list_etag = self.client.get(reverse('blog:home'))['ETag']
+        detail_url = reverse('blog:post-detail', args=[self.post.pk])
+        detail_etag = self.client.get(detail_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.author, content='First!', approved=True)
+
+        self.assertEqual(self.client.get(reverse('blog:home'))['ETag'], list_etag)
+        self.assertNotEqual(self.client.get(detail_url)['ETag'], detail_etag)
+
+    def test_authenticated_users_bypass_the_page_cache(self):
+        """Test logged-in visitors get freshly rendered pages."""
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('blog:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class PublishedPostTests(TestCase):
+    """Test the published-only list, scheduled posts and the month archive."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+
+    def create_post(self, title, status='published', published_date=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                author=self.author, title=title, content='Content',
+                status=status, published_date=published_date or timezone.now()
+            )
+
+    def test_list_shows_only_published_posts_newest_first(self):
+        """Test drafts and future posts are left out of the home page."""
+        older = self.create_post('Older', published_date=timezone.now() - timedelta(days=2))
+        newer = self.create_post('Newer', published_date=timezone.now() - timedelta(days=1))
+        self.create_post('Draft', status='draft')
+        self.create_post('Scheduled', published_date=timezone.now() + timedelta(days=1))
+
+        response = self.client.get(reverse('blog:home'))
+        self.assertEqual(list(response.context['posts']), [newer, older])
+
+    def test_scheduled_post_appears_once_due(self):
+        """Test a scheduled post goes live without any write, past the page cache."""
+        now = timezone.now()
+        self.create_post('Live', published_date=now - timedelta(hours=1))
+        self.create_post('Scheduled', published_date=now + timedelta(hours=1))
+        url = reverse('blog:home')
+        etag = self.client.get(url)['ETag']
+        self.assertNotContains(self.client.get(url), 'Scheduled')
+
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(hours=2)):
+            response = self.client.get(url)
+        self.assertContains(response, 'Scheduled')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_month_archive(self):
+        """Test the archive counts months and lists one month's posts."""
+        march = self.create_post('March', published_date=datetime(2025, 3, 10, tzinfo=dt_timezone.utc))
+        self.create_post('May', published_date=datetime(2025, 5, 2, tzinfo=dt_timezone.utc))
+        self.create_post('May again', published_date=datetime(2025, 5, 20, tzinfo=dt_timezone.utc))
+
+        response = self.client.get(reverse('blog:post-archive'))
+        self.assertEqual(response.context['months'], [(date(2025, 5, 1), 2), (date(2025, 3, 1), 1)])
+
+        response = self.client.get(reverse('blog:post-archive-month', args=[2025, 3]))
+        self.assertEqual(list(response.context['posts']), [march])
+        self.assertEqual(response.context['next_month'], date(2025, 5, 1))
+        self.assertIsNone(response.context['previous_month'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog:post-archive-month', args=[2025, 4]))
+        self.assertEqual(response.status_code, 404)
+
+
+class PostDetailTests(TestCase):
+    """Test the post page's query count and comment listing."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(
+            author=self.author, title='Post', content='Content', status='published', published_date=timezone.now()
+        )
+        self.post.tags.add('django', 'python')
+        Category.objects.create(name='Tutorials').posts.add(self.post)
+        self.url = reverse('blog:post-detail', args=[self.post.pk])
+
+    def add_comments(self, count, approved=True):
+        for i in range(count):
+            reader = User.objects.create_user(username=f'reader{Comment.objects.count()}', password='testpass123')
+            Comment.objects.create(post=self.post, author=reader, content=f'Comment {i}', approved=approved)
+
+    def count_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Test 2 or 15 comments cost the same number of queries."""
+        self.add_comments(2)
+        small, _ = self.count_queries()
+        self.add_comments(13)
+        large, response = self.count_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['comments']), 15)
+        self.assertContains(response, 'Tutorials')
+
+    def test_only_approved_comments_are_shown(self):
+        """Test pending comments are hidden from everyone but the post's author."""
+        self.add_comments(1)
+        self.add_comments(1, approved=False)
+        response = self.client.get(self.url)
+        self.assertEqual([c.approved for c in response.context['comments']], [True])
+
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertEqual([c.approved for c in response.context['comments']], [True, False])
+
+    def test_comments_are_paginated(self):
+        """Test long threads are split into pages of 20."""
+        self.add_comments(25)
+        response = self.client.get(self.url, {'comments_page': 2})
+        self.assertEqual([c.content for c in response.context['comments']], [f'Comment {i}' for i in range(20, 25)])
+
+    def test_unpublished_posts_are_only_shown_to_their_author(self):
+        """Test drafts and scheduled posts 404 for everyone but their author, who is never cached."""
+        draft = Post.objects.create(author=self.author, title='Draft', content='Content')
+        scheduled = Post.objects.create(
+            author=self.author, title='Scheduled', content='Content',
+            status='published', published_date=timezone.now() + timedelta(days=1)
+        )
+        for post in (draft, scheduled):
+            url = reverse('blog:post-detail', args=[post.pk])
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+            self.client.force_login(User.objects.create_user(username=f'other{post.pk}', password='x'))
+            self.assertEqual(self.client.get(url).status_code, 404)
 
-# Create your tests here.
+            self.client.force_login(self.author)
+            response = self.client.get(url)
+            self.assertContains(response, post.title)
+            self.assertNotIn('ETag', response)
+            self.client.logout()
+            self.assertEqual(self.client.get(url).status_code, 404)
@@ -17,6 +17,10 @@ urlpatterns = [
     path('post/<int:pk>/update/', PostUpdateView.as_view(), name='post-update'),
     path('post/<int:pk>/delete/', PostDeleteView.as_view(), name='post-delete'),
 
+    # Archive URLs
+    path('archive/', views.post_archive, name='post-archive'),
+    path('archive/<int:year>/<int:month>/', views.PostMonthArchiveView.as_view(), name='post-archive-month'),
+
     # Comment URLs
     path('posts/<int:pk>/comments/new/', views.add_comment, name='add_comment'),
     path('comments/<int:pk>/update/', views.edit_comment, name='edit_comment'),
@@ -24,6 +28,7 @@ urlpatterns = [
 
     # Search and Tag URLs
     path('search/', views.search_posts, name='search_posts'),
+    path('tags/', views.tag_cloud, name='tag_cloud'),
     path('tags/<str:tag_name>/', views.posts_by_tag, name='posts_by_tag'),  # Optional legacy
     path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='posts_by_tag_slug'),  # ✅ Required by checker
 
@@ -1,20 +1,44 @@
+from datetime import date, datetime, time, timedelta
+
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.paginator import Paginator
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django import forms
 from .models import Post, Comment
 from .forms import CommentForm, PostForm
+from .caching import (
+    FRAGMENT_CACHE_TIMEOUT, cache_anonymous_page, month_histogram, post_page_version, post_versions,
+    published_page_version, site_page_version
+)
+from .search import search
+from .tags import tag_index
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic.edit import FormMixin
 
+@method_decorator(cache_anonymous_page(published_page_version), name='dispatch')
 class PostListView(ListView):
-    model = Post
     template_name = 'blog/home.html'  # Using home.html instead of post_list.html to maintain current structure
     context_object_name = 'posts'
-    ordering = ['-created_date']
+    paginate_by = 10
+
+    def get_queryset(self):
+        return Post.published.select_related('author').order_by('-published_date')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Fragment cache keys for each list item
+        versions = post_versions([post.pk for post in context['posts']])
+        for post in context['posts']:
+            post.cache_version = versions[post.pk]
+        context['fragment_timeout'] = FRAGMENT_CACHE_TIMEOUT
+        return context
 
 # Keeping the function-based view as backup
 def home(request):
@@ -44,36 +68,104 @@ def profile(request):
         request.user.save()
     return render(request, "blog/profile.html", {"user": request.user})
 
+RELATED_POSTS_LIMIT = 5
+COMMENTS_PER_PAGE = 20
+
+@method_decorator(cache_anonymous_page(post_page_version), name='dispatch')
 class PostDetailView(DetailView):
+    """
+    A post with its author, tags, categories and one page of comments, in a
+    fixed number of queries however many comments the post has.
+    """
     model = Post
     template_name = 'blog/post_detail.html'
 
+    def get_queryset(self):
+        posts = Post.published.all()
+        if self.request.user.is_authenticated:
+            # Authors can preview their own drafts and scheduled posts. Signed-in
+            # users bypass the page cache, so those previews are never cached.
+            posts = posts | Post.objects.filter(author=self.request.user)
+        return posts.select_related('author').prefetch_related('tags', 'categories')
+
+    def get_comments(self):
+        """Approved comments, plus pending ones when the post's author is looking."""
+        comments = self.object.comments.select_related('author').order_by('created_date', 'id')
+        if self.request.user != self.object.author:
+            comments = comments.filter(approved=True)
+        paginator = Paginator(comments, COMMENTS_PER_PAGE)
+        return paginator.get_page(self.request.GET.get('comments_page'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = self.get_comments()
+        if self.request.user.is_authenticated:
+            context['comment_form'] = CommentForm()
+        context['post_version'] = post_versions([self.object.pk])[self.object.pk]
+        context['fragment_timeout'] = FRAGMENT_CACHE_TIMEOUT
+        related_ids = tag_index.related(self.object.pk, limit=RELATED_POSTS_LIMIT)
+        related = Post.published.in_bulk(related_ids)
+        context['related_posts'] = [related[pk] for pk in related_ids if pk in related]
+        return context
+
 def post_detail(request, pk):
     return PostDetailView.as_view()(request, pk=pk)
 
+TAG_POSTS_PER_PAGE = 10
+
+def tagged_posts_page(posts, tag, number, per_page=TAG_POSTS_PER_PAGE):
+    """
+    Page `number` of the `posts` carrying `tag`, newest first. The page is cut
+    from the tag index's sorted post ids before `posts` is queried, so the IN
+    list never holds more than one page of ids. Ids that `posts` leaves out
+    (drafts, scheduled posts) still take their place, so a page can show
+    fewer than `per_page` posts.
+    """
+    post_ids = tag_index.post_ids(tag['id'])[::-1] if tag else []
+    page = Paginator(post_ids, per_page).get_page(number)
+    page.object_list = list(posts.filter(pk__in=list(page.object_list)).order_by('-pk'))
+    return page
+
+@cache_anonymous_page(published_page_version)
 def posts_by_tag(request, tag_name):
-    posts = Post.objects.filter(tags__name__iexact=tag_name)
-    return render(request, 'blog/tag_posts.html', {'posts': posts, 'tag': tag_name})
+    # tags/<str>/ also shadows the slug route, so accept either
+    tag = tag_index.get_tag(name=tag_name) or tag_index.get_tag(slug=tag_name)
+    page = tagged_posts_page(Post.published.select_related('author'), tag, request.GET.get('page'))
+    return render(request, 'blog/tag_posts.html', {
+        'posts': page.object_list, 'page_obj': page, 'is_paginated': page.has_other_pages(),
+        'tag': tag['name'] if tag else tag_name,
+    })
+
+@cache_anonymous_page(site_page_version)
+def tag_cloud(request):
+    return render(request, 'blog/tag_cloud.html', {'tags': tag_index.cloud()})
 
 
+def stamp_published_date(post):
+    """Publishing without a date means now; a future date schedules the post."""
+    if post.status == 'published' and post.published_date is None:
+        post.published_date = timezone.now()
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     template_name = 'blog/post_form.html'
-    fields = ['title', 'content']
+    fields = ['title', 'content', 'status', 'published_date']
     success_url = reverse_lazy('blog:home')
 
     def form_valid(self, form):
         form.instance.author = self.request.user
+        stamp_published_date(form.instance)
         return super().form_valid(form)
 
 class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Post
     template_name = 'blog/post_form.html'
-    fields = ['title', 'content']
+    fields = ['title', 'content', 'status', 'published_date']
     success_url = reverse_lazy('blog:home')
 
     def form_valid(self, form):
         form.instance.author = self.request.user
+        stamp_published_date(form.instance)
         return super().form_valid(form)
 
     def test_func(self):
@@ -114,13 +206,26 @@ def delete_comment(request, comment_id):
     comment.delete()
     return redirect('post_detail', pk=post_id)
 
+@method_decorator(cache_anonymous_page(published_page_version), name='dispatch')
 class PostByTagListView(ListView):
     model = Post
     template_name = 'blog/tag_posts.html'
     context_object_name = 'posts'
 
+    paginate_by = TAG_POSTS_PER_PAGE
+
     def get_queryset(self):
-        return Post.objects.filter(tags__slug=self.kwargs['tag_slug'])
+        self.tag = tag_index.get_tag(slug=self.kwargs['tag_slug'])
+        return Post.published.select_related('author')
+
+    def paginate_queryset(self, queryset, page_size):
+        page = tagged_posts_page(queryset, self.tag, self.request.GET.get(self.page_kwarg), page_size)
+        return page.paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag'] = self.tag['name'] if self.tag else self.kwargs['tag_slug']
+        return context
 
 
 
@@ -182,16 +287,50 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 
 
-# blog/views.py
-from django.db.models import Q
-from .models import Post
+@cache_anonymous_page(published_page_version)
+def post_archive(request):
+    return render(request, 'blog/post_archive.html', {'months': month_histogram()})
 
-def search_posts(request):
-    query = request.GET.get('q')
-    results = Post.objects.filter(
-        Q(title__icontains=query) |
-        Q(content__icontains=query) |
-        Q(tags__name__icontains=query)
-    ).distinct()
-    return render(request, 'blog/search_results.html', {'results': results, 'query': query})
+@method_decorator(cache_anonymous_page(published_page_version), name='dispatch')
+class PostMonthArchiveView(ListView):
+    """Published posts for one month; unknown months 404 from the histogram alone."""
+    template_name = 'blog/post_archive_month.html'
+    context_object_name = 'posts'
+    paginate_by = 10
+
+    def get_queryset(self):
+        try:
+            self.month = date(self.kwargs['year'], self.kwargs['month'], 1)
+        except ValueError:
+            raise Http404('Invalid month')
+        self.months = [month for month, _ in month_histogram()]
+        if self.month not in self.months:
+            raise Http404('No posts for this month')
+
+        start = datetime.combine(self.month, time.min, tzinfo=timezone.get_current_timezone())
+        end = (start + timedelta(days=32)).replace(day=1)
+        return Post.published.filter(
+            published_date__gte=start, published_date__lt=end
+        ).select_related('author').order_by('-published_date')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The histogram is newest first
+        i = self.months.index(self.month)
+        context['month'] = self.month
+        context['next_month'] = self.months[i - 1] if i > 0 else None
+        context['previous_month'] = self.months[i + 1] if i + 1 < len(self.months) else None
+        return context
+
+SEARCH_RESULTS_PER_PAGE = 10
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search(query), SEARCH_RESULTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'blog/search_results.html', {
+        'results': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'query': query,
+    })
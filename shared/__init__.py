@@ -0,0 +1,5 @@
+"""
+Modules shared by the API projects of this repository (social_media_api,
+api_project and advanced-api-project). Each project's settings puts the
+repository root on sys.path so they import as `shared.<module>`.
+"""
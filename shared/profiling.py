@@ -0,0 +1,273 @@
+"""
+Per-request SQL query profiling.
+
+QueryProfilerMiddleware wraps every database connection for a sampled share
+of requests (QUERY_PROFILER_SAMPLE_RATE, 0 to 1) and records the number of
+queries, the time spent in them and how often each query shape ran. A shape
+is the SQL with its parameters left out and IN lists and LIMIT/OFFSET values
+collapsed, so the same lookup for different rows has one fingerprint. A shape
+that runs QUERY_PROFILER_N_PLUS_ONE_THRESHOLD times or more in one request is
+reported as an N+1, with the project stack frames that issued it, and logged
+as a warning.
+
+Sampled responses carry a Server-Timing header (shown in the browser's
+network panel) and an X-Query-Profile id. The last QUERY_PROFILER_HISTORY
+profiles of each process are kept in memory and served to admin users at
+/api/profiler/ and /api/profiler/<id>/.
+
+Unsampled requests cost one random() call. The middleware runs sync or
+async, whichever the stack around it is, so ASGI requests are not moved to a
+thread for it. A sampled async request makes two sync_to_async() calls, to
+wrap and then unwrap the connections its queries use. Queries run while a
+streaming response is being sent happen after the profile is closed and are
+not counted.
+"""
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILER_HISTORY = getattr(settings, 'QUERY_PROFILER_HISTORY', 100)
+STACK_DEPTH = 8
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+LIMIT = re.compile(r'\b(LIMIT|OFFSET) \d+')
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """The shape of `sql`: the same query for other rows has the same fingerprint."""
+    return LIMIT.sub(r'\1 %s', IN_LIST.sub('IN (...)', sql))
+
+
+def project_stack():
+    """'file:line in function' for the project's frames calling into the database, outermost first."""
+    base, here = str(settings.BASE_DIR), __file__
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename and frame.filename != here
+    ]
+    return [
+        f'{Path(frame.filename).relative_to(base)}:{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+def view_name(request):
+    """The DRF view (and viewset action) or URL name that handled `request`."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    cls = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if cls is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None)
+    action = actions.get(request.method.lower()) if actions else None
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class QueryProfile:
+    """The queries of one request. Installed as an execute wrapper on each connection."""
+
+    def __init__(self, request, threshold):
+        self.id = uuid.uuid4().hex
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.started = timezone.now()
+        self.threshold = threshold
+        self.count = 0
+        self.db_time = 0.0
+        # fingerprint -> [count, seconds, stack]
+        self.shapes = {}
+        self._start = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.db_time += duration
+            shape = self.shapes.setdefault(fingerprint(sql), [0, 0.0, None])
+            shape[0] += 1
+            shape[1] += duration
+            if shape[0] == self.threshold:
+                # Only taken once per repeated shape, so unrepeated queries cost no stack walk
+                shape[2] = project_stack()
+
+    def finish(self, request, response):
+        self.duration = time.perf_counter() - self._start
+        self.view = view_name(request)
+        self.status = response.status_code
+        repeated = sorted(
+            ((sql, count, seconds, stack) for sql, (count, seconds, stack) in self.shapes.items() if count > 1),
+            key=lambda shape: -shape[1],
+        )
+        self.duplicates = [
+            {'sql': sql, 'count': count, 'time_ms': round(seconds * 1000, 2)}
+            for sql, count, seconds, stack in repeated if stack is None
+        ]
+        self.n_plus_one = [
+            {'sql': sql, 'count': count, 'time_ms': round(seconds * 1000, 2), 'stack': stack}
+            for sql, count, seconds, stack in repeated if stack is not None
+        ]
+        self.shapes = None
+
+    def server_timing(self):
+        timing = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.count} queries"',
+            f'app;dur={self.duration * 1000:.2f}',
+        ]
+        if self.n_plus_one:
+            timing.append(f'n-plus-one;desc="{len(self.n_plus_one)} repeated queries"')
+        return ', '.join(timing)
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'view': self.view,
+            'status': self.status,
+            'started': self.started.isoformat(),
+            'duration_ms': round(self.duration * 1000, 2),
+            'queries': self.count,
+            'db_time_ms': round(self.db_time * 1000, 2),
+            'n_plus_one': len(self.n_plus_one),
+        }
+
+    def as_dict(self):
+        return {**self.summary(), 'n_plus_one': self.n_plus_one, 'duplicates': self.duplicates}
+
+
+class ProfileHistory:
+    """The most recent profiles of this process, newest first."""
+
+    def __init__(self, maxlen=QUERY_PROFILER_HISTORY):
+        self._profiles = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.appendleft(profile)
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def all(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profiles = ProfileHistory()
+
+
+class QueryProfilerMiddleware:
+    """Profile the queries of a sampled share of requests (see the module docstring)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = self.sample(request)
+        if profile is None:
+            return self.get_response(request)
+        with self.wrap(profile):
+            response = self.get_response(request)
+        return self.record(profile, request, response)
+
+    async def __acall__(self, request):
+        profile = self.sample(request)
+        if profile is None:
+            return await self.get_response(request)
+        # Connections belong to threads: wrap those of the thread that runs
+        # this request's sync_to_async() calls, where its queries run
+        stack = await sync_to_async(self.wrap)(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(profile, request, response)
+
+    def sample(self, request):
+        """A new QueryProfile if `request` is sampled, else None."""
+        rate = getattr(settings, 'QUERY_PROFILER_SAMPLE_RATE', 0)
+        if rate <= 0 or random.random() >= rate:
+            return None
+        return QueryProfile(request, getattr(settings, 'QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', 3))
+
+    def wrap(self, profile):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        return stack
+
+    def record(self, profile, request, response):
+        profile.finish(request, response)
+        profiles.add(profile)
+
+        response['Server-Timing'] = profile.server_timing()
+        response['X-Query-Profile'] = profile.id
+        for shape in profile.n_plus_one:
+            logger.warning(
+                'N+1 query in %s %s (%s): %d x %s\n  %s',
+                profile.method, profile.path, profile.view, shape['count'], shape['sql'],
+                '\n  '.join(shape['stack']) or '(no project frames)',
+            )
+        return response
+
+
+class QueryProfileList(APIView):
+    """
+    Recent query profiles of this process, newest first.
+    ?n_plus_one=true lists only requests with an N+1.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        results = profiles.all()
+        if request.query_params.get('n_plus_one') in ('1', 'true'):
+            results = [profile for profile in results if profile.n_plus_one]
+        return Response({'results': [profile.summary() for profile in results]})
+
+
+class QueryProfileDetail(APIView):
+    """One query profile, with its N+1 and duplicated queries."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id):
+        profile = profiles.get(profile_id)
+        if profile is None:
+            raise Http404
+        return Response(profile.as_dict())
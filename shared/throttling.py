@@ -0,0 +1,235 @@
+"""
+Rate limiting for the write, bulk and export endpoints of the API projects.
+
+Views name a `throttle_scope` whose rate ("<count>/<s|min|hour|day>") is set
+in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. Two limiters are available:
+
+* SlidingWindow keeps a counter for the current fixed window and the one
+  before it, and weights the previous count by how much of it still overlaps
+  the window ending now. Smooth like a log of timestamps, but two keys and one
+  increment per check. The increment comes first and a refused request takes
+  it back, so concurrent requests always see each other.
+* TokenBucket holds up to `count` tokens, refilled at count/period per
+  second, and each request takes one. It allows short bursts while holding the
+  sustained rate.
+
+Counters live in the Django cache named by THROTTLE_CACHE, so every process
+shares them, or in an in-process LRU (LocalStore) if it is None. Cache
+increments are atomic, so concurrent requests cannot push a sliding window's
+current count past its limit, in one process or many. A refused request holds
+its slot until it gives it back, so requests racing it at the limit may be
+refused early. Token buckets are read and written back, so concurrent requests
+in different processes may each take the same token. Every check costs O(1)
+whatever the rate or traffic.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_CACHE = getattr(settings, 'THROTTLE_CACHE', 'default')
+THROTTLE_LOCAL_SIZE = getattr(settings, 'THROTTLE_LOCAL_SIZE', 100000)
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period[0]]
+
+
+class LocalStore:
+    """In-process counters, LRU with per-key expiry."""
+
+    def __init__(self, maxsize=THROTTLE_LOCAL_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            values = {key: self._get(key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    def incr(self, key, timeout):
+        with self._lock:
+            value = (self._get(key) or 0) + 1
+            self._set(key, value, timeout)
+        return value
+
+    def decr(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1] - 1)
+
+    def update(self, key, timeout, fn):
+        """Replace the value of `key` with fn(value)[0] and return fn(value)[1]."""
+        with self._lock:
+            value, result = fn(self._get(key))
+            self._set(key, value, timeout)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _set(self, key, value, timeout):
+        now = time.monotonic()
+        self._entries[key] = (now + timeout, value)
+        self._entries.move_to_end(key)
+        # Drop the least recently written keys while over size or expired
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= self.maxsize and oldest[0] > now:
+                break
+            self._entries.popitem(last=False)
+
+
+class CacheStore:
+    """Counters in a Django cache, shared by every process using it."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def incr(self, key, timeout):
+        if self.cache.add(key, 1, timeout):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, 1, timeout)
+            return 1
+
+    def decr(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            # Expired since incr(); nothing left to give back
+            pass
+
+    def update(self, key, timeout, fn):
+        value, result = fn(self.cache.get(key))
+        self.cache.set(key, value, timeout)
+        return result
+
+
+local_store = LocalStore()
+
+
+def get_store():
+    return CacheStore(THROTTLE_CACHE) if THROTTLE_CACHE else local_store
+
+
+class SlidingWindow:
+    """At most `limit` requests in any `period` seconds (approximately)."""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+
+    def check(self, store, key, now):
+        """Count a request at `now` if allowed. Returns (allowed, seconds to wait)."""
+        window, offset = divmod(now, self.period)
+        previous_key, current_key = f'{key}:{int(window) - 1}', f'{key}:{int(window)}'
+        previous = store.get_many([previous_key]).get(previous_key, 0)
+        # Claim a slot before deciding: the increment is atomic, so no two
+        # requests see the same count. A refused request gives its slot back.
+        current = store.incr(current_key, 2 * self.period)
+        if previous * (1 - offset / self.period) + current > self.limit:
+            store.decr(current_key)
+            return False, self.wait(previous, current - 1, offset)
+        return True, None
+
+    def wait(self, previous, current, offset):
+        if current + 1 > self.limit:
+            # Not before the next window, where this window's count is the weighted one
+            overlap = max(0.0, 1 - (self.limit - 1) / current)
+            return self.period - offset + self.period * overlap
+        return max(0.0, self.period * (1 - (self.limit - current - 1) / previous) - offset)
+
+
+class TokenBucket:
+    """Bursts of up to `limit` requests, refilled at limit/period per second."""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.refill = limit / period
+
+    def check(self, store, key, now):
+        """Take a token at `now` if there is one. Returns (allowed, seconds to wait)."""
+        def take(state):
+            tokens, last = state or (self.limit, now)
+            tokens = min(self.limit, tokens + (now - last) * self.refill)
+            if tokens >= 1:
+                return (tokens - 1, now), (True, None)
+            return (tokens, now), (False, (1 - tokens) / self.refill)
+
+        # An idle bucket is full again after one period, so it can expire then
+        return store.update(key, self.period, take)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Limit a view to the rate for its `throttle_scope`, per user (per IP for
+    anonymous requests). Views without a scope, or whose scope has no rate,
+    are not limited.
+    """
+    limiter_class = SlidingWindow
+    per_ip = False
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+
+        limiter = self.limiter_class(*parse_rate(rate))
+        allowed, self._wait = limiter.check(get_store(), self.get_cache_key(request, scope), time.time())
+        return allowed
+
+    def get_cache_key(self, request, scope):
+        if request.user.is_authenticated and not self.per_ip:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{scope}:{ident}'
+
+    def wait(self):
+        return self._wait
+
+
+class TokenBucketThrottle(SlidingWindowThrottle):
+    """SlidingWindowThrottle that allows bursts (see TokenBucket)."""
+    limiter_class = TokenBucket
+
+
+class IPSlidingWindowThrottle(SlidingWindowThrottle):
+    """SlidingWindowThrottle counted per client IP, signed in or not."""
+    per_ip = True
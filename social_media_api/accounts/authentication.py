@@ -0,0 +1,180 @@
+"""
+Cached token authentication.
+
+DRF's TokenAuthentication looks the token and its user up with a join on
+every request. CachedTokenAuthentication keeps a snapshot of the user for
+each token key in an in-process LRU cache with a TTL, optionally backed by a
+shared Django cache (settings.TOKEN_AUTH_CACHE) so other processes can skip
+the query too.
+
+Tokens expire TOKEN_TTL after they are issued. Entries are dropped when a
+token is deleted (logout, rotation, expiry) and when its user is saved. A
+password change also deletes the user's token. The in-process layer of other
+processes cannot be reached, so TOKEN_AUTH_CACHE_TIMEOUT bounds how long
+they may keep accepting a revoked token.
+
+request.user is therefore a snapshot up to TOKEN_AUTH_CACHE_TIMEOUT old. Read
+from it, but reload the user before saving it, or the save writes stale
+values (e.g. unread_notification_count) back over newer ones.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_TTL = getattr(settings, 'TOKEN_TTL', timedelta(days=7))
+TOKEN_AUTH_CACHE = getattr(settings, 'TOKEN_AUTH_CACHE', None)
+TOKEN_AUTH_CACHE_SIZE = getattr(settings, 'TOKEN_AUTH_CACHE_SIZE', 10000)
+TOKEN_AUTH_CACHE_TIMEOUT = getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 60)
+
+
+class TokenCache:
+    """Token key -> (user snapshot, token creation time), LRU with a TTL."""
+    shared_key = 'token_auth:{}'
+
+    def __init__(self, maxsize=TOKEN_AUTH_CACHE_SIZE, timeout=TOKEN_AUTH_CACHE_TIMEOUT):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[TOKEN_AUTH_CACHE] if TOKEN_AUTH_CACHE else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                self._forget(key)
+        if self.shared is not None:
+            value = self.shared.get(self.shared_key.format(key))
+            if value is not None:
+                self._remember(key, value)
+            return value
+        return None
+
+    def set(self, key, user, created):
+        value = (user, created)
+        self._remember(key, value)
+        if self.shared is not None:
+            self.shared.set(self.shared_key.format(key), value, self.timeout)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._forget(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key.format(key))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = [key for key in self._keys_by_user.get(user_id, ())]
+            for key in keys:
+                self._forget(key)
+        if self.shared is not None:
+            # Another process may have cached a key this one never saw
+            keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+            self.shared.delete_many([self.shared_key.format(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._keys_by_user.setdefault(value[0].pk, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._forget(next(iter(self._entries)))
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            user_id = entry[1][0].pk
+            keys = self._keys_by_user.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache()
+
+
+def token_expired(created):
+    return created + TOKEN_TTL <= timezone.now()
+
+
+def issue_token(user):
+    """The user's current token, replacing it first if it has expired."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expired(token.created):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def rotate_token(user):
+    """Replace the user's token with a new one."""
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that answers repeat requests from token_cache and
+    rejects tokens older than TOKEN_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                token = self.get_model().objects.select_related('user').get(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            cached = (token.user, token.created)
+            if token.user.is_active and not token_expired(token.created):
+                token_cache.set(key, *cached)
+        user, created = cached
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if token_expired(created):
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        # Each request gets its own copy, so views can't change the snapshot
+        return copy.copy(user), key
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_saved_user(sender, instance, created, **kwargs):
+    if created:
+        return
+    # set_password() leaves the raw password in _password until after save
+    if getattr(instance, '_password', None) is not None:
+        Token.objects.filter(user=instance).delete()
+    token_cache.invalidate_user(instance.pk)
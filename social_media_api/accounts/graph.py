@@ -0,0 +1,65 @@
+"""
+Cached follow graph.
+
+Each user's following and follower ids are kept in the cache as sorted
+arrays of 64-bit ints, so follow checks are a binary search and counts are
+a length, with no hit on the followers join table. Entries are dropped
+whenever the relationship changes (see accounts.models.invalidate_follow_graph).
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+FOLLOW_GRAPH_CACHE = getattr(settings, 'FOLLOW_GRAPH_CACHE', 'default')
+FOLLOW_GRAPH_TIMEOUT = getattr(settings, 'FOLLOW_GRAPH_TIMEOUT', 60 * 60)
+
+
+class FollowGraph:
+    following_key = 'follow_graph:following:{}'
+    followers_key = 'follow_graph:followers:{}'
+
+    @property
+    def cache(self):
+        return caches[FOLLOW_GRAPH_CACHE]
+
+    @property
+    def through(self):
+        return get_user_model().followers.through
+
+    def following_ids(self, user_id):
+        """Sorted ids of the users `user_id` follows."""
+        return self._load(
+            self.following_key.format(user_id),
+            self.through.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True),
+        )
+
+    def follower_ids(self, user_id):
+        """Sorted ids of the users following `user_id`."""
+        return self._load(
+            self.followers_key.format(user_id),
+            self.through.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True),
+        )
+
+    def is_following(self, user_id, other_id):
+        ids = self.following_ids(user_id)
+        i = bisect_left(ids, other_id)
+        return i < len(ids) and ids[i] == other_id
+
+    def invalidate(self, *user_ids):
+        keys = []
+        for user_id in user_ids:
+            keys += [self.following_key.format(user_id), self.followers_key.format(user_id)]
+        self.cache.delete_many(keys)
+
+    def _load(self, key, queryset):
+        ids = self.cache.get(key)
+        if ids is None:
+            ids = array('q', sorted(queryset))
+            self.cache.set(key, ids, FOLLOW_GRAPH_TIMEOUT)
+        return ids
+
+
+follow_graph = FollowGraph()
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from .graph import follow_graph
 
 class User(AbstractUser):
     """
@@ -16,6 +21,8 @@ class User(AbstractUser):
     )
     date_joined = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the notification views so the unread badge is O(1)
+    unread_notification_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-date_joined']
@@ -26,12 +33,12 @@ class User(AbstractUser):
     @property
     def follower_count(self):
         """Returns the number of followers"""
-        return self.followers.count()
+        return len(follow_graph.follower_ids(self.pk))
     
     @property
     def following_count(self):
         """Returns the number of users this user is following"""
-        return self.following.count()
+        return len(follow_graph.following_ids(self.pk))
     
     def follow(self, user):
         """Follow the specified user"""
@@ -45,4 +52,37 @@ class User(AbstractUser):
     
     def is_following(self, user):
         """Check if the current user is following the specified user"""
-        return self.following.filter(id=user.id).exists()
+        return follow_graph.is_following(self.pk, user.pk)
+
+
+@receiver(m2m_changed, sender=User.followers.through)
+def invalidate_follow_graph(sender, instance, action, pk_set, **kwargs):
+    """Drop cached follow sets for everyone touched by a follow change."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    user_ids = {instance.pk, *(pk_set or ())}
+    if action == 'pre_clear':
+        # clear() doesn't report which users were affected, so collect them first
+        user_ids.update(follow_graph.follower_ids(instance.pk))
+        user_ids.update(follow_graph.following_ids(instance.pk))
+        follow_graph.invalidate(*user_ids)
+        return
+    follow_graph.invalidate(*user_ids)
+    # Also after commit, in case a reader re-cached the pre-commit state
+    transaction.on_commit(lambda: follow_graph.invalidate(*user_ids))
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_deleted_user_follows(sender, instance, **kwargs):
+    """
+    Deleting a user removes their follow rows by cascade, which sends no
+    m2m_changed, so drop the cached sets of everyone they were linked to.
+    """
+    through = User.followers.through
+    user_ids = {instance.pk}
+    for from_id, to_id in through.objects.filter(
+        Q(from_user_id=instance.pk) | Q(to_user_id=instance.pk)
+    ).values_list('from_user_id', 'to_user_id'):
+        user_ids.update((from_id, to_id))
+    follow_graph.invalidate(*user_ids)
+    transaction.on_commit(lambda: follow_graph.invalidate(*user_ids))
@@ -62,4 +62,12 @@ class UserMinimalSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'profile_picture')
-        read_only_fields = fields
\ No newline at end of file
+        read_only_fields = fields
+
+class UserIdListSerializer(serializers.Serializer):
+    """A batch of user ids for the bulk follow/unfollow endpoints"""
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
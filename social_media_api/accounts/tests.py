@@ -1,3 +1,299 @@
-from django.test import TestCase
+from array import array
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from notifications.models import NotificationEvent
+from posts.models import Post, FeedEntry
+from .authentication import token_cache
+from .graph import follow_graph
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    """Test the cached follow graph behind follow checks and counts."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', password='testpass123')
+
+    def test_follow_checks_are_served_from_cache(self):
+        """Test repeated follow checks and counts issue no queries once warm."""
+        self.alice.follow(self.bob)
+        self.alice.follow(self.carol)
+        # Warm both users' cached sets
+        self.alice.is_following(self.bob)
+        self.bob.is_following(self.alice)
+        self.bob.follower_count
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.alice.is_following(self.bob))
+            self.assertFalse(self.bob.is_following(self.alice))
+            self.assertEqual(self.alice.following_count, 2)
+            self.assertEqual(self.bob.follower_count, 1)
+
+    def test_follow_and_unfollow_invalidate(self):
+        """Test cached sets reflect follows and unfollows immediately."""
+        self.assertFalse(self.alice.is_following(self.bob))
+        self.assertEqual(self.bob.follower_count, 0)
+
+        self.alice.follow(self.bob)
+        self.assertTrue(self.alice.is_following(self.bob))
+        self.assertEqual(list(follow_graph.follower_ids(self.bob.pk)), [self.alice.pk])
+
+        self.alice.unfollow(self.bob)
+        self.assertFalse(self.alice.is_following(self.bob))
+        self.assertEqual(self.bob.follower_count, 0)
+
+    def test_clear_invalidates_both_sides(self):
+        """Test clearing a user's followers drops each follower's cached set."""
+        self.alice.follow(self.bob)
+        self.carol.follow(self.bob)
+        self.assertTrue(self.carol.is_following(self.bob))
+
+        self.bob.followers.clear()
+        self.assertFalse(self.carol.is_following(self.bob))
+        self.assertEqual(self.alice.following_count, 0)
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_deleting_a_user_invalidates_their_follows(self):
+        """Test a deleted follower leaves the cached sets and fan-out."""
+        self.alice.follow(self.bob)
+        self.carol.follow(self.bob)
+        self.assertEqual(self.bob.follower_count, 2)
+
+        self.alice.delete()
+        self.assertEqual(list(follow_graph.follower_ids(self.bob.pk)), [self.carol.pk])
+
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        response = client.post(reverse('posts:post-list'), {'title': 'Hi', 'content': 'Content'})
+        self.assertEqual(response.status_code, 201)
+
+        # Fan-out skips ids a stale cache (e.g. another process's) still holds
+        follow_graph.cache.set(follow_graph.followers_key.format(self.bob.pk), array('q', [self.carol.pk, 9999]))
+        response = client.post(reverse('posts:post-list'), {'title': 'Again', 'content': 'Content'})
+        self.assertEqual(response.status_code, 201)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BulkFollowTests(TestCase):
+    """Test the batch follow, unfollow and relationship endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.others = [
+            User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def test_bulk_follow_reports_each_id(self):
+        """Test bulk follow applies new follows and reports the rest."""
+        first, second = self.others[:2]
+        self.alice.follow(first)
+        response = self.client.post(
+            reverse('accounts:bulk-follow'),
+            {'user_ids': [first.pk, second.pk, self.alice.pk, 9999]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'followed': [second.pk],
+            'already_following': [first.pk],
+            'not_found': [9999],
+            'invalid': [self.alice.pk],
+        })
+        self.assertTrue(self.alice.is_following(second))
+        self.assertEqual(
+            list(NotificationEvent.objects.filter(verb='follow').values_list('recipient_id', flat=True)),
+            [second.pk]
+        )
+
+    def test_bulk_follow_query_count_is_independent_of_batch_size(self):
+        """Test following 2 or 5 users costs the same number of queries."""
+        def follow(users):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('accounts:bulk-follow'), {'user_ids': [u.pk for u in users]}, format='json')
+            return len(queries)
+
+        small = follow(self.others[:2])
+        self.client.post(reverse('accounts:bulk-unfollow'), {'user_ids': [u.pk for u in self.others]}, format='json')
+        large = follow(self.others)
+        self.assertEqual(small, large)
+        self.assertEqual(self.alice.following_count, 5)
+
+    def test_bulk_follow_backfills_feed(self):
+        """Test bulk follow copies each author's posts into the feed."""
+        posts = [Post.objects.create(author=user, title='Post', content='Content') for user in self.others[:2]]
+        self.client.post(reverse('accounts:bulk-follow'), {'user_ids': [u.pk for u in self.others[:2]]}, format='json')
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.alice).values_list('post_id', flat=True)),
+            {post.pk for post in posts}
+        )
+
+        self.client.post(reverse('accounts:bulk-unfollow'), {'user_ids': [self.others[0].pk]}, format='json')
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.alice).values_list('post_id', flat=True)),
+            [posts[1].pk]
+        )
+
+    def test_bulk_unfollow(self):
+        """Test bulk unfollow removes follows and reports unknown ones."""
+        first, second = self.others[:2]
+        self.alice.follow(first)
+        response = self.client.post(
+            reverse('accounts:bulk-unfollow'), {'user_ids': [first.pk, second.pk]}, format='json'
+        )
+        self.assertEqual(response.data, {'unfollowed': [first.pk], 'not_following': [second.pk]})
+        self.assertFalse(self.alice.is_following(first))
+
+    def test_bulk_follow_rejects_oversized_batches(self):
+        """Test more than 100 ids is a validation error."""
+        response = self.client.post(reverse('accounts:bulk-follow'), {'user_ids': list(range(1, 102))}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_relationship_status_uses_one_query(self):
+        """Test relationship status covers both directions in a single query."""
+        first, second, third = self.others[:3]
+        self.alice.follow(first)
+        self.alice.follow(second)
+        second.follow(self.alice)
+        third.follow(self.alice)
+
+        url = reverse('accounts:relationships')
+        ids = f'{first.pk},{second.pk},{third.pk},{self.others[3].pk}'
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': ids})
+        self.assertEqual(response.data['relationships'], [
+            {'id': first.pk, 'following': True, 'followed_by': False},
+            {'id': second.pk, 'following': True, 'followed_by': True},
+            {'id': third.pk, 'following': False, 'followed_by': True},
+            {'id': self.others[3].pk, 'following': False, 'followed_by': False},
+        ])
+
+    def test_relationship_status_validates_ids(self):
+        """Test malformed or missing ids are rejected."""
+        url = reverse('accounts:relationships')
+        self.assertEqual(self.client.get(url, {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedTokenAuthenticationTests(TestCase):
+    """Test cached token authentication, expiry, logout and rotation."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='alice', password='testpass123')
+        self.client = APIClient()
+        self.token = self.login()
+
+    def login(self, password='testpass123'):
+        self.client.credentials()
+        response = self.client.post(reverse('accounts:login'), {'username': 'alice', 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def get_profile(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return self.client.get(reverse('accounts:profile'))
+
+    def token_queries(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_profile(token)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if 'authtoken_token' in q['sql']]
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.assertEqual(len(self.token_queries(self.token)), 1)
+        self.assertEqual(self.token_queries(self.token), [])
+
+    def test_profile_changes_are_not_served_stale(self):
+        self.get_profile(self.token)
+        self.client.patch(reverse('accounts:profile'), {'bio': 'Hello'})
+        self.assertEqual(self.get_profile(self.token).data['bio'], 'Hello')
+
+    def test_profile_update_keeps_counters_changed_since_caching(self):
+        self.get_profile(self.token)
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=5)
+        self.client.patch(reverse('accounts:profile'), {'bio': 'Hello'})
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.unread_notification_count), ('Hello', 5))
+
+    def test_logout_revokes_the_token(self):
+        self.get_profile(self.token)
+        self.assertEqual(self.client.post(reverse('accounts:logout')).status_code, 204)
+        self.assertEqual(self.get_profile(self.token).status_code, 401)
+
+    def test_rotation_replaces_the_token(self):
+        self.get_profile(self.token)
+        response = self.client.post(reverse('accounts:rotate-token'))
+        new_token = response.data['token']
+        self.assertNotEqual(new_token, self.token)
+        self.assertEqual(self.get_profile(self.token).status_code, 401)
+        self.assertEqual(self.get_profile(new_token).status_code, 200)
+
+    def test_password_change_revokes_the_token(self):
+        self.get_profile(self.token)
+        self.user.set_password('newpass456')
+        self.user.save()
+        self.assertEqual(self.get_profile(self.token).status_code, 401)
+        self.assertNotEqual(self.login('newpass456'), self.token)
+
+    def test_expired_tokens_are_refused_and_replaced_on_login(self):
+        self.get_profile(self.token)
+        Token.objects.filter(key=self.token).update(created=timezone.now() - timedelta(days=8))
+        token_cache.clear()
+        response = self.get_profile(self.token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(str(response.data['detail']), 'Token has expired.')
+        self.assertNotEqual(self.login(), self.token)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ThrottleTests(TestCase):
+    """Test the follow and registration rate limits."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    @throttle_rates(register='2/hour')
+    def test_registration_is_limited_per_ip(self):
+        def register(username, ip):
+            return self.client.post(reverse('accounts:register'), {
+                'username': username, 'email': f'{username}@example.com', 'first_name': 'A', 'last_name': 'B',
+                'password': 'Str0ng-passw0rd!', 'password2': 'Str0ng-passw0rd!',
+            }, REMOTE_ADDR=ip).status_code
+
+        self.assertEqual([register(name, '10.0.0.1') for name in ('a1', 'a2', 'a3')], [201, 201, 429])
+        self.assertEqual(register('b1', '10.0.0.2'), 201)
+
+    @throttle_rates(follow='2/min')
+    def test_follow_and_unfollow_share_a_limit(self):
+        alice = User.objects.create_user(username='alice', password='testpass123')
+        bob = User.objects.create_user(username='bob', password='testpass123')
+        self.client.force_authenticate(user=alice)
+        statuses = [
+            self.client.post(reverse(name, args=[bob.pk])).status_code
+            for name in ('accounts:follow-user', 'accounts:unfollow-user', 'accounts:follow-user')
+        ]
+        self.assertEqual(statuses[2], 429)
@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
-    RegisterView, CustomAuthToken, ProfileView,
-    FollowUserView, UnfollowUserView, UserListView
+    RegisterView, CustomAuthToken, LogoutView, RotateTokenView, ProfileView,
+    FollowUserView, UnfollowUserView, UserListView,
+    BulkFollowView, BulkUnfollowView, RelationshipStatusView
 )
 
 app_name = 'accounts'
@@ -10,7 +11,12 @@ urlpatterns = [
     path('users/', UserListView.as_view(), name='user-list'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomAuthToken.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/rotate/', RotateTokenView.as_view(), name='rotate-token'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk-follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk-unfollow'),
+    path('relationships/', RelationshipStatusView.as_view(), name='relationships'),
 ]
\ No newline at end of file
@@ -4,8 +4,16 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
-from .serializers import UserRegistrationSerializer, UserProfileSerializer, UserMinimalSerializer
-from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from notifications.models import NotificationEvent
+from shared.throttling import IPSlidingWindowThrottle
+from .authentication import issue_token, rotate_token
+from .graph import follow_graph
+from .serializers import (
+    UserRegistrationSerializer, UserProfileSerializer, UserMinimalSerializer,
+    UserIdListSerializer
+)
 
 User = get_user_model()
 
@@ -29,14 +37,16 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (IPSlidingWindowThrottle,)
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
+        # The serializer issued the token along with the user
         return Response({
-            'token': token.key,
+            'token': user.token,
             'user': UserMinimalSerializer(user).data
         }, status=status.HTTP_201_CREATED)
 
@@ -47,29 +57,51 @@ class CustomAuthToken(ObtainAuthToken):
                                          context={'request': request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
+        token = issue_token(user)
         return Response({
             'token': token.key,
             'user': UserMinimalSerializer(user).data
         })
 
+class LogoutView(APIView):
+    """Revoke the token used for this request"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        Token.objects.filter(key=request.auth).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class RotateTokenView(APIView):
+    """Replace the current token with a new one; the old one stops working at once"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        token = rotate_token(request.user)
+        return Response({'token': token.key})
+
 class ProfileView(generics.RetrieveUpdateAPIView):
     """Handle user profile operations"""
     serializer_class = UserProfileSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        # request.user may be a cached snapshot (see accounts.authentication);
+        # saving it would write stale counters back, so edit a fresh copy
+        return User.objects.get(pk=self.request.user.pk)
 
 class FollowUserView(APIView):
     """Handle following/unfollowing users"""
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'follow'
 
     def post(self, request, user_id):
         try:
             user_to_follow = User.objects.get(id=user_id)
             if user_to_follow != request.user:
-                request.user.follow(user_to_follow)
+                if not request.user.is_following(user_to_follow):
+                    with transaction.atomic():
+                        request.user.follow(user_to_follow)
+                        NotificationEvent.objects.enqueue(user_to_follow, request.user, 'follow')
                 return Response(status=status.HTTP_200_OK)
             return Response(
                 {'error': 'You cannot follow yourself'},
@@ -84,6 +116,7 @@ class FollowUserView(APIView):
 class UnfollowUserView(APIView):
     """Handle unfollowing users"""
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'follow'
 
     def post(self, request, user_id):
         try:
@@ -95,3 +128,95 @@ class UnfollowUserView(APIView):
                 {'error': 'User not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+class BulkFollowView(APIView):
+    """Follow up to 100 users in one transaction"""
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'follow'
+
+    def post(self, request):
+        serializer = UserIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = list(dict.fromkeys(serializer.validated_data['user_ids']))
+
+        existing = set(User.objects.filter(pk__in=requested).values_list('pk', flat=True))
+        following = set(follow_graph.following_ids(request.user.pk))
+        results = {'followed': [], 'already_following': [], 'not_found': [], 'invalid': []}
+        for user_id in requested:
+            if user_id not in existing:
+                results['not_found'].append(user_id)
+            elif user_id == request.user.pk:
+                results['invalid'].append(user_id)
+            elif user_id in following:
+                results['already_following'].append(user_id)
+            else:
+                results['followed'].append(user_id)
+
+        if results['followed']:
+            with transaction.atomic():
+                # One INSERT on the through table; m2m_changed still fires once
+                request.user.following.add(*results['followed'])
+                NotificationEvent.objects.bulk_create([
+                    NotificationEvent(recipient_id=user_id, actor_id=request.user.pk, verb='follow')
+                    for user_id in results['followed']
+                ])
+        return Response(results, status=status.HTTP_200_OK)
+
+class BulkUnfollowView(APIView):
+    """Unfollow up to 100 users in one transaction"""
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_scope = 'follow'
+
+    def post(self, request):
+        serializer = UserIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = list(dict.fromkeys(serializer.validated_data['user_ids']))
+
+        current = set(follow_graph.following_ids(request.user.pk))
+        following = [user_id for user_id in requested if user_id in current]
+        if following:
+            with transaction.atomic():
+                request.user.following.remove(*following)
+        return Response({
+            'unfollowed': following,
+            'not_following': [user_id for user_id in requested if user_id not in following],
+        }, status=status.HTTP_200_OK)
+
+class RelationshipStatusView(APIView):
+    """
+    Report, for up to 100 user ids, whether the current user follows each
+    one and whether each one follows the current user, in a single query.
+
+    GET /api/accounts/relationships/?ids=2,3,4
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    max_ids = 100
+
+    def get(self, request):
+        try:
+            ids = list(dict.fromkeys(
+                int(user_id) for user_id in request.query_params.get('ids', '').split(',') if user_id
+            ))
+        except ValueError:
+            return Response({'error': 'ids must be a comma-separated list of integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > self.max_ids:
+            return Response({'error': f'Provide between 1 and {self.max_ids} ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # A row (from_user=A, to_user=B) means B follows A
+        me = request.user.pk
+        rows = User.followers.through.objects.filter(
+            Q(to_user_id=me, from_user_id__in=ids) | Q(from_user_id=me, to_user_id__in=ids)
+        ).values_list('from_user_id', 'to_user_id')
+        following, followed_by = set(), set()
+        for from_user_id, to_user_id in rows:
+            if to_user_id == me:
+                following.add(from_user_id)
+            if from_user_id == me:
+                followed_by.add(to_user_id)
+
+        return Response({'relationships': [
+            {'id': user_id, 'following': user_id in following, 'followed_by': user_id in followed_by}
+            for user_id in ids
+        ]})
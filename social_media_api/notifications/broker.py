@@ -0,0 +1,139 @@
+"""
+Pub/sub used to push new notifications to connected clients.
+
+The broker is pluggable through the NOTIFICATIONS_BROKER setting (a dotted
+path to a BaseBroker subclass). The default LocalBroker keeps subscribers in
+memory, so it only reaches clients connected to the same process that
+dispatched the notification; see NOTIFICATIONS_DISPATCH_IN_PROCESS.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """A single client's view of the broker for one user."""
+
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def get(self, timeout=None):
+        """Wait for the next message; returns None if `timeout` elapses first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def offer(self, message):
+        """Queue a message, dropping the oldest one if the client is falling behind."""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    """
+    Interface for notification brokers.
+
+    publish() may be called from any thread; subscribe() is called from
+    the event loop serving the client and returns an object with an async
+    get(timeout) method and a close() method.
+    """
+
+    def publish(self, user_id, message):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def has_subscribers(self, user_id):
+        """Whether publishing for this user can reach anyone (lets callers skip work)."""
+        return True
+
+
+class LocalBroker(BaseBroker):
+    """
+    In-memory broker for a single process.
+
+    Each subscriber is one asyncio.Queue, so an idle connection costs a
+    queue and a suspended coroutine rather than a thread.
+    """
+    max_queue_size = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.offer, message)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.max_queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+
+_broker = None
+
+
+def get_broker():
+    """Return the process-wide broker configured by NOTIFICATIONS_BROKER."""
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'NOTIFICATIONS_BROKER', 'notifications.broker.LocalBroker')
+        _broker = import_string(path)()
+    return _broker
+
+
+def notification_message(notification, actor):
+    """Compact payload pushed to clients for one notification."""
+    return {
+        'id': notification.pk,
+        'verb': notification.verb,
+        'actor': {'id': notification.actor_id, 'username': actor.username if actor else None},
+        'actor_count': notification.actor_count,
+        'target_id': notification.target_id,
+        'is_read': notification.is_read,
+        'timestamp': notification.timestamp.isoformat() if notification.timestamp else None,
+    }
+
+
+def publish_notifications(notifications):
+    """Publish freshly dispatched notifications to their recipients' streams."""
+    broker = get_broker()
+    notifications = [n for n in notifications if broker.has_subscribers(n.recipient_id)]
+    if not notifications:
+        return
+
+    actors = get_user_model().objects.in_bulk({n.actor_id for n in notifications})
+    for notification in notifications:
+        message = notification_message(notification, actors.get(notification.actor_id))
+        broker.publish(notification.recipient_id, message)
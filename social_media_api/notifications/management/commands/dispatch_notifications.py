@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.models import NotificationEvent
+
+
+class Command(BaseCommand):
+    help = 'Drain the notification outbox into coalesced Notification rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events to process per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep between polls of an empty outbox')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = NotificationEvent.objects.drain(batch_size=options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Dispatched {total} notification event(s)'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+def backfill_actor_ids(apps, schema_editor):
+    # Only unread notifications are merged into; the latest actor is the only
+    # one known, so earlier actors may still be counted again once
+    Notification = apps.get_model('notifications', 'Notification')
+    notifications = list(Notification.objects.filter(is_read=False).only('actor_id'))
+    for notification in notifications:
+        notification.actor_ids = [notification.actor_id]
+    Notification.objects.bulk_update(notifications, ['actor_ids'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_ids',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_actor_ids, migrations.RunPython.noop),
+    ]
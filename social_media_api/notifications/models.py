@@ -1,7 +1,36 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from .broker import publish_notifications
+
+class NotificationManager(models.Manager):
+    def unread_count(self, user):
+        """Count unread notifications from the table (served by the partial index)."""
+        return self.filter(recipient=user, is_read=False).count()
+
+    def mark_read(self, user, **filters):
+        """
+        Mark the user's matching unread notifications as read and take them
+        off the user's unread counter in the same transaction.
+        """
+        with transaction.atomic():
+            updated = self.filter(recipient=user, is_read=False, **filters).update(is_read=True)
+            if updated:
+                adjust_unread_count(user.pk, -updated)
+        return updated
+
+
+def adjust_unread_count(user_id, delta):
+    """Atomically shift a user's unread notification counter, never below zero."""
+    User = get_user_model()
+    User.objects.filter(pk=user_id).update(
+        unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+    )
+
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
@@ -35,12 +64,190 @@ class Notification(models.Model):
     
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Number of distinct actors coalesced into this notification
+    # ("actor and actor_count - 1 others liked your post")
+    actor_count = models.PositiveIntegerField(default=1)
+
+    objects = NotificationManager()
     
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['recipient', '-timestamp']),
+            models.Index(fields=['recipient', '-timestamp', '-id']),
+            models.Index(
+                fields=['recipient'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx',
+            ),
         ]
 
+    @property
+    def coalesce_key(self):
+        return (self.recipient_id, self.verb, self.target_ct_id, self.target_id)
+
     def __str__(self):
         return f'{self.actor.username} {self.get_verb_display()} - {self.timestamp}'
+
+
+class NotificationActor(models.Model):
+    """
+    One row per distinct actor coalesced into a notification. Kept out of the
+    notification row so a popular unread notification doesn't grow without bound.
+    """
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.CASCADE,
+        related_name='actor_links'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'actor'], name='notification_actor_unique'),
+        ]
+
+    def __str__(self):
+        return f'user {self.actor_id} on notification {self.notification_id}'
+
+
+class NotificationEventManager(models.Manager):
+    def enqueue(self, recipient, actor, verb, target=None):
+        """
+        Record that `actor` did `verb` to `recipient` (optionally on `target`).
+        This is a single narrow insert on the request path; the Notification
+        rows are written later by drain().
+        """
+        if recipient.pk == actor.pk:
+            return None
+        return self.create(
+            recipient_id=recipient.pk,
+            actor_id=actor.pk,
+            verb=verb,
+            target_ct=ContentType.objects.get_for_model(target) if target is not None else None,
+            target_id=target.pk if target is not None else None,
+        )
+
+    def drain(self, batch_size=500):
+        """
+        Turn up to `batch_size` queued events into notifications.
+
+        Events for the same (recipient, verb, target) are coalesced into one
+        notification, and merged into that recipient's existing unread
+        notification for the target if there is one. Returns the number of
+        events consumed.
+        """
+        with transaction.atomic():
+            events = list(
+                self.select_for_update(skip_locked=True).order_by('pk')[:batch_size]
+            )
+            if not events:
+                return 0
+
+            groups = {}
+            for event in events:
+                groups.setdefault(event.coalesce_key, []).append(event)
+
+            lookup = Q()
+            for recipient_id, verb, target_ct_id, target_id in groups:
+                lookup |= Q(recipient_id=recipient_id, verb=verb,
+                            target_ct_id=target_ct_id, target_id=target_id)
+            existing = {
+                notification.coalesce_key: notification
+                for notification in Notification.objects.filter(lookup, is_read=False).order_by('timestamp')
+            }
+
+            # Actors already linked to those notifications, so an actor who
+            # acts again isn't counted twice
+            known = {}
+            for notification_id, actor_id in NotificationActor.objects.filter(
+                notification__in=existing.values(),
+                actor_id__in={event.actor_id for event in events},
+            ).values_list('notification_id', 'actor_id'):
+                known.setdefault(notification_id, set()).add(actor_id)
+
+            to_create, to_update, new_actors, new_unread = [], [], [], {}
+            for key, group in groups.items():
+                latest = group[-1]
+                actors = {event.actor_id for event in group}
+                notification = existing.get(key)
+                if notification is not None:
+                    actors -= known.get(notification.pk, set())
+                    notification.actor_id = latest.actor_id
+                    notification.actor_count += len(actors)
+                    notification.timestamp = latest.created_at
+                    to_update.append(notification)
+                else:
+                    recipient_id, verb, target_ct_id, target_id = key
+                    notification = Notification(
+                        recipient_id=recipient_id,
+                        actor_id=latest.actor_id,
+                        verb=verb,
+                        target_ct_id=target_ct_id,
+                        target_id=target_id,
+                        actor_count=len(actors),
+                    )
+                    to_create.append(notification)
+                    new_unread[recipient_id] = new_unread.get(recipient_id, 0) + 1
+                new_actors.append((notification, actors))
+
+            Notification.objects.bulk_create(to_create, batch_size=500)
+            Notification.objects.bulk_update(to_update, ['actor', 'actor_count', 'timestamp'], batch_size=500)
+            NotificationActor.objects.bulk_create(
+                [
+                    NotificationActor(notification=notification, actor_id=actor_id)
+                    for notification, actors in new_actors
+                    for actor_id in sorted(actors)
+                ],
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            for recipient_id, count in new_unread.items():
+                adjust_unread_count(recipient_id, count)
+            self.filter(pk__in=[event.pk for event in events]).delete()
+
+            dispatched = to_create + to_update
+            transaction.on_commit(lambda: publish_notifications(dispatched))
+        return len(events)
+
+
+class NotificationEvent(models.Model):
+    """
+    Outbox row for a notification that has not been dispatched yet.
+    Views enqueue these; `manage.py dispatch_notifications` drains them.
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    verb = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    target_ct = models.ForeignKey(
+        ContentType,
+        blank=True,
+        null=True,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    target_id = models.PositiveIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = NotificationEventManager()
+
+    class Meta:
+        ordering = ['id']
+
+    @property
+    def coalesce_key(self):
+        return (self.recipient_id, self.verb, self.target_ct_id, self.target_id)
+
+    def __str__(self):
+        return f'{self.verb} event for user {self.recipient_id}'
@@ -9,5 +9,5 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Notification
-        fields = ('id', 'actor', 'verb', 'verb_display', 'is_read', 'created_at')
+        fields = ('id', 'actor', 'verb', 'verb_display', 'is_read', 'timestamp', 'actor_count')
         read_only_fields = fields
\ No newline at end of file
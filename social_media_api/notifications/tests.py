@@ -1,3 +1,224 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.models import Post
+from .broker import LocalBroker
+from .models import Notification, NotificationActor, NotificationEvent
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UnreadCountTests(TestCase):
+    """Test the maintained unread notification counter."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.posts = [
+            Post.objects.create(author=self.alice, title=f'Post {i}', content='Content')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+
+        self.client.force_authenticate(user=self.bob)
+        for post in self.posts:
+            self.client.post(reverse('posts:post-like', args=[post.pk]))
+        self.client.force_authenticate(user=self.alice)
+        NotificationEvent.objects.drain()
+
+    def unread_count(self):
+        self.alice.refresh_from_db()
+        return self.client.get(reverse('notifications:unread-count')).data['unread_count']
+
+    def test_likes_increment_counter(self):
+        """Test each like notification bumps the recipient's counter."""
+        self.assertEqual(self.unread_count(), 3)
+
+    def test_mark_read_decrements_once(self):
+        """Test marking a notification read twice only decrements once."""
+        notification = Notification.objects.filter(recipient=self.alice).first()
+        url = reverse('notifications:mark-read', args=[notification.pk])
+        self.client.put(url)
+        self.client.put(url)
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_mark_all_read_resets_counter(self):
+        """Test marking everything read clears the counter."""
+        self.client.post(reverse('notifications:mark-all-read'))
+        self.assertEqual(self.unread_count(), 0)
+        self.assertEqual(Notification.objects.unread_count(self.alice), 0)
+
+    def test_recount_repairs_drift(self):
+        """Test ?recount=true recomputes the counter from the table."""
+        User.objects.filter(pk=self.alice.pk).update(unread_notification_count=42)
+        response = self.client.get(reverse('notifications:unread-count'), {'recount': 'true'})
+        self.assertEqual(response.data['unread_count'], 3)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.unread_notification_count, 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DispatchTests(TestCase):
+    """Test the notification outbox and its coalescing worker."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.fans = [
+            User.objects.create_user(username=f'fan{i}', password='testpass123')
+            for i in range(5)
+        ]
+        self.post = Post.objects.create(author=self.author, title='Post', content='Content')
+        self.client = APIClient()
+
+    def test_likes_are_queued_not_written_inline(self):
+        """Test liking only enqueues an event on the request path."""
+        self.client.force_authenticate(user=self.fans[0])
+        self.client.post(reverse('posts:post-like', args=[self.post.pk]))
+        self.assertEqual(NotificationEvent.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_likes_on_one_post_coalesce(self):
+        """Test many likes on one post become a single notification."""
+        for fan in self.fans:
+            self.client.force_authenticate(user=fan)
+            self.client.post(reverse('posts:post-like', args=[self.post.pk]))
+        call_command('dispatch_notifications', stdout=StringIO())
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actor, self.fans[-1])
+        self.assertFalse(NotificationEvent.objects.exists())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notification_count, 1)
+
+    def test_later_events_merge_into_unread_notification(self):
+        """Test a second batch folds into the still-unread notification."""
+        NotificationEvent.objects.enqueue(self.author, self.fans[0], 'like', target=self.post)
+        NotificationEvent.objects.drain()
+        NotificationEvent.objects.enqueue(self.author, self.fans[1], 'like', target=self.post)
+        NotificationEvent.objects.drain()
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notification_count, 1)
+
+    def test_repeat_actors_are_counted_once(self):
+        """Test liking again, in the same batch or a later one, doesn't add to the count."""
+        like, unlike = (reverse(name, args=[self.post.pk]) for name in ('posts:post-like', 'posts:post-unlike'))
+        self.client.force_authenticate(user=self.fans[0])
+        for url in (like, unlike, like):
+            self.client.post(url)
+        NotificationEvent.objects.drain()
+        self.client.post(unlike)
+        self.client.post(like)
+        NotificationEvent.objects.enqueue(self.author, self.fans[1], 'like', target=self.post)
+        NotificationEvent.objects.drain()
+
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(
+            sorted(notification.actor_links.values_list('actor_id', flat=True)),
+            sorted([self.fans[0].pk, self.fans[1].pk])
+        )
+        self.assertEqual(NotificationActor.objects.count(), 2)
+
+    def test_follow_and_comment_notify(self):
+        """Test follows and comments go through the outbox too."""
+        self.client.force_authenticate(user=self.fans[0])
+        self.client.post(reverse('accounts:follow-user', args=[self.author.pk]))
+        self.client.post(
+            reverse('posts:post-comments-list', args=[self.post.pk]),
+            {'post': self.post.pk, 'content': 'Nice'}
+        )
+        NotificationEvent.objects.drain()
+        self.assertEqual(
+            set(Notification.objects.values_list('verb', flat=True)),
+            {'follow', 'comment'}
+        )
+
+
+class StreamingTests(TestCase):
+    """Test the in-process broker that feeds notification streams."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', password='testpass123')
+        self.post = Post.objects.create(author=self.author, title='Post', content='Content')
+
+    def test_local_broker_delivers_to_subscribers_only(self):
+        """Test messages reach the subscribed user and no one else."""
+        broker = LocalBroker()
+
+        async def scenario():
+            mine = broker.subscribe(1)
+            other = broker.subscribe(2)
+            broker.publish(1, {'id': 10})
+            received = await mine.get(timeout=1)
+            missed = await other.get(timeout=0.01)
+            mine.close()
+            other.close()
+            return received, missed
+
+        received, missed = async_to_sync(scenario)()
+        self.assertEqual(received, {'id': 10})
+        self.assertIsNone(missed)
+        self.assertFalse(broker.has_subscribers(1))
+
+    def test_dispatch_publishes_to_recipient(self):
+        """Test draining the outbox pushes the notification to the broker."""
+        broker = LocalBroker()
+        NotificationEvent.objects.enqueue(self.author, self.fan, 'like', target=self.post)
+
+        def drain():
+            with self.captureOnCommitCallbacks(execute=True):
+                NotificationEvent.objects.drain()
+
+        async def scenario():
+            subscription = broker.subscribe(self.author.pk)
+            with mock.patch('notifications.broker._broker', broker):
+                await sync_to_async(drain)()
+            message = await subscription.get(timeout=1)
+            subscription.close()
+            return message
+
+        message = async_to_sync(scenario)()
+        self.assertEqual(message['verb'], 'like')
+        self.assertEqual(message['actor']['username'], 'fan')
+
+    def test_stream_requires_authentication(self):
+        """Test anonymous clients cannot open a stream."""
+        response = self.client.get(reverse('notifications:stream'), secure=True)
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_ticket_is_single_use(self):
+        """Test a stream ticket opens one stream and is then spent."""
+        client = APIClient()
+        client.force_authenticate(user=self.author)
+        ticket = client.post(reverse('notifications:stream-ticket'), secure=True).data['ticket']
+        url = f"{reverse('notifications:stream')}?ticket={ticket}"
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        response.close()
+        self.assertEqual(self.client.get(url, secure=True).status_code, 401)
+
+    def test_stream_rejects_token_in_url(self):
+        """Test API tokens are not accepted as a query parameter."""
+        token = Token.objects.create(user=self.author)
+        response = self.client.get(f"{reverse('notifications:stream')}?token={token.key}", secure=True)
+        self.assertEqual(response.status_code, 401)
@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     NotificationListView, NotificationMarkAsReadView,
-    NotificationMarkAllAsReadView
+    NotificationMarkAllAsReadView, NotificationUnreadCountView,
+    NotificationStreamTicketView, notification_stream
 )
 
 app_name = 'notifications'
@@ -10,4 +11,7 @@ urlpatterns = [
     path('', NotificationListView.as_view(), name='notification-list'),
     path('<int:pk>/mark-read/', NotificationMarkAsReadView.as_view(), name='mark-read'),
     path('mark-all-read/', NotificationMarkAllAsReadView.as_view(), name='mark-all-read'),
+    path('unread-count/', NotificationUnreadCountView.as_view(), name='unread-count'),
+    path('stream/ticket/', NotificationStreamTicketView.as_view(), name='stream-ticket'),
+    path('stream/', notification_stream, name='stream'),
 ]
\ No newline at end of file
@@ -1,12 +1,27 @@
+import asyncio
+import json
+import logging
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import generics, permissions
+from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Notification
+from accounts.authentication import token_expired
+from .broker import get_broker, notification_message
+from .models import Notification, NotificationEvent
 from .serializers import NotificationSerializer
+from social_media_api.pagination import NotificationPagination
 
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return Notification.objects.filter(
@@ -22,16 +37,144 @@ class NotificationMarkAsReadView(generics.UpdateAPIView):
 
     def update(self, request, *args, **kwargs):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        Notification.objects.mark_read(request.user, pk=notification.pk)
         return Response({'status': 'notification marked as read'})
 
 class NotificationMarkAllAsReadView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).update(is_read=True)
+        Notification.objects.mark_read(request.user)
         return Response({'status': 'all notifications marked as read'})
+
+class NotificationUnreadCountView(generics.GenericAPIView):
+    """
+    Cheap unread badge: reads the user's counter column by primary key (the
+    authenticated user may be a cached snapshot, so its copy can lag).
+    Pass ?recount=true to recount from the table and repair the counter.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if request.query_params.get('recount', '').lower() in ('true', '1', 'yes'):
+            count = Notification.objects.unread_count(user)
+            type(user).objects.filter(pk=user.pk).update(unread_notification_count=count)
+            return Response({'unread_count': count})
+        count = type(user).objects.filter(pk=user.pk).values_list('unread_notification_count', flat=True).first()
+        return Response({'unread_count': count or 0})
+
+# Seconds between keep-alive comments on idle notification streams
+STREAM_HEARTBEAT_SECONDS = getattr(settings, 'NOTIFICATIONS_STREAM_HEARTBEAT', 15)
+# Seconds a stream ticket stays valid before it is used
+STREAM_TICKET_TIMEOUT = getattr(settings, 'NOTIFICATIONS_STREAM_TICKET_TIMEOUT', 30)
+stream_ticket_key = 'notifications:stream_ticket:{}'
+
+
+class NotificationStreamTicketView(generics.GenericAPIView):
+    """
+    Issue a short-lived, single-use ticket for opening the notification
+    stream. EventSource cannot send headers, so the ticket goes in the URL
+    instead of the API token.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ticket = secrets.token_urlsafe(32)
+        cache.set(stream_ticket_key.format(ticket), request.user.pk, STREAM_TICKET_TIMEOUT)
+        return Response({'ticket': ticket, 'expires_in': STREAM_TICKET_TIMEOUT})
+
+
+logger = logging.getLogger(__name__)
+_dispatcher_task = None
+
+
+async def _dispatch_forever(interval=1.0):
+    """Drain the outbox inside the ASGI process so LocalBroker subscribers get pushes."""
+    drain = sync_to_async(NotificationEvent.objects.drain)
+    while True:
+        try:
+            if await drain():
+                continue
+        except Exception:
+            logger.exception('Notification dispatch failed')
+        await asyncio.sleep(interval)
+
+
+def ensure_dispatcher():
+    global _dispatcher_task
+    if _dispatcher_task is None or _dispatcher_task.done():
+        _dispatcher_task = asyncio.get_running_loop().create_task(_dispatch_forever())
+
+
+async def _authenticate_stream(request):
+    """
+    Resolve the streaming client from an Authorization token header, a
+    ?ticket= from NotificationStreamTicketView (deleted on first use), or the
+    session.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        try:
+            token = await Token.objects.select_related('user').aget(key=header[len('Token '):].strip())
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active and not token_expired(token.created) else None
+    ticket = request.GET.get('ticket')
+    if ticket:
+        key = stream_ticket_key.format(ticket)
+        user_id = await cache.aget(key)
+        # Only the request that deletes the ticket may use it
+        if user_id is None or not await cache.adelete(key):
+            return None
+        return await get_user_model().objects.filter(pk=user_id, is_active=True).afirst()
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _sse(message):
+    return f"id: {message['id']}\nevent: notification\ndata: {json.dumps(message)}\n\n"
+
+
+async def _event_stream(user, last_event_id):
+    # Subscribe before replaying so nothing dispatched in between is lost
+    subscription = get_broker().subscribe(user.pk)
+    try:
+        yield 'retry: 5000\n\n'
+        if last_event_id is not None:
+            missed = Notification.objects.filter(
+                recipient=user, pk__gt=last_event_id
+            ).select_related('actor').order_by('pk')
+            async for notification in missed:
+                yield _sse(notification_message(notification, notification.actor))
+        while True:
+            message = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+            yield _sse(message) if message is not None else ': keepalive\n\n'
+    finally:
+        subscription.close()
+
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of the user's new notifications.
+
+    Serve under ASGI (e.g. `uvicorn social_media_api.asgi:application`) so
+    each idle connection is a suspended coroutine rather than a worker.
+    Reconnecting clients send Last-Event-ID and receive what they missed.
+    """
+    user = await _authenticate_stream(request)
+    if user is None:
+        return HttpResponse(status=401)
+
+    if getattr(settings, 'NOTIFICATIONS_DISPATCH_IN_PROCESS', False):
+        ensure_dispatcher()
+
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    response = StreamingHttpResponse(_event_stream(user, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
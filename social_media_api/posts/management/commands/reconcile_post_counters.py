@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Post, Like, Comment
+
+
+def _count_of(model):
+    """Correlated subquery counting `model` rows that point at the outer post."""
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.like_count and Post.comment_count from the Like and Comment tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted posts without fixing them')
+
+    def handle(self, *args, **options):
+        drifted = Post.objects.annotate(
+            actual_likes=_count_of(Like),
+            actual_comments=_count_of(Comment),
+        ).exclude(
+            like_count=F('actual_likes'),
+            comment_count=F('actual_comments'),
+        )
+
+        if options['dry_run']:
+            for post in drifted.only('id', 'like_count', 'comment_count'):
+                self.stdout.write(
+                    f'Post {post.pk}: likes {post.like_count} -> {post.actual_likes}, '
+                    f'comments {post.comment_count} -> {post.actual_comments}'
+                )
+            self.stdout.write(self.style.WARNING(f'{drifted.count()} post(s) have drifted counters'))
+            return
+
+        with transaction.atomic():
+            fixed = Post.objects.filter(pk__in=drifted.values('pk')).update(
+                like_count=_count_of(Like),
+                comment_count=_count_of(Comment),
+            )
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters on {fixed} post(s)'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Drop feed entries past the newest FEED_TIMELINE_LIMIT of every timeline'
+
+    def handle(self, *args, **options):
+        # Active users' timelines are trimmed when they read their feed; this
+        # catches the ones who have not been back.
+        deleted = FeedEntry.objects.trim_all()
+        self.stdout.write(self.style.SUCCESS(f'Dropped {deleted} feed entries'))
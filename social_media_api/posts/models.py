@@ -1,5 +1,21 @@
 from django.db import models
+from django.db.models.functions import RowNumber
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from accounts.graph import follow_graph
+
+# Authors with more followers than this are not fanned out on write; their
+# posts are merged into followers' feeds at read time instead.
+FEED_FANOUT_MAX_FOLLOWERS = getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000)
+
+# Number of recent posts copied into a timeline when a user follows someone.
+FEED_BACKFILL_LIMIT = getattr(settings, 'FEED_BACKFILL_LIMIT', 50)
+
+# Timelines keep only their newest entries; older posts drop out of the feed.
+FEED_TIMELINE_LIMIT = getattr(settings, 'FEED_TIMELINE_LIMIT', 800)
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -11,16 +27,28 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # False when the author had too many followers to fan the post out on
+    # write; such posts are pulled into feeds at read time.
+    fanned_out = models.BooleanField(default=True)
+    # Denormalized counters kept in sync by the like/comment views with
+    # F() updates; `manage.py reconcile_post_counters` repairs any drift.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination position for feeds: (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            models.Index(
+                fields=['author', '-created_at'],
+                condition=models.Q(fanned_out=False),
+                name='post_fanout_on_read_idx',
+            ),
+        ]
     
     def __str__(self):
         return f'{self.title} by {self.author.username}'
-    
-    @property
-    def comment_count(self):
-        return self.comments.count()
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -39,6 +67,9 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_id_idx'),
+        ]
     
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
@@ -62,3 +93,164 @@ class Like(models.Model):
 
     def __str__(self):
         return f'{self.user.username} likes {self.post.title}'
+
+
+class FeedEntryManager(models.Manager):
+    """Manager that maintains the materialized home feed."""
+
+    def fan_out(self, post):
+        """
+        Push a new post into the timelines of its author's followers.
+        Authors above FEED_FANOUT_MAX_FOLLOWERS are skipped and served
+        on read instead, so a single post never causes a write storm.
+        """
+        followers = follow_graph.follower_ids(post.author_id)
+        if len(followers) > FEED_FANOUT_MAX_FOLLOWERS:
+            if post.fanned_out:
+                post.fanned_out = False
+                post.save(update_fields=['fanned_out'])
+            return 0
+
+        # The cached ids may still hold a user deleted in another process
+        followers = get_user_model().objects.filter(pk__in=followers).values_list('pk', flat=True)
+        entries = [
+            self.model(user_id=user_id, post=post, created_at=post.created_at)
+            for user_id in followers
+        ]
+        self.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+        return len(entries)
+
+    def backfill(self, user_id, author_ids):
+        """Copy each author's recent fanned-out posts into a new follower's feed."""
+        posts = Post.objects.filter(
+            author_id__in=author_ids, fanned_out=True
+        ).annotate(
+            rank=models.Window(
+                RowNumber(), partition_by=models.F('author_id'), order_by=models.F('created_at').desc()
+            )
+        ).filter(rank__lte=FEED_BACKFILL_LIMIT).values_list('pk', 'created_at')
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, post_id=post_id, created_at=created_at)
+                for post_id, created_at in posts
+            ],
+            ignore_conflicts=True
+        )
+        self.trim(user_id)
+
+    def prune(self, user_id, author_ids):
+        """Drop the given authors' posts from the feed of a user who unfollowed them."""
+        self.filter(user_id=user_id, post__author_id__in=author_ids).delete()
+
+    def trim(self, user_id):
+        """
+        Drop the entries past the newest FEED_TIMELINE_LIMIT of a user's
+        timeline. Finding the cutoff walks at most that many index entries.
+        """
+        timeline = self.filter(user_id=user_id).order_by('-created_at', '-post_id')
+        cutoff = list(timeline.values_list('created_at', 'post_id')[FEED_TIMELINE_LIMIT:FEED_TIMELINE_LIMIT + 1])
+        if not cutoff:
+            return 0
+        created_at, post_id = cutoff[0]
+        deleted, _ = self.filter(user_id=user_id).filter(
+            models.Q(created_at__lt=created_at) |
+            models.Q(created_at=created_at, post_id__lte=post_id)
+        ).delete()
+        return deleted
+
+    def trim_all(self):
+        """Trim every timeline longer than FEED_TIMELINE_LIMIT (see trim())."""
+        users = (
+            self.order_by().values('user_id')
+            .annotate(n=models.Count('pk')).filter(n__gt=FEED_TIMELINE_LIMIT)
+            .values_list('user_id', flat=True)
+        )
+        return sum(self.trim(user_id) for user_id in users)
+
+    def feed_for(self, user, posts=None):
+        """
+        Return the user's home feed (see Feed). `posts` is the Post queryset
+        the posts of each page are loaded through.
+        """
+        return Feed(user, Post.objects.all() if posts is None else posts)
+
+
+class Feed:
+    """
+    A user's home feed, newest first: their timeline entries plus the posts
+    of followed authors served on read. FeedPagination reads one keyset
+    slice of each, on (created_at, post id), and loads only the posts that
+    make the page, so a page costs the same however long the timeline is.
+    """
+    model = Post
+
+    def __init__(self, user, posts):
+        self.timeline = FeedEntry.objects.filter(user=user)
+        self.on_read = Post.objects.filter(
+            fanned_out=False, author_id__in=list(follow_graph.following_ids(user.pk))
+        )
+        self.posts = posts
+
+    def count(self):
+        # Fanned-out posts never skip the timeline, so the two never overlap
+        return self.timeline.count() + self.on_read.count()
+
+class FeedEntry(models.Model):
+    """
+    One post in one user's materialized home feed.
+    created_at is copied from the post so the timeline can be read
+    straight from the (user, -created_at, -post) index.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    created_at = models.DateTimeField()
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('user', 'post')
+        indexes = [
+            # Keyset pagination position for timelines: (created_at, post_id)
+            models.Index(fields=['user', '-created_at', '-post'], name='feedentry_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in feed of user {self.user_id}'
+
+
+@receiver(m2m_changed, sender=settings.AUTH_USER_MODEL + '_followers')
+def sync_feed_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """Backfill or prune timelines when follow relationships change."""
+    if action == 'pre_clear':
+        # clear() reports no pk_set, so note who is being unlinked first
+        related = instance.following if reverse else instance.followers
+        instance._feed_cleared_ids = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        action, pk_set = 'post_remove', getattr(instance, '_feed_cleared_ids', None)
+        instance.__dict__.pop('_feed_cleared_ids', None)
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    # user.followers.add(follower) -> instance is the author being followed;
+    # follower.following.add(*users) -> instance is the follower, and all the
+    # authors are handled in one backfill.
+    if reverse:
+        pairs = [(instance.pk, pk_set)]
+    else:
+        pairs = [(follower_id, [instance.pk]) for follower_id in pk_set]
+
+    for follower_id, author_ids in pairs:
+        if action == 'post_add':
+            FeedEntry.objects.backfill(follower_id, author_ids)
+        else:
+            FeedEntry.objects.prune(follower_id, author_ids)
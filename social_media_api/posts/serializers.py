@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Manager
 from .models import Post, Comment, Like
 from accounts.serializers import UserMinimalSerializer
 
@@ -23,12 +24,28 @@ class LikeSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'post', 'created_at')
         read_only_fields = ('user', 'created_at')
 
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer for posts that resolves is_liked for the whole page
+    with a single Like query instead of one query per post.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, Manager) else data)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            self.child.liked_post_ids = set(
+                Like.objects.filter(
+                    user=request.user, post_id__in=[post.pk for post in posts]
+                ).values_list('post_id', flat=True)
+            )
+        return super().to_representation(posts)
+
 class PostSerializer(serializers.ModelSerializer):
     author = UserMinimalSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     likes = LikeSerializer(many=True, read_only=True)
     comment_count = serializers.IntegerField(read_only=True)
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
@@ -37,16 +54,24 @@ class PostSerializer(serializers.ModelSerializer):
                  'updated_at', 'comments', 'comment_count', 'likes',
                  'like_count', 'is_liked')
         read_only_fields = ('author', 'created_at', 'updated_at')
-    
-    def get_like_count(self, obj):
-        return obj.likes.count()
+        list_serializer_class = PostListSerializer
     
     def get_is_liked(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        if not (request and request.user.is_authenticated):
+            return False
+        liked_post_ids = getattr(self, 'liked_post_ids', None)
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
+        return obj.likes.filter(user=request.user).exists()
     
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only write edited columns so concurrent counter updates survive
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
\ No newline at end of file
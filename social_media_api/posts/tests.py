@@ -1,3 +1,410 @@
-from django.test import TestCase
+import json
+import threading
+from base64 import urlsafe_b64encode
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from unittest import mock
+
+from shared.profiling import QueryProfilerMiddleware, profiles
+from shared.throttling import CacheStore, LocalStore, SlidingWindow, TokenBucket
+from .models import Post, Comment, Like, FeedEntry
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class APIBaseTestCase(TestCase):
+    """Base test case with a few users and an authenticated client."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.carol = User.objects.create_user(username='carol', password='testpass123')
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def create_post(self, author, title='Post'):
+        """Create a post through the API so fan-out runs."""
+        self.client.force_authenticate(user=author)
+        response = self.client.post(reverse('posts:post-list'), {'title': title, 'content': 'Content'})
+        self.client.force_authenticate(user=self.alice)
+        return Post.objects.get(pk=response.data['id'])
+
+
+class FeedTests(APIBaseTestCase):
+    """Test the materialized home feed."""
+
+    def test_post_is_fanned_out_to_followers(self):
+        """Test creating a post writes a feed entry for each follower."""
+        self.alice.follow(self.bob)
+        self.carol.follow(self.bob)
+        post = self.create_post(self.bob)
+        self.assertTrue(post.fanned_out)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(post=post).values_list('user_id', flat=True)),
+            {self.alice.pk, self.carol.pk}
+        )
+
+    def test_feed_lists_followed_posts_newest_first(self):
+        """Test the feed only contains posts from followed users."""
+        self.alice.follow(self.bob)
+        first = self.create_post(self.bob, 'First')
+        second = self.create_post(self.bob, 'Second')
+        self.create_post(self.carol, 'Not followed')
+
+        response = self.client.get(reverse('posts:post-feed'))
+        ids = [post['id'] for post in response.data['results']]
+        self.assertEqual(ids, [second.pk, first.pk])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Test following copies recent posts in and unfollowing removes them."""
+        post = self.create_post(self.bob)
+        self.alice.follow(self.bob)
+        self.assertTrue(FeedEntry.objects.filter(user=self.alice, post=post).exists())
+
+        self.alice.unfollow(self.bob)
+        self.assertFalse(FeedEntry.objects.filter(user=self.alice).exists())
+
+    def test_clear_prunes_from_both_sides(self):
+        """Test clearing following or followers removes the fanned-out entries."""
+        self.alice.follow(self.bob)
+        self.alice.follow(self.carol)
+        self.create_post(self.bob)
+        self.create_post(self.carol)
+        self.assertEqual(FeedEntry.objects.filter(user=self.alice).count(), 2)
+        self.alice.following.clear()
+        self.assertFalse(FeedEntry.objects.filter(user=self.alice).exists())
+
+        self.alice.follow(self.bob)
+        self.carol.follow(self.bob)
+        self.assertEqual(FeedEntry.objects.filter(post__author=self.bob).count(), 2)
+        self.bob.followers.clear()
+        self.assertFalse(FeedEntry.objects.filter(post__author=self.bob).exists())
+
+    def test_large_authors_are_served_on_read(self):
+        """Test authors above the fan-out limit skip the write path."""
+        self.alice.follow(self.bob)
+        with mock.patch('posts.models.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            post = self.create_post(self.bob)
+        self.assertFalse(post.fanned_out)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        response = self.client.get(reverse('posts:post-feed'))
+        self.assertEqual([p['id'] for p in response.data['results']], [post.pk])
+
+    def test_pages_merge_timeline_and_on_read_posts(self):
+        """Test paging walks fanned-out and on-read posts in one order, both ways."""
+        self.alice.follow(self.bob)
+        self.alice.follow(self.carol)
+        posts = []
+        for i in range(3):
+            posts.append(self.create_post(self.bob, f'Bob {i}'))
+            with mock.patch('posts.models.FEED_FANOUT_MAX_FOLLOWERS', 0):
+                posts.append(self.create_post(self.carol, f'Carol {i}'))
+        newest_first = [post.pk for post in reversed(posts)]
+
+        url = reverse('posts:post-feed')
+        first = self.client.get(url, {'page_size': 4})
+        self.assertEqual(first.data['count'], 6)
+        second = self.client.get(first.data['next'])
+        ids = [post['id'] for post in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, newest_first)
+        self.assertIsNone(second.data['next'])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(previous.data['results'], first.data['results'])
+
+    def test_timelines_are_trimmed(self):
+        """Test reading the feed drops timeline entries past the limit."""
+        self.alice.follow(self.bob)
+        posts = [self.create_post(self.bob, f'Post {i}') for i in range(4)]
+        with mock.patch('posts.models.FEED_TIMELINE_LIMIT', 2):
+            response = self.client.get(reverse('posts:post-feed'))
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.alice).values_list('post_id', flat=True)),
+            [posts[3].pk, posts[2].pk]
+        )
+        self.assertEqual([post['id'] for post in response.data['results']], [posts[3].pk, posts[2].pk])
+
+        self.carol.follow(self.bob)
+        self.assertEqual(FeedEntry.objects.filter(user=self.carol).count(), 4)
+        with mock.patch('posts.models.FEED_TIMELINE_LIMIT', 1):
+            call_command('trim_feeds', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.filter(user=self.carol).count(), 1)
+
+
+class CounterTests(APIBaseTestCase):
+    """Test the denormalized like and comment counters."""
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post(self.bob)
+
+    def test_like_and_unlike_update_like_count(self):
+        """Test liking twice counts once and unliking decrements."""
+        like_url = reverse('posts:post-like', args=[self.post.pk])
+        self.client.post(like_url)
+        self.client.post(like_url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.post(reverse('posts:post-unlike', args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        """Test comments keep comment_count in sync."""
+        url = reverse('posts:post-comments-list', args=[self.post.pk])
+        response = self.client.post(url, {'post': self.post.pk, 'content': 'Nice'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(reverse('posts:post-comments-detail', args=[self.post.pk, response.data['id']]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test the reconcile command recomputes drifted counters."""
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=3)
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
+
+
+class QueryCountTests(APIBaseTestCase):
+    """Test that listing posts does not issue per-post queries."""
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.bob, title=f'Post {i}', content='Content')
+            FeedEntry.objects.fan_out(post)
+            Comment.objects.create(post=post, author=self.carol, content='Comment')
+            Like.objects.create(post=post, user=self.carol)
+            Like.objects.create(post=post, user=self.alice)
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        """Test the post list costs the same number of queries for 2 or 8 posts."""
+        url = reverse('posts:post-list')
+        self.add_posts(2)
+        small, _ = self.count_list_queries(url)
+        self.add_posts(6)
+        large, response = self.count_list_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 8)
+        self.assertTrue(all(post['is_liked'] for post in response.data['results']))
+
+    def test_feed_query_count_is_independent_of_page_size(self):
+        """Test the feed costs the same number of queries for 2 or 8 posts."""
+        self.alice.follow(self.bob)
+        url = reverse('posts:post-feed')
+        self.add_posts(2)
+        self.client.get(url)  # warm the follow graph cache
+        small, _ = self.count_list_queries(url)
+        self.add_posts(6)
+        large, response = self.count_list_queries(url)
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 8)
+
+
+class KeysetPaginationTests(APIBaseTestCase):
+    """Test cursor pagination on the feed and comment lists."""
+
+    def setUp(self):
+        super().setUp()
+        self.alice.follow(self.bob)
+        self.posts = [self.create_post(self.bob, f'Post {i}') for i in range(5)]
+
+    def test_feed_pages_do_not_shift_when_posts_are_added(self):
+        """Test following the next link is stable across new inserts."""
+        url = reverse('posts:post-feed')
+        first = self.client.get(url, {'page_size': 2})
+        self.create_post(self.bob, 'Newer post')
+        second = self.client.get(first.data['next'])
+
+        ids = [post['id'] for post in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)][:4])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(previous.data['results'], first.data['results'])
+
+    def test_count_can_be_skipped(self):
+        """Test ?count=false omits the total count."""
+        url = reverse('posts:post-feed')
+        self.assertEqual(self.client.get(url).data['count'], 5)
+        self.assertNotIn('count', self.client.get(url, {'count': 'false'}).data)
+
+    def test_invalid_cursor_returns_404(self):
+        """Test a malformed cursor is rejected."""
+        response = self.client.get(reverse('posts:post-feed'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+        # Well-formed, but the timestamp isn't a date
+        cursor = urlsafe_b64encode(json.dumps(['not-a-date', 1, False]).encode()).decode()
+        response = self.client.get(reverse('posts:post-feed'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_are_paged_oldest_first(self):
+        """Test the comment list pages forward in creation order."""
+        post = self.posts[0]
+        url = reverse('posts:post-comments-list', args=[post.pk])
+        for i in range(3):
+            self.client.post(url, {'post': post.pk, 'content': f'Comment {i}'})
+
+        first = self.client.get(url, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        contents = [c['content'] for c in first.data['results'] + second.data['results']]
+        self.assertEqual(contents, ['Comment 0', 'Comment 1', 'Comment 2'])
+        self.assertIsNone(second.data['next'])
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottleTests(APIBaseTestCase):
+    """Test the per-action rate limits."""
+
+    @throttle_rates(like='3/min')
+    def test_like_toggle_loop_is_throttled(self):
+        post = self.create_post(self.bob)
+        like = reverse('posts:post-like', args=[post.pk])
+        unlike = reverse('posts:post-unlike', args=[post.pk])
+        statuses = [self.client.post(url).status_code for url in (like, unlike, like, unlike)]
+        self.assertEqual(statuses, [201, 204, 201, 429])
+
+        response = self.client.post(like)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Like.objects.filter(post=post).count(), 1)
+
+        # Other users have their own bucket
+        self.client.force_authenticate(user=self.carol)
+        self.assertEqual(self.client.post(like).status_code, 201)
+
+    @throttle_rates(comment='2/min')
+    def test_only_comment_creation_is_throttled(self):
+        post = self.create_post(self.bob)
+        url = reverse('posts:post-comments-list', args=[post.pk])
+        statuses = [self.client.post(url, {'post': post.pk, 'content': 'Hi'}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_sliding_window_weights_the_previous_window(self):
+        store, window = LocalStore(), SlidingWindow(4, 60)
+        self.assertEqual([window.check(store, 'k', 10 + i)[0] for i in range(5)], [True] * 4 + [False])
+
+        # 30s into the next window half of the previous 4 still count
+        self.assertEqual([window.check(store, 'k', 90)[0] for _ in range(3)], [True, True, False])
+        allowed, wait = window.check(store, 'k', 90)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 15)
+        self.assertTrue(window.check(store, 'k', 90 + wait)[0])
+
+    def test_sliding_window_admits_the_limit_under_concurrency(self):
+        store, window = CacheStore('default'), SlidingWindow(5, 60)
+        barrier = threading.Barrier(16)
+        results = []
+
+        def check():
+            barrier.wait()
+            results.append(window.check(store, 'k', 10)[0])
+
+        threads = [threading.Thread(target=check) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 5)
+        # Refused requests gave their slots back
+        self.assertEqual(store.get_many(['k:0']), {'k:0': 5})
+
+    def test_token_bucket_allows_bursts_and_refills(self):
+        store, bucket = LocalStore(), TokenBucket(3, 60)
+        self.assertEqual([bucket.check(store, 'k', 0)[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(bucket.check(store, 'k', 0), (False, 20))
+        self.assertTrue(bucket.check(store, 'k', 20)[0])
+        self.assertFalse(bucket.check(store, 'k', 20)[0])
+
+    def test_local_store_evicts_least_recent_keys(self):
+        store = LocalStore(maxsize=2)
+        for key in 'abc':
+            store.incr(key, 60)
+        self.assertEqual(store.get_many(['a', 'b', 'c']), {'b': 1, 'c': 1})
+
+
+@override_settings(QUERY_PROFILER_SAMPLE_RATE=1.0, QUERY_PROFILER_N_PLUS_ONE_THRESHOLD=3)
+class QueryProfilerTests(APIBaseTestCase):
+    """Test the query profiler middleware and endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        profiles.clear()
+        for author in (self.alice, self.bob, self.carol):
+            Post.objects.create(author=author, title='Post', content='Content')
+
+    def test_sampled_responses_carry_server_timing(self):
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$')
+
+        profile = profiles.get(response['X-Query-Profile'])
+        self.assertEqual(profile.view, 'PostViewSet.list')
+        self.assertEqual(profile.n_plus_one, [])
+
+    @override_settings(QUERY_PROFILER_SAMPLE_RATE=0)
+    def test_unsampled_responses_are_untouched(self):
+        response = self.client.get(reverse('posts:post-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiles.all(), [])
+
+    def test_async_requests_are_profiled_without_a_thread(self):
+        async def view(request):
+            return HttpResponse(str(await Post.objects.acount()))
+
+        middleware = QueryProfilerMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/count/'))
+        self.assertEqual(response.content, b'3')
+        self.assertEqual(profiles.get(response['X-Query-Profile']).count, 1)
+
+    def test_n_plus_one_is_reported_with_its_stack(self):
+        def view(request):
+            # Post.__str__ loads each post's author separately
+            return HttpResponse(', '.join(str(post) for post in Post.objects.all()))
+
+        with self.assertLogs('shared.profiling', 'WARNING'):
+            response = QueryProfilerMiddleware(view)(RequestFactory().get('/titles/'))
+        self.assertIn('n-plus-one;desc="1 repeated queries"', response['Server-Timing'])
+
+        url = reverse('query-profile-detail', args=[response['X-Query-Profile']])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        data = self.client.get(url).data
+        [n_plus_one] = data['n_plus_one']
+        self.assertEqual(n_plus_one['count'], 3)
+        self.assertIn('FROM "accounts_user"', n_plus_one['sql'])
+        self.assertTrue(n_plus_one['stack'][-1].startswith('posts/models.py:'))
+        self.assertTrue(n_plus_one['stack'][-1].endswith('in __str__'))
+
+        listed = self.client.get(reverse('query-profile-list'), {'n_plus_one': 'true'}).data['results']
+        self.assertEqual([profile['id'] for profile in listed], [response['X-Query-Profile']])
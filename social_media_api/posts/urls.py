@@ -1,24 +1,18 @@
 from rest_framework_nested import routers
 from django.urls import path, include 
-from .views import PostViewSet, CommentViewSet, Like, u
+from .views import PostViewSet, CommentViewSet
 
 
 router = routers.DefaultRouter()
 router.register(r'', PostViewSet, basename='post')
 
-posts_router = routers.NestedDefaultRouter(router, r'', lookup='post')
+posts_router = routers.NestedSimpleRouter(router, r'', lookup='post')
 posts_router.register(r'comments', CommentViewSet, basename='post-comments')
 
-
-router.register(r'posts', PostViewSet)
-
-urlpatterns = router.urls
-
 app_name = 'posts'
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Nested comment routes first so POST /<post_pk>/comments/ reaches CommentViewSet
     path('', include(posts_router.urls)),
-    path('/posts/<int:pk>/like/', views.like, name='like_post'),
-    path('/posts/<int:pk>/unlike/', views.unlike, name='unlike_post'),
-]  
\ No newline at end of file
+    path('', include(router.urls)),
+]  
@@ -1,12 +1,15 @@
 from rest_framework import viewsets, permissions, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Prefetch
 from django_filters import rest_framework as filters
 from rest_framework.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT
-from .models import Post, Comment, Like
+from .models import Post, Comment, Like, FeedEntry
 from .serializers import PostSerializer, CommentSerializer, LikeSerializer
-from notifications.models import Notification
+from notifications.models import NotificationEvent
+from social_media_api.pagination import FeedPagination, CommentPagination
+from shared.throttling import TokenBucketThrottle
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
     """
@@ -29,117 +32,98 @@ class PostFilter(filters.FilterSet):
         model = Post
         fields = ['title', 'content']
 
+def with_post_relations(queryset):
+    """
+    Load authors, comments and likes for a page of posts in a fixed
+    number of queries, however many posts the page holds.
+    """
+    return queryset.select_related('author').prefetch_related(
+        Prefetch('comments', queryset=Comment.objects.select_related('author')),
+        Prefetch('likes', queryset=Like.objects.select_related('user')),
+    )
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = PostFilter
+    throttle_scope = None
+
+    def get_queryset(self):
+        return with_post_relations(super().get_queryset())
     
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user)
+            FeedEntry.objects.fan_out(post)
 
     @action(detail=True, methods=['get'])
     def like_status(self, request, pk=None):
         """Get the like status and count for a post"""
         post = self.get_object()
         return Response({
-            'likes_count': post.likes.count(),
+            'likes_count': post.like_count,
             'has_liked': post.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
         })
     
-    @action(detail=True, methods=['get'])
-    def comments(self, request, pk=None):
-        post = self.get_object()
-        comments = Comment.objects.filter(post=post)
-        page = self.paginate_queryset(comments)
-        
-        if page is not None:
-            serializer = CommentSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = CommentSerializer(comments, many=True, context={'request': request})
-        return Response(serializer.data)
-
-    @action(detail=True, methods=['post'])
+    # Like and unlike share one bucket, so toggling in a loop is limited too
+    @action(detail=True, methods=['post'], throttle_classes=[TokenBucketThrottle], throttle_scope='like')
     def like(self, request, pk=None):
-        """Like or unlike a post"""
+        # Anyone may like a post, so skip the author-only object permission
         post = generics.get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        
-        if not created:
-            # User already liked the post, so unlike it
-            like.delete()
-            return Response({'status': 'unliked'}, status=HTTP_204_NO_CONTENT)
-        
-        # Create notification for the post author
-        if request.user != post.author:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb='like',
-                target_ct=ContentType.objects.get_for_model(post),
-                target_id=post.id
-            )
-        
-        serializer = LikeSerializer(like, context={'request': request})
-        return Response(serializer.data, status=HTTP_201_CREATED)
-        
-    @action(detail=True, methods=['post'])
-    @action(detail=True, methods=['post'])
-    def like(self, request, pk=None):
-        post = self.get_object()
         user = request.user
 
-        like, created = Like.objects.get_or_create(user=user, post=post)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=user, post=post)
+            if created:
+                Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + 1)
+                NotificationEvent.objects.enqueue(post.author, user, 'like', target=post)
 
         if created:
-            if post.author != user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    actor=user,
-                    verb='like',
-                    target_ct=ContentType.objects.get_for_model(post),
-                    target_id=post.id
-                )
             return Response(LikeSerializer(like, context={'request': request}).data, status=HTTP_201_CREATED)
 
         return Response({'detail': 'You have already liked this post'})
         
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[TokenBucketThrottle], throttle_scope='like')
     def unlike(self, request, pk=None):
-        post = self.get_object()
-        user = request.user
+        post = generics.get_object_or_404(Post, pk=pk)
         
-        try:
-            like = Like.objects.get(user=user, post=post)
-            like.delete()
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+            if deleted:
+                Post.objects.filter(pk=post.pk).update(like_count=F('like_count') - 1)
+
+        if deleted:
             return Response(status=HTTP_204_NO_CONTENT)
-        except Like.DoesNotExist:
-            return Response({'detail': 'You have not liked this post'})
+        return Response({'detail': 'You have not liked this post'})
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=FeedPagination)
     def feed(self, request):
         """
         Return posts from users that the current user follows,
         ordered by creation date (newest first).
+        Served from the materialized timeline built in perform_create.
         """
-        following_users = request.user.following.all()
-        posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        page = self.paginate_queryset(posts)
-        
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-            
-        serializer = self.get_serializer(posts, many=True)
-        return Response(serializer.data)
+        feed = FeedEntry.objects.feed_for(request.user, with_post_relations(Post.objects.all()))
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            # Reading the top of the feed is when its tail gets dropped
+            FeedEntry.objects.trim(request.user.pk)
+        page = self.paginate_queryset(feed)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
-    
+    pagination_class = CommentPagination
+
+    @property
+    def throttle_scope(self):
+        # Only posting a comment is limited
+        return 'comment' if self.action == 'create' else None
+
     def get_queryset(self):
         queryset = Comment.objects.all()
         if 'post_pk' in self.kwargs:
@@ -148,4 +132,12 @@ class CommentViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         post = generics.get_object_or_404(Post, pk=self.kwargs['post_pk'])
-        serializer.save(author=self.request.user, post=post)
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=post)
+            Post.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + 1)
+            NotificationEvent.objects.enqueue(post.author, self.request.user, 'comment', target=post)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - 1)
@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination shared by the feed, comment and notification lists.
+
+Pages are addressed by the (timestamp, id) of the last row seen instead of an
+OFFSET, so deep pages cost the same as the first one and rows inserted while a
+client is scrolling do not shift items between pages.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on a (timestamp, id) pair that must match a composite index.
+
+    Responses keep the page-number shape ({count, next, previous, results}).
+    Infinite-scroll clients can pass ?count=false to skip the COUNT(*).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = queryset.count() if self.include_count(request) else None
+        cursor = self.decode_cursor(request, queryset.model._meta.get_field(self.ordering[0].lstrip('-')))
+        return self.paginate_rows(list(self.keyset(queryset, cursor)), cursor)
+
+    def keyset(self, queryset, cursor, ordering=None):
+        """
+        The rows of `queryset` past `cursor`, in the order they are walked,
+        one more than a page. `ordering` defaults to self.ordering.
+        """
+        ordering = ordering or self.ordering
+        field, pk_field = (name.lstrip('-') for name in ordering)
+        descending = ordering[0].startswith('-')
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            value, pk, reverse = cursor
+            # Walk away from the cursor row: forwards for "next" pages,
+            # backwards (then flip the page) for "previous" pages.
+            lookup = 'gt' if descending == reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'{pk_field}__{lookup}': pk})
+            )
+            if reverse:
+                queryset = queryset.reverse()
+        return queryset[:self.page_size + 1]
+
+    def paginate_rows(self, results, cursor):
+        """Turn the rows walked from `cursor` (see keyset()) into the page."""
+        reverse = cursor is not None and cursor[2]
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.position_fields = tuple(name.lstrip('-') for name in self.ordering)
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() not in ('false', '0', 'no')
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            return field.to_python(value), int(pk), bool(reverse)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        field, pk_field = self.position_fields
+        value = getattr(obj, field)
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value, getattr(obj, pk_field), reverse]
+        encoded = urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        return Response(body)
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Pages of a posts.models.Feed. Each page walks the timeline index and the
+    on-read posts from the cursor, merges the two, and loads only the posts
+    that made the page.
+    """
+    ordering = ('-created_at', '-id')
+    timeline_ordering = ('-created_at', '-post_id')
+
+    def paginate_queryset(self, feed, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = feed.count() if self.include_count(request) else None
+        cursor = self.decode_cursor(request, feed.model._meta.get_field('created_at'))
+
+        positions = set(self.keyset(feed.timeline, cursor, self.timeline_ordering).values_list('created_at', 'post_id'))
+        positions.update(self.keyset(feed.on_read, cursor).values_list('created_at', 'id'))
+        # Walked newest first, or oldest first towards a "previous" cursor
+        reverse = cursor is not None and cursor[2]
+        positions = sorted(positions, reverse=not reverse)[:self.page_size + 1]
+
+        posts = feed.posts.in_bulk([pk for _, pk in positions])
+        return self.paginate_rows([posts[pk] for _, pk in positions if pk in posts], cursor)
+
+
+class CommentPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
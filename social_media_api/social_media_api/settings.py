@@ -10,11 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The throttling and query-profiling modules are shared with the other API
+# projects of the repository (see ../shared)
+if str(BASE_DIR.parent) not in sys.path:
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -52,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the queries of every other middleware are profiled too
+    'shared.profiling.QueryProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +101,19 @@ DATABASES = {
     }
 }
 
+# Cache
+# The follow graph and the throttle counters (THROTTLE_CACHE) live here, and
+# the follow graph is invalidated by deleting keys. LocMem is private to each
+# process, so with more than one worker a change made in one process is not
+# seen by the others until their entries expire (up to FOLLOW_GRAPH_TIMEOUT,
+# an hour). Run multi-process deployments on a shared cache, e.g.
+# 'django.core.cache.backends.redis.RedisCache' with a LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -142,7 +165,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -154,8 +177,35 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Views opt in with throttle_scope (see shared/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'shared.throttling.SlidingWindowThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'like': '30/min',
+        'follow': '30/min',
+        'comment': '10/min',
+        'register': '5/hour',
+    },
 }
 
+# Throttle counters are kept in this cache; None keeps them in-process
+THROTTLE_CACHE = 'default'
+
+# Query profiling (see shared/profiling.py): the share of requests
+# profiled, and how often one query shape must run in a request to be an N+1
+QUERY_PROFILER_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = 3
+QUERY_PROFILER_HISTORY = 100
+
+# Token authentication (see accounts/authentication.py): tokens expire after
+# TOKEN_TTL; authenticated users are cached in-process for up to
+# TOKEN_AUTH_CACHE_TIMEOUT seconds, and in TOKEN_AUTH_CACHE too if set
+TOKEN_TTL = timedelta(days=7)
+TOKEN_AUTH_CACHE = None
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TIMEOUT = 60
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
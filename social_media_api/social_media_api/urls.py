@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from shared.profiling import QueryProfileDetail, QueryProfileList
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls', namespace='accounts')),
     path('api/posts/', include('posts.urls', namespace='posts')),
     path('api/notifications/', include('notifications.urls', namespace='notifications')),
+    path('api/profiler/', QueryProfileList.as_view(), name='query-profile-list'),
+    path('api/profiler/<str:profile_id>/', QueryProfileDetail.as_view(), name='query-profile-detail'),
 ]
 
 if settings.DEBUG: